@@ -1,55 +1,61 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
+import click
 
-df = pd.read_csv("charging_history_full.csv", delimiter=",", parse_dates=["ChargeStartDateTime"])
+from chargestore import DEFAULT_STORE, ingest, load_store
 
-df["QuantityBase"] = df["QuantityBase"].str.replace(" kwh", "").astype(float)
+# The merged export next to this script, independent of the working directory
+DEFAULT_EXPORT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "charging_history_full.csv")
 
+def open_store(store_path):
+    # Without a store the merged export is ingested first, so the script works out of the box
+    if not os.path.exists(store_path):
+        ingest(store_path, [DEFAULT_EXPORT])
+    return load_store(store_path)
 
-
-def showBarDiagram():
+def showBarDiagram(sessions):
+    # matplotlib is only loaded for plotting, so the help starts quickly
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(10, 5))
-    plt.bar(df["ChargeStartDateTime"], df["QuantityBase"], color="b", label="Lademenge (kWh)")
+    plt.bar(sessions["local_start"], sessions["energy_kwh"], color="b", label="Lademenge (kWh)")
     plt.xlabel("Zeitpunkt des Ladevorgangs")
     plt.ylabel("Lademenge (kWh)")
     plt.grid(False)
     plt.legend()
     plt.show()
 
-def calculateAveragePerDay():
-    first_day = df["ChargeStartDateTime"].min().date()
-    last_day = df["ChargeStartDateTime"].max().date()
+def calculateAveragePerDay(sessions):
+    first_day = sessions["local_start"].min().date()
+    last_day = sessions["local_start"].max().date()
     total_days = (last_day - first_day).days + 1
-    total_charge = df["QuantityBase"].sum()
+    total_charge = sessions["energy_kwh"].sum()
     avg_daily_charge = total_charge / total_days
     print(f"Average daily charge: {avg_daily_charge}")
 
-""""
-def showWeeklyAverage():
-    df["Week"] = df["ChargeStartDateTime"].dt.isocalendar().week
-    weekly_avg = df.groupby("Week")["QuantityBase"].mean()
-    plt.figure(figsize=(10, 5))
-    plt.bar(weekly_avg.index.astype(str), weekly_avg, color="b", label="Ø Ladeleistung (kWh)")
-    plt.xlabel("Woche")
-    plt.ylabel("Durchschnittliche Ladeleistung (kWh)")
-    plt.title("Durchschnittliche wöchentliche Ladeleistung")
-    plt.grid(True)
-    plt.legend()
-    plt.show()
-
-def showMonthlyAverage():
-    df["Month"] = df["ChargeStartDateTime"].dt.to_period("M")
-    monthly_avg = df.groupby("Month")["QuantityBase"].mean()
+def showPeriodAverage(table, period):
+    import matplotlib.pyplot as plt
+    # Mean energy per session from the aggregates stored with the sessions
+    average = table["energy_kwh"] / table["sessions"]
+    labels = table["period"].dt.strftime("%G-W%V" if period == "weekly" else "%Y-%m")
     plt.figure(figsize=(10, 5))
-    plt.bar(monthly_avg.index.astype(str), monthly_avg, color="r", label="Ø Ladeleistung (kWh)")
-    plt.xlabel("Monat")
-    plt.ylabel("Durchschnittliche Ladeleistung (kWh)")
-    plt.title("Durchschnittliche monatliche Ladeleistung")
+    plt.bar(labels, average, color="b" if period == "weekly" else "r", label="Ø Lademenge (kWh)")
+    plt.xlabel("Woche" if period == "weekly" else "Monat")
+    plt.ylabel("Durchschnittliche Lademenge (kWh)")
+    plt.title("Durchschnittliche wöchentliche Lademenge" if period == "weekly" else "Durchschnittliche monatliche Lademenge")
     plt.xticks(rotation=45)
     plt.grid(True)
     plt.legend()
     plt.show()
-    """
 
-calculateAveragePerDay()
-showBarDiagram()
+@click.command()
+@click.option("--store", "store_path", default=DEFAULT_STORE, help="Charging history store (see chargestore.py)")
+@click.option("--period", default="session", type=click.Choice(["session", "weekly", "monthly"]), help="Plot every session or the average per week or month")
+def main(store_path, period):
+    store = open_store(store_path)
+    calculateAveragePerDay(store["sessions"])
+    if period == "session":
+        showBarDiagram(store["sessions"])
+    else:
+        showPeriodAverage(store[period], period)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+from __future__ import annotations
+import hashlib
+import json
+import math
+import os
+import re
+import click
+from typing import Dict, List
+
+# numpy and pandas are imported by the functions that use them, so the help starts without them
+
+STORE_VERSION = 1
+DEFAULT_STORE = "charging_history.store.npz"
+
+# Columns of the Tesla export and the typed columns they become
+NUMERIC_COLUMNS = {
+    "QuantityBase": "energy_kwh",
+    "UnitCostBase": "unit_cost",
+    "VAT": "vat",
+    "Total Exc. VAT": "total_exc_vat",
+    "Total Inc. VAT": "total_inc_vat",
+}
+TEXT_COLUMNS = {
+    "Model": "model",
+    "Country": "country",
+    "SiteLocationName": "site",
+    "Description": "description",
+    "Status": "status",
+    "InvoiceNumber": "invoice_number",
+}
+TABLES = ["sessions", "daily", "weekly", "monthly", "daily_usage"]
+
+def parse_number(values: pd.Series) -> pd.Series:
+    import pandas as pd
+    # '24.9010 kwh', '0.50/kwh', '0.00' or 'N/A'
+    return pd.to_numeric(values.astype(str).str.extract(r"(-?\d+(?:\.\d+)?)", expand=False), errors="coerce")
+
+def parse_export(path: str) -> pd.DataFrame:
+    """
+    Reads a Tesla charging history export into typed sessions: 'start' in UTC, 'local_start' as local
+    wall-clock time, the energy in kWh and costs as floats, all other fields as text.
+    """
+    import numpy as np
+    import pandas as pd
+    raw = pd.read_csv(path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+    sessions = pd.DataFrame({
+        "start": pd.to_datetime(raw["ChargeStartDateTime"], utc=True, format="ISO8601").dt.tz_localize(None),
+        # The wall-clock part before the UTC offset
+        "local_start": pd.to_datetime(raw["ChargeStartDateTime"].str.slice(0, 19), format="ISO8601"),
+    })
+    for column, name in NUMERIC_COLUMNS.items():
+        sessions[name] = parse_number(raw[column]) if column in raw else np.nan
+    for column, name in TEXT_COLUMNS.items():
+        sessions[name] = raw[column].replace("N/A", "") if column in raw else ""
+    return sessions
+
+def spread_daily_usage(sessions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Daily usage (Wh) measured by the charging sessions: the energy of every session is spread evenly over
+    the days until the next session (the last session over the mean gap). One row per day.
+    """
+    import numpy as np
+    import pandas as pd
+    if sessions.empty:
+        return pd.DataFrame({"date": np.empty(0, dtype="datetime64[ns]"), "usage_wh": np.empty(0)})
+    days = sessions["local_start"].dt.normalize().to_numpy()
+    gaps = (np.diff(days) / np.timedelta64(1, "D")).astype(float)
+    gaps = np.append(gaps, gaps.mean() if len(gaps) else 1)
+    # Several sessions on one day all count for that day
+    gaps = np.maximum(np.round(gaps), 0).astype(int)
+    energy = sessions["energy_kwh"].fillna(0).to_numpy() * 1000
+    spans = np.maximum(gaps, 1)
+    usage = np.repeat(energy / spans, spans)
+    dates = np.concatenate([day + np.arange(span) * np.timedelta64(1, "D") for day, span in zip(days, spans)])
+    daily = pd.DataFrame({"date": dates, "usage_wh": usage}).groupby("date", as_index=False)["usage_wh"].sum()
+    return daily.set_index("date").reindex(pd.date_range(daily["date"].min(), daily["date"].max()), fill_value=0.0) \
+        .rename_axis("date").reset_index()
+
+def aggregate_sessions(sessions: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Number of sessions, energy (kWh) and costs per day, ISO week and month of the local start time.
+    """
+    import pandas as pd
+    tables = {}
+    periods = {"daily": "D", "weekly": "W-SUN", "monthly": "M"}
+    for table, frequency in periods.items():
+        period = sessions["local_start"].dt.to_period(frequency).dt.start_time
+        grouped = sessions.groupby(period)
+        tables[table] = pd.DataFrame({
+            "period": grouped.size().index,
+            "sessions": grouped.size().to_numpy(),
+            "energy_kwh": grouped["energy_kwh"].sum().to_numpy(),
+            "total_inc_vat": grouped["total_inc_vat"].sum().to_numpy(),
+        })
+    tables["daily_usage"] = spread_daily_usage(sessions)
+    return tables
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as source:
+        return hashlib.sha256(source.read()).hexdigest()
+
+def empty_sessions() -> pd.DataFrame:
+    import numpy as np
+    import pandas as pd
+    columns = {"start": np.empty(0, dtype="datetime64[ns]"), "local_start": np.empty(0, dtype="datetime64[ns]")}
+    columns.update({name: np.empty(0) for name in NUMERIC_COLUMNS.values()})
+    columns.update({name: np.empty(0, dtype=str) for name in TEXT_COLUMNS.values()})
+    return pd.DataFrame(columns)
+
+def empty_store() -> dict:
+    sessions = empty_sessions()
+    return {"sources": {}, "sessions": sessions, **aggregate_sessions(sessions)}
+
+def load_store(path: str) -> dict:
+    """
+    Returns the sources (file name -> SHA-256), the sessions sorted by start and the aggregate tables.
+    """
+    import numpy as np
+    import pandas as pd
+    if not os.path.exists(path):
+        return empty_store()
+    with np.load(path) as stored:
+        meta = json.loads(stored["__meta__"].item())
+        if meta["version"] != STORE_VERSION:
+            raise click.ClickException(f"{path} was written by another version, please ingest the exports again into a new store")
+        store = {"sources": meta["sources"]}
+        for table in TABLES:
+            columns = stored[f"{table}_columns"].tolist()
+            store[table] = pd.DataFrame({name: stored[f"{table}_{index}"] for index, name in enumerate(columns)})
+    return store
+
+def save_store(path: str, store: dict):
+    import numpy as np
+    arrays = {"__meta__": np.array(json.dumps({"version": STORE_VERSION, "sources": store["sources"]}))}
+    for table in TABLES:
+        arrays[f"{table}_columns"] = np.array(store[table].columns, dtype=str)
+        for index, column in enumerate(store[table].columns):
+            values = store[table][column].to_numpy()
+            arrays[f"{table}_{index}"] = values.astype(str) if values.dtype == object else values
+    temporary = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(temporary, **arrays)
+    os.replace(temporary, path)
+
+def ingest(path: str, exports: List[str]) -> dict:
+    """
+    Adds the sessions of the given exports to the store. Files already ingested with the same content
+    are skipped; a session (identified by its start time) contained in several exports is kept once,
+    with the fields of the export ingested last. Returns counts of added and updated sessions and skipped files.
+    """
+    import numpy as np
+    import pandas as pd
+    store = load_store(path)
+    sessions = store["sessions"]
+    result = {"added": 0, "updated": 0, "skipped": 0}
+    for export in exports:
+        digest = file_hash(export)
+        if store["sources"].get(os.path.basename(export)) == digest:
+            result["skipped"] += 1
+            continue
+        new = parse_export(export)
+        known = np.isin(new["start"].to_numpy(), sessions["start"].to_numpy())
+        result["added"] += int((~known).sum())
+        result["updated"] += int(known.sum())
+        sessions = pd.concat([sessions, new], ignore_index=True).drop_duplicates("start", keep="last")
+        store["sources"][os.path.basename(export)] = digest
+    if result["skipped"] == len(exports):
+        return result
+    store["sessions"] = sessions.sort_values("start", kind="stable").reset_index(drop=True)
+    store.update(aggregate_sessions(store["sessions"]))
+    save_store(path, store)
+    return result
+
+def sessions_between(store: dict, first: str = None, last: str = None) -> pd.DataFrame:
+    """
+    Sessions whose UTC start lies between the first and the end of the last day, found by binary search.
+    """
+    import numpy as np
+    import pandas as pd
+    starts = store["sessions"]["start"].to_numpy()
+    lower = np.searchsorted(starts, np.datetime64(pd.Timestamp(first), "ns")) if first else 0
+    upper = np.searchsorted(starts, np.datetime64(pd.Timestamp(last) + pd.Timedelta(days=1), "ns")) if last else len(starts)
+    return store["sessions"].iloc[lower:upper]
+
+def measured_daily_usage(store: dict, first: str = None, last: str = None) -> float:
+    """
+    Mean daily usage in Wh over the days covered by the store (or the given date range).
+    """
+    import numpy as np
+    import pandas as pd
+    daily = store["daily_usage"]
+    mask = np.ones(len(daily), dtype=bool)
+    if first:
+        mask &= daily["date"] >= pd.Timestamp(first)
+    if last:
+        mask &= daily["date"] <= pd.Timestamp(last)
+    return float(daily.loc[mask, "usage_wh"].mean()) if mask.any() else float("nan")
+
+def set_config_value(path: str, key: str, value):
+    """
+    Sets a top-level value of a JSON configuration in place, keeping the layout of the rest of the file.
+    A missing key is added as the first entry, indented like the entry that follows it.
+    """
+    with open(path, newline="") as config_file:
+        text = config_file.read()
+    current = re.search(r'("%s"\s*:\s*)(-?\d[\d.eE+-]*|null|true|false|"[^"]*")' % re.escape(key), text)
+    if current:
+        text = text[:current.start(2)] + json.dumps(value) + text[current.end(2):]
+    else:
+        opening = re.match(r'\s*\{(\s*)', text)
+        entry = f'"{key}": {json.dumps(value)}'
+        rest = text[opening.end():]
+        text = text[:opening.end()] + (entry + "," + opening.group(1) if not rest.startswith("}") else entry) + rest
+    json.loads(text)
+    with open(path, "w", newline="") as config_file:
+        config_file.write(text)
+
+@click.group()
+def cli():
+    pass
+
+@cli.command(name="ingest")
+@click.argument("exports", nargs=-1, required=True)
+@click.option("--store", "store_path", default=DEFAULT_STORE, help="Store file, created if it does not exist")
+def ingest_command(exports: tuple, store_path: str):
+    """Add Tesla charging history exports (*.csv) to the store."""
+    result = ingest(store_path, list(exports))
+    sessions = load_store(store_path)["sessions"]
+    click.echo(f"Added {result['added']} session(s), updated {result['updated']}, skipped {result['skipped']} unchanged file(s). "
+               f"{store_path} holds {len(sessions)} session(s)")
+
+@cli.command()
+@click.option("--store", "store_path", default=DEFAULT_STORE, help="Store file")
+@click.option("--period", default="monthly", type=click.Choice(["daily", "weekly", "monthly"]), help="Aggregation period")
+def summary(store_path: str, period: str):
+    """Print sessions, energy (kWh) and costs per day, week or month."""
+    table = load_store(store_path)[period]
+    click.echo(table.to_string(index=False, float_format=lambda value: f"{value:.2f}"))
+
+@cli.command(name="daily-usage")
+@click.option("--store", "store_path", default=DEFAULT_STORE, help="Store file")
+@click.option("--start-date", default=None, help="First day in the format YYYY-MM-DD")
+@click.option("--end-date", default=None, help="Last day in the format YYYY-MM-DD")
+@click.option("--configfile", default=None, help="Simulation configuration whose daily_usage is set to the measured value")
+def daily_usage(store_path: str, start_date: str, end_date: str, configfile: str):
+    """Print the measured daily usage and optionally write it into a simulation configuration."""
+    usage = measured_daily_usage(load_store(store_path), start_date, end_date)
+    if math.isnan(usage):
+        raise click.ClickException("No sessions in the given period")
+    click.echo(f"Measured daily usage: {usage:.0f} Wh")
+    if configfile:
+        set_config_value(configfile, "daily_usage", int(round(usage)))
+        click.echo(f"daily_usage in {configfile} set to {int(round(usage))} Wh")
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,53 @@
+import importlib
+import sys
+from pathlib import Path
+import click
+
+ROOT = Path(__file__).resolve().parent
+
+# Subcommand -> (folder, module, click command, help); the module is only imported when the subcommand runs,
+# so listing the commands and starting a light command does not pay for pandas, matplotlib or requests
+COMMANDS = {
+    "simulation": ("simulation", "simulation", "cli", "Simulate the charging methods (simulation.py)"),
+    "evaluation": ("simulation", "evaluation", "cli", "Costs, energy reports and plots of a simulation output (evaluation.py)"),
+    "fleet": ("simulation", "fleet", "cli", "Simulate several vehicles sharing the PV surplus (fleet.py)"),
+    "sweep": ("simulation", "sweep", "cli", "Simulate a grid of configurations (sweep.py)"),
+    "montecarlo": ("simulation", "montecarlo", "cli", "Monte Carlo analysis of usage and plug-in times (montecarlo.py)"),
+    "benchmark": ("simulation", "benchmark", "cli", "Benchmark the simulation pipeline (benchmark.py)"),
+    "live": ("simulation", "live", "cli", "Control a wallbox from live Solarlog readings (live.py)"),
+    "surplus-profile": ("simulation", "surplusprofile", "cli", "Build and show surplus profiles (surplusprofile.py)"),
+    "solarlog": ("solar", "solarlog", "cli", "Fetch data from a Solarlog (solarlog.py)"),
+    "stub-server": ("solar", "stub_server", "serve", "Serve a local Solarlog stand-in (stub_server.py)"),
+    "surplus-plot": ("solar", "surplus_plot", "main", "Plot the average surplus by time of day (surplus_plot.py)"),
+    "charging-history": ("charging_history", "analyze_charging_history", "main", "Plot the Tesla charging history (analyze_charging_history.py)"),
+    "chargestore": ("charging_history", "chargestore", "cli", "Ingest and summarize Tesla charging history exports (chargestore.py)"),
+    "cost-diagram": ("misc", "create_cost_bar_diagram", "main", "Plot the annual costs of the charging methods (create_cost_bar_diagram.py)"),
+}
+
+class LazyGroup(click.Group):
+    def list_commands(self, ctx: click.Context):
+        return list(COMMANDS)
+
+    def get_command(self, ctx: click.Context, name: str):
+        if name not in COMMANDS:
+            return None
+        folder, module, command, _ = COMMANDS[name]
+        # The scripts import their neighbours as top-level modules
+        path = str(ROOT / folder)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+        return getattr(importlib.import_module(module), command)
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter):
+        with formatter.section("Commands"):
+            formatter.write_dl([(name, COMMANDS[name][3]) for name in self.list_commands(ctx)])
+
+@click.group(cls=LazyGroup)
+def cli():
+    """
+    All scripts of the project as subcommands. Relative paths such as the default data and configuration
+    files refer to the current directory, as when the scripts are run directly.
+    """
+
+if __name__ == '__main__':
+    cli()
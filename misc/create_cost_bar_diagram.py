@@ -1,29 +1,37 @@
-import matplotlib.pyplot as plt
+import click
 
-# Daten
-methods = ["Unreguliertes Laden", "Voreingestelltes Laden", "Überschussladen \n(mit Akkuinformation)", "Überschussladen \n(ohne Akkuinformation)"]
-costs = [1286.51, 1044.23, 931.83, 1031.10]
-colors = ['green', 'red', 'orange', 'blue']
+@click.command()
+def main():
+    """Bar diagram of the annual costs of the four charging methods."""
+    import matplotlib.pyplot as plt
 
-# Balkendiagramm erstellen
-plt.figure(figsize=(10, 6))
-plt.bar(methods, costs, color=colors)
+    # Daten
+    methods = ["Unreguliertes Laden", "Voreingestelltes Laden", "Überschussladen \n(mit Akkuinformation)", "Überschussladen \n(ohne Akkuinformation)"]
+    costs = [1286.51, 1044.23, 931.83, 1031.10]
+    colors = ['green', 'red', 'orange', 'blue']
 
-# Titel und Achsenbeschriftung
-plt.title("Jährliche Gesamtkosten der Methoden", fontsize=14)
-plt.ylabel("Kosten (€)", fontsize=12)
+    # Balkendiagramm erstellen
+    plt.figure(figsize=(10, 6))
+    plt.bar(methods, costs, color=colors)
 
-# Gitter
-plt.grid(axis='y', linestyle='--', alpha=0.7)
+    # Titel und Achsenbeschriftung
+    plt.title("Jährliche Gesamtkosten der Methoden", fontsize=14)
+    plt.ylabel("Kosten (€)", fontsize=12)
 
-# Werte über den Balken anzeigen
-for i, value in enumerate(costs):
-    plt.text(i, value + 20, f"{value:.2f} €", ha='center', va='bottom', fontsize=10)
+    # Gitter
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
 
-# Rahmen oben und rechts entfernen
-for pos in ['right', 'top']:
-    plt.gca().spines[pos].set_visible(False)
+    # Werte über den Balken anzeigen
+    for i, value in enumerate(costs):
+        plt.text(i, value + 20, f"{value:.2f} €", ha='center', va='bottom', fontsize=10)
 
-# Diagramm anzeigen
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+    # Rahmen oben und rechts entfernen
+    for pos in ['right', 'top']:
+        plt.gca().spines[pos].set_visible(False)
+
+    # Diagramm anzeigen
+    plt.tight_layout()
+    plt.show()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+import json
+import os
+from typing import List
+
+from lazyimport import lazy_import
+from binaryoutput import load_output
+from resampling import NANOSECONDS_PER_HOUR, median_interval
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+# Fallback for outputs too short to tell their interval
+DEFAULT_INTERVAL_HOURS = 5 / 60
+
+GRANULARITIES = ["day", "week", "month", "year", "total"]
+
+PERIOD_FREQUENCIES = {
+    "day": "D",
+    "month": "M",
+    "year": "Y",
+}
+
+# Pre-aggregated energy per hour and per day; every granularity and the hour of the week follow from one of them
+ENERGY_RESOLUTIONS = {
+    "hour": NANOSECONDS_PER_HOUR,
+    "day": 24 * NANOSECONDS_PER_HOUR,
+}
+ENERGY_CACHE_VERSION = 1
+ENERGY_CACHE_SUFFIX = ".energy.npz"
+
+def charging_methods(df: pd.DataFrame) -> List[str]:
+    # Simulation outputs have power columns, pre-aggregated energy tables have energy columns
+    suffix = "_charging_power" if any(column.endswith("_charging_power") for column in df.columns) else "_pv_energy"
+    return [column[:-len(suffix)] for column in df.columns if column.endswith(suffix)]
+
+def output_interval_hours(df: pd.DataFrame) -> float:
+    """
+    The interval between two rows of a simulation output, i.e. 1 / calls_per_hour of the run that produced it.
+    """
+    interval = median_interval(df["time"].to_numpy())
+    return interval / NANOSECONDS_PER_HOUR if interval else DEFAULT_INTERVAL_HOURS
+
+def period_keys(times: pd.Series, granularity: str) -> pd.Series:
+    if granularity == "total":
+        return pd.Series("total", index=times.index)
+    if granularity == "week":
+        # Vectorized strftime('%Y-%U') as used by the weekly plot: week 1 starts on the first Sunday of the year
+        weekday_from_sunday = (times.dt.dayofweek + 1) % 7
+        week = (times.dt.dayofyear - 1 + 7 - weekday_from_sunday) // 7
+        return times.dt.year.astype(str) + "-" + week.astype(str).str.zfill(2)
+    return times.dt.to_period(PERIOD_FREQUENCIES[granularity]).astype(str)
+
+def slot_energy(df: pd.DataFrame, methods: List[str], interval_hours: float = None) -> pd.DataFrame:
+    """
+    Splits the charged energy of every interval into PV and grid energy (Wh) for all methods at once.
+    Without interval_hours the interval of the output itself is used.
+    """
+    if methods and f"{methods[0]}_pv_energy" in df.columns:
+        # Already aggregated
+        return df[[f"{m}_{kind}_energy" for m in methods for kind in ("pv", "grid")]]
+    if interval_hours is None:
+        interval_hours = output_interval_hours(df)
+    surplus = df["surplus"].to_numpy(dtype=float)[:, np.newaxis]
+    power = df[[f"{m}_charging_power" for m in methods]].to_numpy(dtype=float)
+    pv = np.minimum(power, surplus) * interval_hours
+    grid = np.clip(power - surplus, 0, None) * interval_hours
+    columns = {}
+    for i, m in enumerate(methods):
+        columns[f"{m}_pv_energy"] = pv[:, i]
+        columns[f"{m}_grid_energy"] = grid[:, i]
+    return pd.DataFrame(columns, index=df.index)
+
+def energy_table(df: pd.DataFrame, resolution: str = "hour", methods: List[str] = None, interval_hours: float = None) -> pd.DataFrame:
+    """
+    Sums the PV and grid energy (Wh) of every method per hour or day. The table has a 'time' column with
+    the start of every hour or day that has output rows and can be passed wherever an output is accepted.
+    """
+    methods = methods or charging_methods(df)
+    energy = slot_energy(df, methods, interval_hours)
+    step = ENERGY_RESOLUTIONS[resolution]
+    bucket = df["time"].to_numpy(dtype="datetime64[ns]").view(np.int64) // step
+    starts, index = np.unique(bucket, return_inverse=True)
+    table = {"time": (starts * step).view("datetime64[ns]")}
+    for column in energy.columns:
+        table[column] = np.bincount(index, weights=energy[column].to_numpy(dtype=float), minlength=len(starts))
+    return pd.DataFrame(table)
+
+def load_energy(path: str, resolution: str = "hour") -> pd.DataFrame:
+    """
+    Returns the energy table of a simulation output (CSV or binary) at the given resolution. All resolutions
+    are computed in one pass on first use and stored next to the output (<path>.energy.npz); the cache is
+    rebuilt when the size or modification time of the output changes.
+    """
+    cache_path = path + ENERGY_CACHE_SUFFIX
+    stat = os.stat(path)
+    meta = {"version": ENERGY_CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    try:
+        with np.load(cache_path) as stored:
+            if json.loads(stored["__meta__"].item()) == meta:
+                columns = stored[f"{resolution}_columns"].tolist()
+                return pd.DataFrame({name: stored[f"{resolution}_{index}"] for index, name in enumerate(columns)})
+    except (OSError, KeyError, ValueError):
+        pass
+
+    hourly = energy_table(load_output(path), "hour")
+    tables = {"hour": hourly, "day": energy_table(hourly, "day")}
+    arrays = {"__meta__": np.array(json.dumps(meta))}
+    for name, table in tables.items():
+        arrays[f"{name}_columns"] = np.array(table.columns, dtype=str)
+        for index, column in enumerate(table.columns):
+            arrays[f"{name}_{index}"] = table[column].to_numpy()
+    temporary = f"{cache_path}.{os.getpid()}.tmp.npz"
+    try:
+        np.savez(temporary, **arrays)
+        os.replace(temporary, cache_path)
+    except OSError:
+        # Read-only location: aggregate again next time
+        pass
+    return tables[resolution]
+
+def aggregate_energy(df: pd.DataFrame, granularity: str = "total", methods: List[str] = None, interval_hours: float = None) -> pd.DataFrame:
+    """
+    Computes PV energy, grid energy, total energy (kWh) and PV share (%) of every method per period
+    in one grouped pass. The result has one row per period and columns '<method>_<metric>'.
+    df is a simulation output or an energy table of at most the resolution of the granularity.
+    """
+    methods = methods or charging_methods(df)
+    energy = slot_energy(df, methods, interval_hours) / 1000
+    totals = energy.groupby(period_keys(df["time"], granularity).to_numpy()).sum()
+    totals.index.name = "period"
+
+    result = {}
+    for m in methods:
+        pv_energy = totals[f"{m}_pv_energy"]
+        grid_energy = totals[f"{m}_grid_energy"]
+        total_energy = pv_energy + grid_energy
+        result[f"{m}_pv_energy"] = pv_energy
+        result[f"{m}_grid_energy"] = grid_energy
+        result[f"{m}_total_energy"] = total_energy
+        result[f"{m}_pv_share"] = (pv_energy / total_energy * 100).where(total_energy > 0, 0.0)
+    return pd.DataFrame(result, index=totals.index)
+
+HOURS_PER_WEEK = 7 * 24
+
+def energy_by_hour_of_week(df: pd.DataFrame, methods: List[str] = None, interval_hours: float = None):
+    """
+    Sums the PV and grid energy (kWh) of every method into 168 hour-of-week buckets
+    (index = weekday * 24 + hour, Monday == 0). Returns two arrays of shape (168, len(methods)).
+    df is a simulation output or an hourly energy table.
+    """
+    methods = methods or charging_methods(df)
+    energy = slot_energy(df, methods, interval_hours) / 1000
+    bucket = (df["time"].dt.dayofweek * 24 + df["time"].dt.hour).to_numpy()
+    pv = np.empty((HOURS_PER_WEEK, len(methods)))
+    grid = np.empty((HOURS_PER_WEEK, len(methods)))
+    for i, m in enumerate(methods):
+        pv[:, i] = np.bincount(bucket, weights=energy[f"{m}_pv_energy"].to_numpy(), minlength=HOURS_PER_WEEK)
+        grid[:, i] = np.bincount(bucket, weights=energy[f"{m}_grid_energy"].to_numpy(), minlength=HOURS_PER_WEEK)
+    return pv, grid
@@ -0,0 +1,227 @@
+from __future__ import annotations
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import click
+
+from lazyimport import lazy_import
+from aggregation import GRANULARITIES, aggregate_energy
+from datacache import load_csv
+from simulation import create_simulators, filter_date_range, load_config, microseconds_to_time, precompute_arrays, run_simulation
+from tariffs import flat_tariffs, tariff_costs
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def generate_solar_data(years: int, resolution_minutes: int, start: str = "2024-01-01", seed: int = 0) -> pd.DataFrame:
+    """
+    Generates Solarlog-shaped data (time, output, consumption in W) with seasonal day length,
+    random daily cloudiness, a base load and an evening consumption peak.
+    """
+    rng = np.random.default_rng(seed)
+    first = pd.Timestamp(start)
+    times = pd.date_range(first, first + pd.DateOffset(years=years), freq=f"{resolution_minutes}min", inclusive="left")
+    day_index = ((times - first) // pd.Timedelta(days=1)).to_numpy()
+    day_of_year = times.dayofyear.to_numpy()
+    hour = times.hour.to_numpy() + times.minute.to_numpy() / 60
+
+    # Longest days around the summer solstice (day 172)
+    season = np.cos(2 * np.pi * (day_of_year - 172) / 365)
+    day_length = 12 + 4 * season
+    sunrise = 13 - day_length / 2
+    daylight = np.clip((hour - sunrise) / day_length, 0, 1)
+    clouds = rng.uniform(0.15, 1.0, day_index.max() + 1)[day_index]
+    peak_power = 9000 * (0.65 + 0.35 * season)
+    output = peak_power * np.sin(np.pi * daylight) ** 1.5 * clouds * rng.uniform(0.9, 1.0, len(times))
+
+    evening_peak = 900 * np.exp(-((hour - 19) ** 2) / 2)
+    consumption = 250 + evening_peak + rng.gamma(2.0, 60.0, len(times))
+    spikes = rng.random(len(times)) < 0.02
+    consumption[spikes] += rng.uniform(1000, 3000, spikes.sum())
+
+    return pd.DataFrame({
+        "time": times,
+        "output": np.round(output).astype(np.int64),
+        "consumption": np.round(consumption).astype(np.int64),
+    })
+
+def measure(function, repeat: int, trace_memory: bool = True):
+    """
+    Returns the best wall time of repeat runs and the peak traced memory (MB) of one extra run.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    peak_mb = None
+    if trace_memory:
+        tracemalloc.start()
+        function()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return min(timings), peak_mb, result
+
+def stage_result(seconds: float, peak_mb: float, rows: int) -> dict:
+    return {
+        "seconds": seconds,
+        "rows": rows,
+        # No throughput for stages without rows or too fast to be timed
+        "rows_per_second": rows / seconds if rows and seconds > 0 else None,
+        "peak_memory_mb": peak_mb,
+    }
+
+def stage_line(name: str, stage: dict) -> str:
+    # Missing values are shown as '-', like describe in live.py
+    rows_per_second = f"{stage['rows_per_second']:,.0f}" if stage["rows_per_second"] is not None else "-"
+    peak = f"{stage['peak_memory_mb']:.1f}" if stage["peak_memory_mb"] is not None else "-"
+    return f"{name:<28}{stage['seconds']:>12.4f}{rows_per_second:>14}{peak:>10}"
+
+def benchmark_steps(df: pd.DataFrame, config, repeat: int) -> dict:
+    arrays = precompute_arrays(df, config)
+    selected = np.flatnonzero(arrays["in_window"])
+    time_left = arrays["remaining_minutes"][selected].tolist()
+    current_times = [microseconds_to_time(us) for us in arrays["time_of_day"][selected].tolist()]
+    output = arrays["output"][selected].tolist()
+    consumption = arrays["consumption"][selected].tolist()
+    start_charge = config.capacity * config.starting_soc / 100
+
+    stages = {}
+    for name in create_simulators(config):
+        def scalar_steps():
+            simulator = create_simulators(config)[name]
+            charge = start_charge
+            for args in zip(time_left, current_times, output, consumption):
+                charge += simulator.step(args[0], charge, *args[1:]) / config.calls_per_hour
+
+        def batch_steps():
+            create_simulators(config)[name].step_many(time_left, start_charge, current_times, output, consumption)
+
+        seconds, peak, _ = measure(scalar_steps, repeat, trace_memory=False)
+        stages[f"step_{name}"] = stage_result(seconds, peak, len(selected))
+        seconds, peak, _ = measure(batch_steps, repeat, trace_memory=False)
+        stages[f"step_many_{name}"] = stage_result(seconds, peak, len(selected))
+    return stages
+
+def run_benchmarks(datafile: str, configfile: str, repeat: int, include_rows: bool) -> dict:
+    config = load_config(configfile)
+    stages = {}
+
+    seconds, peak, raw_df = measure(lambda: pd.read_csv(datafile, parse_dates=["time"]), repeat)
+    stages["load_csv_pandas"] = stage_result(seconds, peak, len(raw_df))
+    load_csv(datafile)  # builds the cache, the stage below measures warm loads
+    seconds, peak, df = measure(lambda: load_csv(datafile), repeat)
+    stages["load_csv_cached"] = stage_result(seconds, peak, len(df))
+
+    # Simulate the whole span of the data at its own resolution
+    interval = df["time"].diff().median()
+    config = config.model_copy(update={
+        "start_date": df["time"].iloc[0].date(),
+        "end_date": df["time"].iloc[-1].date(),
+        "calls_per_hour": int(pd.Timedelta(hours=1) / interval),
+    })
+    df = filter_date_range(df, config)
+
+    seconds, peak, output_df = measure(lambda: run_simulation(df, config), repeat)
+    stages["simulation_vectorized"] = stage_result(seconds, peak, len(df))
+    if include_rows:
+        seconds, peak, _ = measure(lambda: run_simulation(df, config, "rows"), 1, trace_memory=False)
+        stages["simulation_rows"] = stage_result(seconds, peak, len(df))
+
+    stages.update(benchmark_steps(df, config, repeat))
+
+    interval_hours = 1 / config.calls_per_hour
+    for granularity in GRANULARITIES:
+        seconds, peak, _ = measure(lambda: aggregate_energy(output_df, granularity, interval_hours=interval_hours), repeat)
+        stages[f"aggregate_{granularity}"] = stage_result(seconds, peak, len(output_df))
+    tariffs = flat_tariffs(np.linspace(0.05, 0.15, 10).tolist(), np.linspace(0.25, 0.45, 100).tolist())
+    methods = [column[:-len("_charging_power")] for column in output_df.columns if column.endswith("_charging_power")]
+    seconds, peak, _ = measure(lambda: tariff_costs(output_df, tariffs, methods, interval_hours), repeat)
+    stages["tariff_costs_1000"] = stage_result(seconds, peak, len(output_df))
+
+    with tempfile.TemporaryDirectory() as directory:
+        out = os.path.join(directory, "out.csv")
+        seconds, peak, _ = measure(lambda: output_df.to_csv(out, index=False), repeat)
+        stages["write_output_csv"] = stage_result(seconds, peak, len(output_df))
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "datafile": datafile,
+        "input_rows": len(df),
+        "output_rows": len(output_df),
+        "calls_per_hour": config.calls_per_hour,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": stages,
+    }
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.option("--years", default=1, type=int, help="Number of years to generate")
+@click.option("--resolution", default=5, type=int, help="Interval between samples in minutes")
+@click.option("--start", default="2024-01-01", help="First day, in 'YYYY-MM-DD' format")
+@click.option("--seed", default=0, type=int, help="Random seed")
+@click.option("--out", default="synthetic.csv", help="Output *.csv file")
+def generate(years: int, resolution: int, start: str, seed: int, out: str):
+    """
+    Writes synthetic Solarlog data (time, output, consumption) for the given number of years.
+    """
+    df = generate_solar_data(years, resolution, start, seed)
+    df.to_csv(out, index=False)
+    click.echo(f"{len(df)} rows written to {out}")
+
+@cli.command()
+@click.option("--datafile", default=None, help="Data *.csv file; synthetic data is generated if omitted")
+@click.option("--configfile", default="config.json", help="JSON configuration file")
+@click.option("--years", default=1, type=int, help="Years of synthetic data if no data file is given")
+@click.option("--resolution", default=5, type=int, help="Resolution of synthetic data in minutes")
+@click.option("--repeat", default=3, type=int, help="Runs per stage, the best time is reported")
+@click.option("--include-rows", is_flag=True, help="Also benchmark the slow per-row reference engine")
+@click.option("--out", default="benchmark.json", help="Output *.json file")
+def run(datafile: str, configfile: str, years: int, resolution: int, repeat: int, include_rows: bool, out: str):
+    """
+    Times CSV loading, the simulation engines, every algorithm's step/step_many and the evaluation metrics.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        if datafile is None:
+            datafile = os.path.join(directory, f"synthetic_{years}y_{resolution}min.csv")
+            generate_solar_data(years, resolution).to_csv(datafile, index=False)
+        results = run_benchmarks(datafile, configfile, repeat, include_rows)
+
+    with open(out, "w") as result_file:
+        json.dump(results, result_file, indent=4)
+    click.echo(f"{'Stage':<28}{'Time (s)':>12}{'Rows/s':>14}{'Peak MB':>10}")
+    for name, stage in results["stages"].items():
+        click.echo(stage_line(name, stage))
+    click.echo(f"Results saved in {out}")
+
+@cli.command()
+@click.argument("baseline", type=click.Path(exists=True))
+@click.argument("current", type=click.Path(exists=True))
+def compare(baseline: str, current: str):
+    """
+    Compares the stage timings of two benchmark result files.
+    """
+    with open(baseline) as baseline_file, open(current) as current_file:
+        before = json.load(baseline_file)["stages"]
+        after = json.load(current_file)["stages"]
+    click.echo(f"{'Stage':<28}{'Before (s)':>12}{'After (s)':>12}{'Speedup':>10}")
+    for name in [stage for stage in before if stage in after]:
+        speedup = before[name]["seconds"] / after[name]["seconds"] if after[name]["seconds"] > 0 else float("inf")
+        color = "green" if speedup >= 1.05 else "red" if speedup <= 0.95 else None
+        click.echo(click.style(f"{name:<28}{before[name]['seconds']:>12.4f}{after[name]['seconds']:>12.4f}{speedup:>9.2f}x", fg=color))
+
+if __name__ == '__main__':
+    cli()
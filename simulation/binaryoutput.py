@@ -0,0 +1,122 @@
+from __future__ import annotations
+import json
+import struct
+from pydantic import BaseModel
+
+from lazyimport import lazy_import
+from datacache import load_csv
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+MAGIC = b"SIMOUT\x00\x02"
+# Version 1 stored the timestamps as int64 nanoseconds and all other columns as float32; it is still read
+MAGICS = (b"SIMOUT\x00\x01", MAGIC)
+ALIGNMENT = 64
+NANOSECONDS_PER_SECOND = 1_000_000_000
+# Everything but the timestamps fits float32: SoC values need ~7 digits at most. Columns holding whole
+# numbers only (powers in watts) are stored in the smallest of these integer types that fits
+DEFAULT_DTYPE = "<f4"
+INTEGER_DTYPES = ["<i2", "<i4"]
+
+def is_binary_output(path: str) -> bool:
+    with open(path, "rb") as output_file:
+        return output_file.read(len(MAGIC)) in MAGICS
+
+def encode_column(name: str, values: np.ndarray):
+    """
+    Returns the header entry and the stored array of one column. Timestamps become int32 seconds after
+    the first timestamp (the 'epoch' in nanoseconds), or stay int64 nanoseconds if they are not whole
+    seconds apart or span more than int32; values become float32, or int16/int32 if they are whole numbers.
+    """
+    if values.dtype.kind == "M":
+        nanoseconds = values.astype("datetime64[ns]").view(np.int64)
+        epoch = int(nanoseconds[0]) if len(nanoseconds) else 0
+        seconds, remainder = np.divmod(nanoseconds - epoch, NANOSECONDS_PER_SECOND)
+        if not remainder.any() and (len(seconds) == 0 or seconds.max() <= np.iinfo(np.int32).max):
+            return {"name": name, "dtype": "<i4", "epoch": epoch}, seconds.astype("<i4")
+        return {"name": name, "dtype": "<i8"}, nanoseconds
+    values = values.astype(DEFAULT_DTYPE)
+    # NaN never equals its rounded value, so columns with missing values stay float32
+    if len(values) and np.array_equal(values, np.round(values)):
+        for dtype in INTEGER_DTYPES:
+            limits = np.iinfo(dtype)
+            if limits.min <= values.min() and values.max() <= limits.max:
+                return {"name": name, "dtype": dtype}, values.astype(dtype)
+    return {"name": name, "dtype": DEFAULT_DTYPE}, values
+
+def decode_column(column: dict, values: np.ndarray) -> np.ndarray:
+    if "epoch" in column:
+        return (column["epoch"] + values.astype(np.int64) * NANOSECONDS_PER_SECOND).view("datetime64[ns]")
+    if column["name"] == "time":
+        return values.view("datetime64[ns]")
+    if np.dtype(column["dtype"]).kind == "i":
+        # Whole-watt columns are read as float32 like all other values, so arithmetic on them cannot overflow
+        return values.astype(DEFAULT_DTYPE)
+    return values
+
+def aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def write_output(path: str, df: pd.DataFrame, config: BaseModel = None):
+    """
+    Writes a simulation result as a columnar binary file: magic, header length, a JSON header with the
+    configuration and the column layout, then every column as one contiguous, aligned block, encoded
+    by encode_column.
+    """
+    columns = []
+    arrays = []
+    for name in df.columns:
+        column, values = encode_column(name, df[name].to_numpy())
+        columns.append(column)
+        arrays.append(values)
+
+    def header_bytes(data_start):
+        offset = data_start
+        for column, values in zip(columns, arrays):
+            column["offset"] = offset
+            offset = aligned(offset + values.nbytes)
+        header = {"rows": len(df), "columns": columns, "config": config.model_dump(mode="json") if config is not None else None}
+        return json.dumps(header).encode()
+
+    # The header contains the offsets, which depend on the header size; grow the reserved space until it fits
+    data_start = aligned(len(MAGIC) + 4 + len(header_bytes(0)))
+    header = header_bytes(data_start)
+    while aligned(len(MAGIC) + 4 + len(header)) > data_start:
+        data_start = aligned(len(MAGIC) + 4 + len(header))
+        header = header_bytes(data_start)
+
+    with open(path, "wb") as output_file:
+        output_file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for column, values in zip(columns, arrays):
+            output_file.write(b"\0" * (column["offset"] - output_file.tell()))
+            output_file.write(values.tobytes())
+
+def read_header(path: str) -> dict:
+    with open(path, "rb") as output_file:
+        if output_file.read(len(MAGIC)) not in MAGICS:
+            raise ValueError(f"{path} is not a binary simulation output")
+        (length,) = struct.unpack("<I", output_file.read(4))
+        return json.loads(output_file.read(length))
+
+def read_output(path: str) -> pd.DataFrame:
+    """
+    Memory-maps a binary simulation output; the float32 columns of the returned DataFrame share their
+    memory with the file, timestamps and whole-number columns are decoded into memory.
+    """
+    header = read_header(path)
+    data = {}
+    for column in header["columns"]:
+        if header["rows"] == 0:
+            values = np.empty(0, dtype=column["dtype"])
+        else:
+            values = np.memmap(path, dtype=column["dtype"], mode="r", offset=column["offset"], shape=(header["rows"],))
+        data[column["name"]] = decode_column(column, values)
+    return pd.DataFrame(data, copy=False)
+
+def load_output(path: str) -> pd.DataFrame:
+    """
+    Loads a simulation output in either format, recognizing binary files by their magic bytes.
+    """
+    return read_output(path) if is_binary_output(path) else load_csv(path)
@@ -1,6 +1,12 @@
+from __future__ import annotations
 from datetime import time
 import math
 
+from lazyimport import lazy_import
+
+np = lazy_import("numpy")
+
+
 def round_up_to_charging_speed(surplus, step_size, min_speed):
     return max(math.ceil(max(surplus, min_speed) / step_size) * step_size, min_speed)
 
@@ -13,18 +19,59 @@ def round_to_charging_speed(surplus, step_size, min_speed):
     down = round_down_to_charging_speed(surplus, step_size, min_speed)
     return up if abs(up - surplus) < abs(down - surplus) else down
 
+def no_rounding(surplus, step_size, min_speed):
+    return surplus
+
+ROUNDING_FUNCTIONS = {
+    "round_down": round_down_to_charging_speed,
+    "round_up": round_up_to_charging_speed,
+    "balanced": round_to_charging_speed
+}
+
+def get_rounding_function(charge_mode):
+    return ROUNDING_FUNCTIONS.get(charge_mode, no_rounding)
+
 def round_to_step_size(surplus, step_size, min_speed, charge_mode):
-    rounding_functions = {
-        "round_down": round_down_to_charging_speed,
-        "round_up": round_up_to_charging_speed,
-        "balanced": round_to_charging_speed
-    }
-    return rounding_functions.get(charge_mode, lambda x, y, z: x)(surplus, step_size, min_speed)
+    return get_rounding_function(charge_mode)(surplus, step_size, min_speed)
+
+def as_list(values):
+    return values.tolist() if hasattr(values, "tolist") else list(values)
 
 class BaseAlgorithm:
+    # Attributes that change while stepping and have to be persisted to resume a simulation
+    state_attributes = ()
+
     def step(self, time_left, current_charge, current_time, solar_output, consumption):
         raise NotImplementedError("Subclasses must implement step method")
 
+    def set_date(self, day):
+        """
+        Called with the date before the first step of every day; only algorithms that depend on it use it.
+        """
+        pass
+
+    def get_state(self):
+        return {name: getattr(self, name) for name in self.state_attributes}
+
+    def set_state(self, state):
+        for name in self.state_attributes:
+            setattr(self, name, state[name])
+
+    def step_many(self, time_left, current_charge, current_time, solar_output, consumption):
+        """
+        Runs consecutive steps over whole arrays of intervals, starting at the scalar current_charge.
+        Returns the charging power and the resulting charge (Wh) after each interval as arrays.
+        """
+        charging_power = []
+        charge_after = []
+        charge = current_charge
+        for args in zip(as_list(time_left), current_time, as_list(solar_output), as_list(consumption)):
+            power = self.step(args[0], charge, *args[1:])
+            charge += power / self.calls_per_hour
+            charging_power.append(power)
+            charge_after.append(charge)
+        return np.array(charging_power, dtype=float), np.array(charge_after, dtype=float)
+
 class UncontrolledCharging(BaseAlgorithm):
     def __init__(self, max_charging_speed, calls_per_hour, maximum_charge):
         self.max_charging_speed = max_charging_speed
@@ -38,6 +85,10 @@ class UncontrolledCharging(BaseAlgorithm):
         remaining_charge = self.maximum_charge - current_charge
         return min(remaining_charge, max_charge_in_interval) * self.calls_per_hour
 
+    def step_many(self, time_left, current_charge, current_time, solar_output, consumption):
+        active = np.ones(len(time_left), dtype=bool)
+        return capped_charging(active, current_charge, self.maximum_charge, self.max_charging_speed, self.calls_per_hour)
+
 class PresetCharging(BaseAlgorithm):
     def __init__(self, calls_per_hour, maximum_charge, preset_charging_speed, preset_start_time, preset_end_time):
         self.calls_per_hour = calls_per_hour
@@ -53,7 +104,13 @@ class PresetCharging(BaseAlgorithm):
         remaining_charge = self.maximum_charge - current_charge
         return min(remaining_charge, max_charge_in_interval) * self.calls_per_hour
 
+    def step_many(self, time_left, current_charge, current_time, solar_output, consumption):
+        active = np.array([self.start_time <= t <= self.end_time for t in current_time], dtype=bool)
+        return capped_charging(active, current_charge, self.maximum_charge, self.preset_charging_speed, self.calls_per_hour)
+
 class SurplusChargingBase(BaseAlgorithm):
+    state_attributes = ("last_surplus",)
+
     def __init__(self, max_charging_speed, calls_per_hour, minimum_charge, maximum_charge, delayed, min_speed, step_size, charge_mode):
         self.max_charging_speed = max_charging_speed
         self.calls_per_hour = calls_per_hour
@@ -88,6 +145,38 @@ class SurplusChargingBase(BaseAlgorithm):
             return min(rounded_surplus, self.max_charging_speed)
         return 0
 
+    def step_many(self, time_left, current_charge, current_time, solar_output, consumption):
+        # Same decisions as step(), inlined so a whole day runs without per-interval method calls
+        calls_per_hour = self.calls_per_hour
+        minimum_charge = self.minimum_charge
+        maximum_charge = self.maximum_charge
+        max_charging_speed = self.max_charging_speed
+        max_charge_in_interval = max_charging_speed / calls_per_hour
+        round_surplus = get_rounding_function(self.charge_mode)
+        last_surplus = self.last_surplus
+        charge = current_charge
+        charging_power = []
+        charge_after = []
+        for minutes_left, output, consumed in zip(as_list(time_left), as_list(solar_output), as_list(consumption)):
+            if charge >= maximum_charge:
+                power = 0
+            else:
+                surplus = last_surplus if self.delayed else (output - consumed)
+                last_surplus = output - consumed
+                if minutes_left <= (minimum_charge - charge) / max_charging_speed * 60:
+                    power = min(max(maximum_charge - charge, 0), max_charge_in_interval) * calls_per_hour
+                elif surplus <= 0:
+                    power = 0
+                elif maximum_charge - charge < surplus / calls_per_hour:
+                    power = (maximum_charge - charge) * calls_per_hour
+                else:
+                    power = min(round_surplus(surplus, self.step_size, self.min_speed), max_charging_speed)
+            charge += power / calls_per_hour
+            charging_power.append(power)
+            charge_after.append(charge)
+        self.last_surplus = last_surplus
+        return np.array(charging_power, dtype=float), np.array(charge_after, dtype=float)
+
 class SurplusChargingAllInformation(SurplusChargingBase):
     def step(self, time_left, current_charge, current_time, solar_output, consumption):
         if current_charge >= self.maximum_charge:
@@ -97,16 +186,90 @@ class SurplusChargingAllInformation(SurplusChargingBase):
         return charge_rate if charge_rate is not None else self.charge_surplus(surplus, current_charge)
 
 class SurplusChargingNoSocInformation(SurplusChargingBase):
+    state_attributes = ("last_surplus", "minimum_charge", "minimum_charge_set")
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.minimum_charge_set = False
 
-    def step(self, time_left, current_charge, current_time, solar_output, consumption):
+    def set_minimum_charge(self, current_charge):
         if self.minimum_charge_set == False:
             self.minimum_charge = min(current_charge + self.minimum_charge, self.maximum_charge)
             self.minimum_charge_set = True
+
+    def step_many(self, time_left, current_charge, current_time, solar_output, consumption):
+        if len(time_left) > 0:
+            self.set_minimum_charge(current_charge)
+        return super().step_many(time_left, current_charge, current_time, solar_output, consumption)
+
+    def step(self, time_left, current_charge, current_time, solar_output, consumption):
+        self.set_minimum_charge(current_charge)
         if current_charge >= self.maximum_charge:
             return 0
         surplus = self.calculate_surplus(solar_output, consumption)
         charge_rate = self.charge_to_minimum(time_left, current_charge)
         return charge_rate if charge_rate is not None else self.charge_surplus(surplus, current_charge)
+
+class SurplusChargingForecast(SurplusChargingBase):
+    """
+    Surplus charging that looks ahead: the surplus expected for the rest of the charging window comes from
+    a surplus profile (mean or quantile per period of the year and slot of the day). While it covers the
+    energy still missing to minimum_charge, it charges like SurplusChargingAllInformation. Otherwise the
+    shortfall has to come from the grid anyway, so it already charges now, at the lowest charging speed
+    above the current surplus: all surplus is used, even below min_speed, and the grid tops it up.
+    """
+    def __init__(self, *args, profile, quantile, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile = profile
+        expected = np.clip(profile.table(quantile), 0, self.max_charging_speed) / profile.slots_per_hour
+        # Expected chargeable surplus (Wh) of all slots of the day before each slot, per period
+        self.expected_before = np.concatenate((np.zeros((len(expected), 1)), np.cumsum(expected, axis=1)), axis=1)
+        self.expected_today = self.expected_before[0]
+
+    def set_date(self, day):
+        self.expected_today = self.expected_before[self.profile.period_of(day)]
+
+    def expected_energy(self, current_time, time_left):
+        """
+        Expected chargeable surplus (Wh) from the next slot until the end of the charging window.
+        """
+        slots_per_hour = self.profile.slots_per_hour
+        minutes = current_time.hour * 60 + current_time.minute + current_time.second / 60
+        first = int(minutes * slots_per_hour // 60) + 1
+        last = min(int((minutes + time_left) * slots_per_hour // 60) + 1, self.profile.slots)
+        return self.expected_today[last] - self.expected_today[min(first, last)]
+
+    # The decisions depend on the time of day, so the generic loop over step() is used
+    step_many = BaseAlgorithm.step_many
+
+    def step(self, time_left, current_charge, current_time, solar_output, consumption):
+        if current_charge >= self.maximum_charge:
+            return 0
+        surplus = self.calculate_surplus(solar_output, consumption)
+        charge_rate = self.charge_to_minimum(time_left, current_charge)
+        if charge_rate is not None:
+            return charge_rate
+        if self.minimum_charge - current_charge > self.expected_energy(current_time, time_left):
+            power = min(round_up_to_charging_speed(surplus, self.step_size, self.min_speed), self.max_charging_speed)
+            return min(power, (self.maximum_charge - current_charge) * self.calls_per_hour)
+        return self.charge_surplus(surplus, current_charge)
+
+
+def capped_charging(active, current_charge, maximum_charge, charging_speed, calls_per_hour):
+    """
+    Batch form of the fixed-speed charging used by UncontrolledCharging and PresetCharging:
+    charge at charging_speed in every active interval until maximum_charge is reached.
+    """
+    max_charge_in_interval = charging_speed / calls_per_hour
+    charging_power = []
+    charge_after = []
+    charge = current_charge
+    for is_active in active.tolist():
+        if not is_active or charge >= maximum_charge:
+            power = 0
+        else:
+            power = min(maximum_charge - charge, max_charge_in_interval) * calls_per_hour
+        charge += power / calls_per_hour
+        charging_power.append(power)
+        charge_after.append(charge)
+    return np.array(charging_power, dtype=float), np.array(charge_after, dtype=float)
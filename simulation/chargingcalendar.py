@@ -0,0 +1,67 @@
+from __future__ import annotations
+from datetime import date, time, timedelta
+from pydantic import BaseModel, field_validator
+from typing import Dict, List, Optional, Tuple
+
+from lazyimport import lazy_import
+
+np = lazy_import("numpy")
+
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+EPOCH = date(1970, 1, 1)
+
+# A charging window from plug-in to plug-out; None means the vehicle is not plugged in that day
+Window = Optional[Tuple[time, time]]
+
+class Calendar(BaseModel):
+    """
+    Charging windows beyond the weekday/weekend times of the configuration. Windows per weekday replace
+    start/end (Monday to Friday) and weekend_start/weekend_end (Saturday, Sunday), holidays use the
+    Sunday window and exceptions set the window of single dates. null means no charging on that day.
+    """
+    weekdays: Dict[str, Window] = {}
+    holidays: List[date] = []
+    exceptions: Dict[date, Window] = {}
+
+    @field_validator("weekdays")
+    @classmethod
+    def known_weekdays(cls, weekdays):
+        unknown = set(weekdays) - set(WEEKDAYS)
+        if unknown:
+            raise ValueError(f"Unknown weekdays: {', '.join(sorted(unknown))}")
+        return weekdays
+
+def time_to_microseconds(value: time) -> int:
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond
+
+def day_window(config, day: date) -> Window:
+    """
+    The charging window of one date, in order of precedence: exception, holiday, weekday, configuration.
+    """
+    calendar = config.calendar
+    if day in calendar.exceptions:
+        return calendar.exceptions[day]
+    weekday = 6 if day in calendar.holidays else day.weekday()
+    if WEEKDAYS[weekday] in calendar.weekdays:
+        return calendar.weekdays[WEEKDAYS[weekday]]
+    if weekday >= 5:
+        return config.weekend_start, config.weekend_end
+    return config.start, config.end
+
+def compile_windows(config, day: np.ndarray):
+    """
+    Resolves the window of every distinct day once and spreads it over the rows. day holds the days since
+    the epoch of every row; returns window start and end per row in microseconds after midnight. Days
+    without a window get an empty one (start after end), so no time of day lies inside it.
+    """
+    days, day_index = np.unique(day, return_inverse=True)
+    starts = np.empty(len(days), dtype=np.int64)
+    ends = np.empty(len(days), dtype=np.int64)
+    for i, number in enumerate(days.tolist()):
+        window = day_window(config, EPOCH + timedelta(days=number))
+        if window is None:
+            starts[i], ends[i] = 1, 0
+        else:
+            starts[i], ends[i] = time_to_microseconds(window[0]), time_to_microseconds(window[1])
+    return starts[day_index], ends[day_index]
@@ -0,0 +1,107 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+from pydantic import BaseModel
+from typing import List
+
+from lazyimport import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+CHECKPOINT_VERSION = 1
+
+# Modules whose code shapes the simulated output: the algorithms, both engines and the day loop, the charging
+# windows, the resampling of the input and the surplus profile behind the forecast
+ENGINE_MODULES = ["chargeAlgorithms.py", "simulation.py", "chargingcalendar.py", "resampling.py", "surplusprofile.py"]
+
+_engine_version = None
+
+def engine_version() -> str:
+    """
+    Hash of the source of all ENGINE_MODULES, so results of a changed engine or algorithm are never reused.
+    """
+    global _engine_version
+    if _engine_version is None:
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in ENGINE_MODULES:
+            with open(os.path.join(directory, name), "rb") as source:
+                digest.update(name.encode() + source.read())
+        _engine_version = digest.hexdigest()
+    return _engine_version
+
+def config_hash(config: BaseModel, ignore: tuple = ("end_date",)) -> str:
+    """
+    Hash of the normalized configuration and engine version. The end date is ignored by default
+    because extending it only appends days and does not change earlier results.
+    """
+    normalized = {key: value for key, value in config.model_dump(mode="json").items() if key not in ignore}
+    payload = {"config": normalized, "engine": engine_version()}
+    if getattr(config, "surplus_profile", None):
+        # The forecast depends on the content of the profile, which is updated in place
+        with open(config.surplus_profile, "rb") as profile:
+            payload["surplus_profile"] = hashlib.sha256(profile.read()).hexdigest()
+    payload = json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def day_hashes(df: pd.DataFrame, bounds: List[int]) -> List[str]:
+    """
+    Chained hash per day over time, output and consumption: the hash of a day also covers all earlier
+    days, so a change anywhere invalidates the checkpoints from that day on.
+    """
+    columns = [df["time"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+               np.ascontiguousarray(df["output"].to_numpy()),
+               np.ascontiguousarray(df["consumption"].to_numpy())]
+    hashes = []
+    previous = b""
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        digest = hashlib.sha256(previous)
+        for values in columns:
+            digest.update(values.dtype.str.encode())
+            digest.update(values[start:stop].tobytes())
+        hashes.append(digest.hexdigest())
+        previous = digest.digest()
+    return hashes
+
+def load_checkpoints(checkpoint_path: str, digest: str) -> list:
+    try:
+        with open(checkpoint_path) as checkpoint_file:
+            stored = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return []
+    if stored.get("version") != CHECKPOINT_VERSION or stored.get("config_hash") != digest:
+        return []
+    return stored["days"]
+
+def save_checkpoints(checkpoint_path: str, digest: str, checkpoints: list):
+    temporary = f"{checkpoint_path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as checkpoint_file:
+        json.dump({"version": CHECKPOINT_VERSION, "config_hash": digest, "days": checkpoints}, checkpoint_file,
+                  default=lambda value: value.item() if isinstance(value, np.generic) else str(value))
+    os.replace(temporary, checkpoint_path)
+
+def matching_prefix(checkpoints: list, dates: List[str], hashes: List[str]) -> int:
+    count = 0
+    for checkpoint, date, digest in zip(checkpoints, dates, hashes):
+        if checkpoint["date"] != date or checkpoint["hash"] != digest:
+            break
+        count += 1
+    return count
+
+def truncate_output(out: str, rows: int) -> bool:
+    """
+    Cuts the output CSV after its header and the given number of rows.
+    Returns False if the file does not contain that many rows.
+    """
+    try:
+        with open(out, "r+b") as output_file:
+            newlines = np.flatnonzero(np.frombuffer(output_file.read(), dtype=np.uint8) == ord("\n"))
+            if len(newlines) < rows + 1:
+                return False
+            output_file.truncate(newlines[rows] + 1)
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,136 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+from typing import Dict
+
+from lazyimport import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".cache"
+
+def cache_directory(csv_path: str) -> str:
+    return csv_path + CACHE_SUFFIX
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def compact_column(values: np.ndarray) -> np.ndarray:
+    """
+    Stores integer columns as int32 and float columns as float32 whenever this is lossless.
+    """
+    if values.dtype.kind in "iu" and len(values) > 0:
+        if np.iinfo(np.int32).min <= values.min() and values.max() <= np.iinfo(np.int32).max:
+            return values.astype(np.int32)
+    elif values.dtype.kind == "f":
+        compact = values.astype(np.float32)
+        if np.array_equal(compact.astype(values.dtype), values, equal_nan=True):
+            return compact
+    return values
+
+def read_meta(directory: str) -> dict:
+    try:
+        with open(os.path.join(directory, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == CACHE_VERSION else None
+
+def is_valid(meta: dict, csv_path: str, directory: str) -> bool:
+    if meta is None:
+        return False
+    stat = os.stat(csv_path)
+    if meta["size"] != stat.st_size:
+        return False
+    if meta["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    # The file was touched (e.g. checked out again); only its content decides
+    if meta["sha256"] != file_hash(csv_path):
+        return False
+    meta["mtime_ns"] = stat.st_mtime_ns
+    write_meta(directory, meta)
+    return True
+
+def write_meta(directory: str, meta: dict):
+    temporary = os.path.join(directory, f"meta.json.{os.getpid()}.tmp")
+    with open(temporary, "w") as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(temporary, os.path.join(directory, "meta.json"))
+
+def build_cache(csv_path: str, directory: str, time_column: str) -> dict:
+    stat = os.stat(csv_path)
+    columns, dtypes = parse_csv(csv_path, time_column)
+    columns = {name: compact_column(values) for name, values in columns.items()}
+
+    os.makedirs(directory, exist_ok=True)
+    for index, (name, values) in enumerate(columns.items()):
+        temporary = os.path.join(directory, f"{index}.{os.getpid()}.tmp.npy")
+        np.save(temporary, values)
+        os.replace(temporary, os.path.join(directory, f"{index}.npy"))
+    # meta.json is written last and marks the cache as complete
+    meta = {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash(csv_path),
+        "time_column": time_column,
+        "columns": list(columns),
+        "dtypes": dtypes,
+    }
+    write_meta(directory, meta)
+    return columns, meta
+
+def parse_csv(csv_path: str, time_column: str):
+    df = pd.read_csv(csv_path, parse_dates=[time_column])
+    columns = {}
+    dtypes = {}
+    for name in df.columns:
+        if name == time_column:
+            columns[name] = df[name].to_numpy(dtype="datetime64[ns]").view(np.int64)
+            dtypes[name] = "datetime64[ns]"
+        else:
+            columns[name] = df[name].to_numpy()
+            dtypes[name] = columns[name].dtype.str
+    return columns, dtypes
+
+def open_cache(csv_path: str, time_column: str):
+    directory = cache_directory(csv_path)
+    meta = read_meta(directory)
+    if meta is not None and meta["time_column"] == time_column and is_valid(meta, csv_path, directory):
+        columns = {name: np.load(os.path.join(directory, f"{index}.npy"), mmap_mode="r")
+                   for index, name in enumerate(meta["columns"])}
+        return columns, meta
+    try:
+        return build_cache(csv_path, directory, time_column)
+    except OSError:
+        # Read-only location: fall back to parsing the file every time
+        columns, dtypes = parse_csv(csv_path, time_column)
+        return columns, {"dtypes": dtypes}
+
+def load_columns(csv_path: str, time_column: str = "time") -> Dict[str, np.ndarray]:
+    """
+    Returns the columns of a CSV file as (memory-mapped) arrays, converting the file into a
+    columnar cache next to it on first use. Timestamps are int64 nanoseconds since the epoch.
+    """
+    return open_cache(csv_path, time_column)[0]
+
+def load_csv(csv_path: str, time_column: str = "time") -> pd.DataFrame:
+    """
+    Drop-in replacement for pd.read_csv(csv_path, parse_dates=[time_column]) backed by the columnar cache.
+    """
+    columns, meta = open_cache(csv_path, time_column)
+    data = {}
+    for name, values in columns.items():
+        if name == time_column:
+            data[name] = np.asarray(values).view("datetime64[ns]")
+        else:
+            data[name] = np.asarray(values).astype(meta["dtypes"][name], copy=False)
+    return pd.DataFrame(data)
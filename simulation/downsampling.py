@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from lazyimport import lazy_import
+
+np = lazy_import("numpy")
+
+
+DOWNSAMPLING_METHODS = ["minmax", "lttb", "none"]
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices of the minimum and maximum of every bucket of consecutive values, at most max_points in total.
+    Keeps every peak and valley of the series, so the plotted envelope looks the same as with all points.
+    """
+    count = len(y)
+    if count <= max_points or max_points < 2:
+        return np.arange(count)
+    size = -(-count // (max_points // 2))
+    buckets = -(-count // size)
+    # The last bucket is padded with NaN, which nanargmin/nanargmax skip
+    padded = np.full(buckets * size, np.nan)
+    padded[:count] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    indices = np.concatenate((offsets + np.nanargmin(padded, axis=1), offsets + np.nanargmax(padded, axis=1)))
+    return np.unique(indices)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last point and from every bucket in between the point
+    that spans the largest triangle with the point kept before and the mean of the next bucket.
+    """
+    count = len(y)
+    if count <= max_points or max_points < 3:
+        return np.arange(count)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, count - 1, max_points - 1).astype(int)
+    indices = np.empty(max_points, dtype=int)
+    indices[0] = 0
+    indices[-1] = count - 1
+    selected = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else count
+        mean_x = x[stop:next_stop].mean()
+        mean_y = y[stop:next_stop].mean()
+        area = np.abs((x[selected] - mean_x) * (y[start:stop] - y[selected])
+                      - (x[selected] - x[start:stop]) * (mean_y - y[selected]))
+        selected = start + int(np.argmax(area))
+        indices[bucket + 1] = selected
+    return indices
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int, method: str = "minmax"):
+    """
+    Returns x and y reduced to at most max_points points with the given method ('minmax', 'lttb' or 'none').
+    """
+    if method == "none":
+        return x, y
+    if method == "lttb":
+        # Timestamps are compared as nanoseconds
+        numeric_x = x.astype("datetime64[ns]").view(np.int64) if x.dtype.kind == "M" else x
+        indices = lttb_indices(numeric_x, y, max_points)
+    else:
+        indices = minmax_indices(y, max_points)
+    return x[indices], y[indices]
@@ -1,70 +1,58 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from __future__ import annotations
+import multiprocessing
+import os
 import click
 
-@click.group()
-def cli():
-    """Ein CLI-Tool zur Visualisierung und Analyse von Ladedaten."""
-    pass
+from lazyimport import lazy_import
+from binaryoutput import load_output
+from downsampling import DOWNSAMPLING_METHODS, downsample
+from profiling import profile_options, profiler, setup_profiling
+from aggregation import GRANULARITIES, aggregate_energy, charging_methods, load_energy
+from tariffs import flat_tariffs, load_tariffs, parse_price_values, tariff_costs
 
-@cli.command()
-@click.option('--csv-file', required=True, type=str, help='Pfad zur CSV-Datei')
-@click.option('--method', default='all', type=click.Choice(['all', 'uncontrolled', 'preset', 'surplus_all', 'surplus_no_soc']), help='Ausgewähltes Ladeverfahren (Standard: alle)')
-def plot_weekly_pv_share(csv_file, method):
-    """
-    Zeichnet den wöchentlichen PV-Anteil für ein ausgewähltes Ladeverfahren oder alle Verfahren über den gesamten Zeitraum.
-    """
-    df = pd.read_csv(csv_file, parse_dates=['time'])
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
-    # Zeitintervall (5 Minuten)
-    time_interval_hours = 5 / 60
 
-    # Woche und Jahr extrahieren
-    df['year_week'] = df['time'].dt.strftime('%Y-%U')
+METHOD_TITLES = {
+    "uncontrolled": "Unreguliertes Laden",
+    "preset": "Voreingestelltes Laden",
+    "surplus_all": "Überschussladen mit allen Informationen",
+    "surplus_no_soc": "Überschussladen ohne Akkuinformationen",
+    "surplus_forecast": "Überschussladen mit Prognose",
+    "optimal": "Optimales Laden (perfekte Vorhersage)",
+    "fleet": "Überschussladen der Flotte"
+}
 
-    methods = ["uncontrolled", "preset", "surplus_all", "surplus_no_soc"]
-    method_titles = {
-        "uncontrolled": "Unreguliertes Laden",
-        "preset": "Voreingestelltes Laden",
-        "surplus_all": "Überschussladen mit allen Informationen",
-        "surplus_no_soc": "Überschussladen ohne Akkuinformationen"
-    }
+METHOD_COLORS = {
+    "uncontrolled": "green",
+    "preset": "red",
+    "surplus_all": "orange",
+    "surplus_no_soc": "blue",
+    "surplus_forecast": "brown",
+    "optimal": "purple",
+    "fleet": "teal"
+}
 
-    colors = {
-        "uncontrolled": "green",
-        "preset": "red",
-        "surplus_all": "orange",
-        "surplus_no_soc": "blue"
-    }
-
-    selected_methods = methods if method == 'all' else [method]
+def available_methods(df):
+    # Die Verfahren der Ausgabe: Prognose und optimales Laden nur, wenn die Simulation mit surplus_profile bzw.
+    # --optimal lief, eine Ausgabe von fleet.py enthält nur 'fleet'
+    return charging_methods(df)
 
-    weeks = sorted(df['year_week'].unique())
-    weekly_pv_shares = {m: [] for m in selected_methods}
-
-    for week in weeks:
-        week_df = df[df['year_week'] == week]
-
-        for m in selected_methods:
-            charging_power = week_df[f"{m}_charging_power"]
-            surplus = week_df["surplus"]
-
-            pv_energy = (charging_power.clip(upper=surplus) * time_interval_hours).sum()
-            grid_energy = ((charging_power - surplus).clip(lower=0) * time_interval_hours).sum()
-
-            total_energy = pv_energy + grid_energy
-            pv_share_percentage = (pv_energy / total_energy * 100) if total_energy > 0 else 0
-            weekly_pv_shares[m].append(pv_share_percentage)
-
-    # Plot erstellen
-    plt.figure(figsize=(14, 7))
+def draw_weekly_pv_share(weekly, selected_methods, method, title=None):
+    """
+    Zeichnet den wöchentlichen PV-Anteil aus dem Ergebnis von aggregate_energy(df, "week") und gibt die Figur zurück.
+    """
+    # matplotlib wird erst beim Zeichnen geladen, damit Befehle ohne Diagramm schnell starten
+    import matplotlib.pyplot as plt
+    weeks = list(weekly.index)
+    fig = plt.figure(figsize=(14, 7))
 
     for m in selected_methods:
-        plt.plot(weeks, weekly_pv_shares[m], marker='o', linestyle='-', label=method_titles[m], color=colors[m])
+        plt.plot(weeks, weekly[f"{m}_pv_share"].tolist(), marker='o', linestyle='-', label=METHOD_TITLES[m], color=METHOD_COLORS[m])
 
-    title_suffix = 'alle Ladeverfahren' if method == 'all' else method_titles[method]
-    plt.title(f"Wöchentlicher PV-Anteil (%) - {title_suffix}")
+    title_suffix = 'alle Ladeverfahren' if method == 'all' else METHOD_TITLES[method]
+    plt.title(title or f"Wöchentlicher PV-Anteil (%) - {title_suffix}")
     plt.xlabel("Kalenderwoche")
     plt.ylabel("PV-Anteil (%)")
     plt.grid(True)
@@ -77,6 +65,77 @@ def plot_weekly_pv_share(csv_file, method):
         plt.legend()
 
     plt.tight_layout()
+    return fig
+
+def draw_charging_data(df, max_points=None, downsampling='none', title=None):
+    """
+    Zeichnet Überschuss und Ladeleistungen der Zeilen von df und gibt die Figur zurück. Mit max_points wird
+    jede Kurve vor dem Zeichnen auf höchstens so viele Punkte reduziert ('minmax' oder 'lttb').
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    offsetY = 60
+    offsetX = 1
+    offset_timedelta = pd.Timedelta(minutes=offsetX)
+    times = df['time'].to_numpy()
+
+    def series(column):
+        values = df[column].to_numpy(dtype=float)
+        if max_points is None:
+            return times, values
+        return downsample(times, values, max_points, downsampling)
+
+    fig = plt.figure(figsize=(10, 6))
+    plt.fill_between(*series('surplus'), color='gray', alpha=0.5, label='Überschuss')
+    for method in available_methods(df):
+        method_times, power = series(f'{method}_charging_power')
+        if method == 'surplus_all':
+            # Versetzt, damit die Kurve nicht von den anderen verdeckt wird
+            method_times, power = method_times + offset_timedelta, power + offsetY
+        plt.plot(method_times, power, label=METHOD_TITLES[method], linestyle='-', linewidth=2, color=METHOD_COLORS[method])
+
+    if title:
+        plt.title(title)
+    plt.xlabel('Zeit')
+    plt.ylabel('Leistung (W)')
+    plt.legend()
+    # Über mehrere Tage das Datum statt der Uhrzeit beschriften
+    several_days = len(times) > 0 and times[-1] - times[0] > np.timedelta64(1, 'D')
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%d.%m.' if several_days else '%H:%M'))
+    plt.gca().xaxis.set_major_locator(mdates.AutoDateLocator())
+    plt.xticks(rotation=45)
+    plt.grid()
+    return fig
+
+@click.group()
+@profile_options
+def cli(profile, profile_memory, profile_output):
+    """Ein CLI-Tool zur Visualisierung und Analyse von Ladedaten."""
+    setup_profiling(profile, profile_memory, profile_output)
+
+@cli.command()
+@click.option('--csv-file', required=True, type=str, help='Pfad zur CSV-Datei oder binären Ausgabedatei')
+@click.option('--method', default='all', type=click.Choice(['all'] + list(METHOD_TITLES)), help='Ausgewähltes Ladeverfahren (Standard: alle)')
+def plot_weekly_pv_share(csv_file, method):
+    """
+    Zeichnet den wöchentlichen PV-Anteil für ein ausgewähltes Ladeverfahren oder alle Verfahren über den gesamten Zeitraum.
+    """
+    # Die Tageswerte genügen für Wochen und werden beim ersten Aufruf neben der Ausgabe gespeichert
+    with profiler.stage('load_energy'):
+        df = load_energy(csv_file, "day")
+
+    methods = available_methods(df)
+    if method != 'all' and method not in methods:
+        raise click.BadParameter(f"'{method}' ist in {csv_file} nicht enthalten", param_hint='--method')
+    selected_methods = methods if method == 'all' else [method]
+
+    # Wöchentliche Energiebilanz aller gewählten Verfahren in einem Durchlauf
+    with profiler.stage('aggregate', rows=len(df)):
+        weekly = aggregate_energy(df, "week", selected_methods)
+
+    with profiler.stage('plot'):
+        draw_weekly_pv_share(weekly, selected_methods, method)
+    import matplotlib.pyplot as plt
     plt.show()
 
 
@@ -84,7 +143,7 @@ def plot_weekly_pv_share(csv_file, method):
 
 
 @cli.command()
-@click.option('--csv-file', required=True, type=str, help='Pfad zur CSV-Datei')
+@click.option('--csv-file', required=True, type=str, help='Pfad zur CSV-Datei oder binären Ausgabedatei')
 @click.option('--selected-date', required=True, type=str, help='Datum im Format YYYY-MM-DD')
 @click.option('--start-time', required=True, type=str, help='Startzeit im Format HH:MM')
 @click.option('--end-time', required=True, type=str, help='Endzeit im Format HH:MM')
@@ -92,7 +151,8 @@ def plot_charging_data(csv_file, selected_date, start_time, end_time):
     """
     Zeichnet ein Diagramm der Ladedaten für einen gegebenen Zeitraum an einem Tag.
     """
-    df = pd.read_csv(csv_file, parse_dates=['time'])
+    with profiler.stage('load_output'):
+        df = load_output(csv_file)
 
     df = df[df['time'].dt.date == pd.to_datetime(selected_date).date()]
     df = df[(df['time'].dt.time >= pd.to_datetime(start_time).time()) & 
@@ -101,58 +161,64 @@ def plot_charging_data(csv_file, selected_date, start_time, end_time):
     if df.empty:
         click.echo(f"Keine Daten verfügbar für {selected_date}")
         return
-    
-    offsetY = 60
-    offsetX = 1
-    offset_timedelta = pd.Timedelta(minutes=offsetX)
-    
-    plt.figure(figsize=(10, 6))
-    plt.fill_between(df['time'], df['surplus'], color='gray', alpha=0.5, label='Überschuss')
-    plt.plot(df['time'], df['uncontrolled_charging_power'], label='Unreguliertes Laden', linestyle='-', linewidth=2, color="green")
-    plt.plot(df['time'], df['preset_charging_power'], label='Voreingestelltes Laden', linestyle='-', linewidth=2, color="red")
-    plt.plot(df['time'] + offset_timedelta, df['surplus_all_charging_power'] + offsetY, 
-             label='Überschussladen mit allen Informationen', linestyle='-', linewidth=2, color="orange")
-    plt.plot(df['time'], df['surplus_no_soc_charging_power'], 
-             label='Überschussladen ohne Akkuinformationen', linestyle='-', linewidth=2, color="blue")
-    
-    plt.xlabel('Zeit')
-    plt.ylabel('Leistung (W)')
-    plt.legend()
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-    plt.gca().xaxis.set_major_locator(mdates.AutoDateLocator())
-    plt.xticks(rotation=45)
-    plt.grid()
+
+    with profiler.stage('plot'):
+        draw_charging_data(df)
+    import matplotlib.pyplot as plt
     plt.show()
 
 @cli.command()
-@click.option('--csv-file', required=True, type=str, help='Pfad zur CSV-Datei')
-@click.option('--solar-price', required=True, type=float, help='Preis pro kWh für Solarstrom in €')
-@click.option('--grid-price', required=True, type=float, help='Preis pro kWh für Netzstrom in €')
-def print_charging_costs(csv_file, solar_price, grid_price):
+@click.option('--csv-file', required=True, type=str, help='Pfad zur CSV-Datei oder binären Ausgabedatei')
+@click.option('--solar-price', type=str, help='Preis pro kWh für Solarstrom in €, auch als Liste (0.08,0.097) oder Bereich (0.05:0.15:0.01)')
+@click.option('--grid-price', type=str, help='Preis pro kWh für Netzstrom in €, auch als Liste (0.30,0.33) oder Bereich (0.25:0.40:0.01)')
+@click.option('--tariff-file', type=str, help='JSON-Datei mit weiteren Tarifen, auch mit zeitvariablen Preisen je Stunde und Wochentag')
+@click.option('--out', default=None, type=str, help='Kostentabelle aller Tarife als CSV-Datei speichern')
+def print_charging_costs(csv_file, solar_price, grid_price, tariff_file, out):
     """
     Berechnet und gibt die Ladekosten für die verschiedenen Methoden aus.
+    Mehrere Preise oder Tarife werden gemeinsam in einem Durchlauf ausgewertet.
     """
-    df = pd.read_csv(csv_file, parse_dates=['time'])
+    tariffs = []
+    if solar_price is not None or grid_price is not None:
+        if solar_price is None or grid_price is None:
+            raise click.UsageError("--solar-price und --grid-price müssen gemeinsam angegeben werden.")
+        tariffs.extend(flat_tariffs(parse_price_values(solar_price), parse_price_values(grid_price)))
+    if tariff_file:
+        tariffs.extend(load_tariffs(tariff_file))
+    if not tariffs:
+        raise click.UsageError("Bitte --solar-price und --grid-price oder --tariff-file angeben.")
+
+    # Stündliche Werte genügen für zeitvariable Tarife
+    with profiler.stage('load_energy'):
+        df = load_energy(csv_file, "hour")
 
-    time_interval_hours = 5 / 60  # 5 Minuten Intervalle = 5/60 Stunden
-    charging_methods = ["uncontrolled", "preset", "surplus_all", "surplus_no_soc"]
+    methods = available_methods(df)
+    with profiler.stage('tariff_costs', rows=len(df)):
+        tariff_table = tariff_costs(df, tariffs, methods)
+
+    if out:
+        tariff_table.to_csv(out, index=False)
+        click.echo(f"Kosten von {len(tariffs)} Tarif(en) gespeichert in {out}")
+        return
+    if len(tariffs) > 1:
+        summary = tariff_table[["tariff", "solar_price", "grid_price"] + [f"{method}_cost" for method in methods]]
+        click.echo(summary.to_string(index=False, float_format=lambda value: f"{value:.2f}"))
+        return
+
+    with profiler.stage('aggregate', rows=len(df)):
+        totals = aggregate_energy(df, "total", methods).iloc[0]
+    tariff = tariff_table.iloc[0]
     costs = {}
 
-    for method in charging_methods:
-        charging_power = df[f"{method}_charging_power"]
-        surplus = df["surplus"]
-        
-        pv_energy = (charging_power.clip(upper=surplus) * time_interval_hours).sum()
-        grid_energy = ((charging_power - surplus).clip(lower=0) * time_interval_hours).sum()
-        
-        pv_energy /= 1000  # Umrechnung in Kilowattstunden
-        grid_energy /= 1000
-        
-        pv_cost = pv_energy * solar_price
-        grid_cost = grid_energy * grid_price
-        total_cost = pv_cost + grid_cost
-        total_energy = pv_energy + grid_energy
-        pv_share = pv_energy / total_energy * 100 if total_energy > 0 else 0
+    for method in methods:
+        pv_energy = totals[f"{method}_pv_energy"]  # bereits in Kilowattstunden
+        grid_energy = totals[f"{method}_grid_energy"]
+        total_energy = totals[f"{method}_total_energy"]
+        pv_share = totals[f"{method}_pv_share"]
+
+        pv_cost = tariff[f"{method}_pv_cost"]
+        grid_cost = tariff[f"{method}_grid_cost"]
+        total_cost = tariff[f"{method}_cost"]
 
         costs[method] = {
             "PV Energie (kWh)": pv_energy,
@@ -164,17 +230,133 @@ def print_charging_costs(csv_file, solar_price, grid_price):
             "Gesamtkosten (€)": total_cost,
         }
 
-    method_titles = {
-        "uncontrolled": "Unreguliertes Laden",
-        "preset": "Voreingestelltes Laden",
-        "surplus_all": "Überschussladen mit allen Informationen",
-        "surplus_no_soc": "Überschussladen ohne Akkuinformationen"
-    }
-    
     for method, values in costs.items():
-        click.echo(f"\n{method_titles[method]}")
+        click.echo(f"\n{METHOD_TITLES[method]}")
         for key, value in values.items():
             click.echo(f"  {key}: {value:.2f}")
 
+@cli.command()
+@click.option('--csv-file', required=True, type=str, help='Pfad zur CSV-Datei oder binären Ausgabedatei')
+@click.option('--granularity', default='month', type=click.Choice(GRANULARITIES), help='Zeitliche Auflösung der Auswertung (Standard: month)')
+@click.option('--out', default=None, type=str, help='Ergebnis als CSV-Datei speichern statt es auszugeben')
+def report(csv_file, granularity, out):
+    """
+    Gibt PV-Energie, Netzenergie, Gesamtenergie (kWh) und PV-Anteil (%) aller Verfahren je Zeitraum als Tabelle aus.
+    """
+    with profiler.stage('load_energy'):
+        df = load_energy(csv_file, "day")
+    with profiler.stage('aggregate', rows=len(df)):
+        table = aggregate_energy(df, granularity)
+
+    if out:
+        table.to_csv(out)
+        click.echo(f"Auswertung gespeichert in {out}")
+    else:
+        click.echo(table.to_string(float_format=lambda value: f"{value:.2f}"))
+
+# Wird je Arbeitsprozess einmal von init_render_worker gesetzt
+_render_df = None
+_render_options = None
+
+def init_render_worker(csv_file, options):
+    global _render_df, _render_options
+    # Ohne Fenster rendern, auch wenn die Prozesse nicht per fork entstehen
+    import matplotlib.pyplot as plt
+    plt.switch_backend("Agg")
+    _render_df = load_output(csv_file)
+    _render_options = options
+
+def render_tasks(df, kind, first_day, last_day, days, file_format):
+    """
+    Eine Aufgabe (Art, Name, erster Tag, letzter Tag) je Tag, je Zeitraum von days Tagen oder je Verfahren.
+    """
+    if kind == 'weekly':
+        return [('weekly', f"weekly_pv_share_{m}.{file_format}", m, None) for m in ['all'] + available_methods(df)]
+    data_days = pd.to_datetime(df['time'].to_numpy()).normalize().unique()
+    data_days = data_days[(data_days >= first_day) & (data_days <= last_day)]
+    if kind == 'day':
+        return [('day', f"{day:%Y-%m-%d}.{file_format}", day, day) for day in data_days]
+    tasks = []
+    for start in range(0, len(data_days), days):
+        chunk = data_days[start:start + days]
+        tasks.append(('range', f"{chunk[0]:%Y-%m-%d}_{chunk[-1]:%Y-%m-%d}.{file_format}", chunk[0], chunk[-1]))
+    return tasks
+
+def render_task(task):
+    kind, name, first, last = task
+    options = _render_options
+    path = os.path.join(options['out_dir'], name)
+    df = _render_df
+    if kind == 'weekly':
+        methods = available_methods(df) if first == 'all' else [first]
+        fig = draw_weekly_pv_share(aggregate_energy(df, "week", methods), methods, first)
+    else:
+        # Die Ausgabe ist nach Zeit sortiert, der Zeitraum ist also ein zusammenhängender Ausschnitt
+        times = df['time'].to_numpy()
+        lower = np.searchsorted(times, np.datetime64(first, 'ns'))
+        upper = np.searchsorted(times, np.datetime64(last + pd.Timedelta(days=1), 'ns'))
+        rows = df.iloc[lower:upper]
+        if kind == 'day':
+            time_of_day = rows['time'].dt.time
+            rows = rows[(time_of_day >= options['start_time']) & (time_of_day <= options['end_time'])]
+        if rows.empty:
+            return None
+        title = f"{first:%d.%m.%Y}" if kind == 'day' else f"{first:%d.%m.%Y} - {last:%d.%m.%Y}"
+        fig = draw_charging_data(rows, options['max_points'], options['downsampling'], title)
+    fig.savefig(path, dpi=options['dpi'])
+    import matplotlib.pyplot as plt
+    plt.close(fig)
+    return path
+
+@cli.command()
+@click.option('--csv-file', required=True, type=str, help='Pfad zur CSV-Datei oder binären Ausgabedatei')
+@click.option('--out-dir', required=True, type=str, help='Verzeichnis für die Diagramme (wird angelegt)')
+@click.option('--kind', default='day', type=click.Choice(['day', 'range', 'weekly']), help='Ein Diagramm je Tag, je Zeitraum von --days Tagen oder wöchentlicher PV-Anteil je Verfahren (Standard: day)')
+@click.option('--start-date', default=None, type=str, help='Erster Tag im Format YYYY-MM-DD (Standard: Beginn der Daten)')
+@click.option('--end-date', default=None, type=str, help='Letzter Tag im Format YYYY-MM-DD (Standard: Ende der Daten)')
+@click.option('--start-time', default='00:00', type=str, help='Startzeit je Tag im Format HH:MM (nur --kind day)')
+@click.option('--end-time', default='23:59', type=str, help='Endzeit je Tag im Format HH:MM (nur --kind day)')
+@click.option('--days', default=7, type=int, help='Tage je Diagramm bei --kind range (Standard: 7)')
+@click.option('--format', 'file_format', default='png', type=click.Choice(['png', 'svg']), help='Dateiformat (Standard: png)')
+@click.option('--dpi', default=100, type=int, help='Auflösung der PNG-Dateien (Standard: 100)')
+@click.option('--max-points', default=2000, type=int, help='Höchstens so viele Punkte je Kurve (Standard: 2000)')
+@click.option('--downsampling', default='minmax', type=click.Choice(DOWNSAMPLING_METHODS), help='Verfahren zum Ausdünnen langer Kurven (Standard: minmax)')
+@click.option('--workers', default=os.cpu_count(), type=int, help='Anzahl der Prozesse (Standard: alle Kerne)')
+def render(csv_file, out_dir, kind, start_date, end_date, start_time, end_time, days, file_format, dpi, max_points, downsampling, workers):
+    """
+    Speichert Diagramme für jeden Tag, jeden Zeitraum oder jedes Verfahren als PNG/SVG-Dateien, ohne Fenster und parallel.
+    """
+    if days < 1:
+        raise click.BadParameter("muss mindestens 1 sein", param_hint="--days")
+    with profiler.stage('load_output'):
+        df = load_output(csv_file)
+    if df.empty:
+        click.echo("Keine Daten verfügbar")
+        return
+    first_day = pd.Timestamp(start_date) if start_date else pd.Timestamp(df['time'].iloc[0]).normalize()
+    last_day = pd.Timestamp(end_date) if end_date else pd.Timestamp(df['time'].iloc[-1]).normalize()
+    tasks = render_tasks(df, kind, first_day, last_day, days, file_format)
+    os.makedirs(out_dir, exist_ok=True)
+
+    options = {
+        'out_dir': out_dir,
+        'start_time': pd.to_datetime(start_time).time(),
+        'end_time': pd.to_datetime(end_time).time(),
+        'max_points': max_points,
+        'downsampling': downsampling,
+        'dpi': dpi,
+    }
+    click.echo(f"Erstelle {len(tasks)} Diagramm(e) mit {workers} Prozess(en) ...")
+    with profiler.stage('render', rows=len(df)):
+        if workers <= 1:
+            init_render_worker(csv_file, options)
+            paths = list(map(render_task, tasks))
+        else:
+            # Jeder Prozess lädt die Datei selbst; binäre Ausgaben werden dabei nur eingeblendet, nicht kopiert
+            with multiprocessing.Pool(workers, initializer=init_render_worker, initargs=(csv_file, options)) as pool:
+                paths = list(pool.imap_unordered(render_task, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+    written = sum(path is not None for path in paths)
+    click.echo(f"{written} Diagramm(e) gespeichert in {out_dir}")
+
 if __name__ == '__main__':
     cli()
\ No newline at end of file
@@ -0,0 +1,302 @@
+from __future__ import annotations
+import json
+import click
+from typing import Dict, List
+
+from lazyimport import lazy_import
+from datacache import load_csv
+from profiling import profile_options, profiler, setup_profiling
+from chargingcalendar import compile_windows
+from simulation import Configuration, load_config, filter_date_range, precompute_arrays, resample_input
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+# Configuration fields that can differ between the vehicles of a fleet
+VEHICLE_FIELDS = [
+    "capacity", "min_soc", "max_soc", "starting_soc", "daily_usage",
+    "start", "end", "weekend_start", "weekend_end",
+    "max_charging_speed", "minimum_charge_speed", "charge_step_size",
+]
+
+def load_fleet(fleet_path: str, base_config: Configuration) -> List[dict]:
+    """
+    Reads a JSON list of vehicles. Every entry overrides fields of the base configuration and may
+    contain a 'name' and a 'count' to add several identical vehicles at once.
+    """
+    with open(fleet_path) as fleet_file:
+        entries = json.load(fleet_file)
+    vehicles = []
+    for index, entry in enumerate(entries):
+        entry = dict(entry)
+        name = entry.pop("name", f"vehicle_{index}")
+        count = entry.pop("count", 1)
+        unknown = set(entry) - set(VEHICLE_FIELDS)
+        if unknown:
+            raise click.BadParameter(f"Unknown vehicle fields: {', '.join(sorted(unknown))}", param_hint="--fleet-file")
+        config = Configuration(**{**base_config.model_dump(), **entry})
+        for number in range(count):
+            vehicle = {field: getattr(config, field) for field in VEHICLE_FIELDS}
+            vehicle["name"] = name if count == 1 else f"{name}_{number}"
+            vehicles.append(vehicle)
+    return vehicles
+
+def random_fleet(base_config: Configuration, count: int, seed: int = 0) -> List[dict]:
+    """
+    Generates vehicles that vary around the base configuration: battery size, SoC limits,
+    daily usage and plug-in times are drawn at random.
+    """
+    rng = np.random.default_rng(seed)
+    vehicles = []
+    for number in range(count):
+        max_charging_speed = int(rng.choice([3680, 7360, 11040]))
+        daily_usage = int(base_config.daily_usage * rng.uniform(0.5, 1.5))
+        # Windows are at least long enough to recharge one day of usage at full speed
+        shortest_window = int(np.ceil(daily_usage / max_charging_speed)) + 1
+        start_hour = int(rng.integers(6, 23 - shortest_window))
+        weekend_start_hour = int(rng.integers(7, 13))
+        overrides = {
+            "capacity": int(rng.choice([40000, 60000, 75000, 100000])),
+            "min_soc": int(rng.integers(20, 51)),
+            "max_soc": int(rng.integers(80, 91)),
+            "starting_soc": int(rng.integers(30, 81)),
+            "daily_usage": daily_usage,
+            "start": f"{start_hour:02d}:00:00",
+            "end": f"{min(start_hour + shortest_window + int(rng.integers(0, 8)), 23):02d}:00:00",
+            "weekend_start": f"{weekend_start_hour:02d}:00:00",
+            "weekend_end": f"{min(weekend_start_hour + shortest_window + int(rng.integers(0, 6)), 23):02d}:00:00",
+            "max_charging_speed": max_charging_speed,
+        }
+        config = Configuration(**{**base_config.model_dump(), **overrides})
+        vehicle = {field: getattr(config, field) for field in VEHICLE_FIELDS}
+        vehicle["name"] = f"vehicle_{number}"
+        vehicles.append(vehicle)
+    return vehicles
+
+def fleet_arrays(vehicles: List[dict]) -> Dict[str, np.ndarray]:
+    """
+    Converts the vehicle list into one array per parameter, indexed by vehicle.
+    """
+    def column(field):
+        return np.array([vehicle[field] for vehicle in vehicles], dtype=float)
+    capacity = column("capacity")
+    return {
+        "capacity": capacity,
+        "minimum_charge": column("min_soc") * capacity / 100,
+        "maximum_charge": column("max_soc") * capacity / 100,
+        "starting_charge": column("starting_soc") * capacity / 100,
+        "daily_usage": column("daily_usage"),
+        "max_charging_speed": column("max_charging_speed"),
+        "minimum_charge_speed": column("minimum_charge_speed"),
+        "charge_step_size": column("charge_step_size"),
+    }
+
+def fleet_windows(config: Configuration, vehicles: List[dict], days: np.ndarray):
+    """
+    Window start and end (microseconds after midnight) of every vehicle on the given days (days since the
+    epoch), shape (days, vehicles). The calendar of the configuration applies to every vehicle, where it
+    sets no window the vehicle's own start/end and weekend_start/weekend_end apply.
+    """
+    window_fields = ("start", "end", "weekend_start", "weekend_end")
+    starts = np.empty((len(days), len(vehicles)), dtype=np.int64)
+    ends = np.empty((len(days), len(vehicles)), dtype=np.int64)
+    # Vehicles with the same plug-in times share their windows, so every combination is resolved once
+    resolved = {}
+    for number, vehicle in enumerate(vehicles):
+        times = tuple(vehicle[field] for field in window_fields)
+        if times not in resolved:
+            resolved[times] = compile_windows(config.model_copy(update=dict(zip(window_fields, times))), days)
+        starts[:, number], ends[:, number] = resolved[times]
+    return starts, ends
+
+def water_fill(available: float, minimum: np.ndarray, cap: np.ndarray) -> np.ndarray:
+    """
+    Gives every vehicle its minimum and shares the rest equally, never exceeding a vehicle's cap.
+    """
+    allocation = minimum.copy()
+    headroom = cap - minimum
+    remaining = available - minimum.sum()
+    if remaining <= 0 or headroom.sum() <= 0:
+        return allocation
+    if headroom.sum() <= remaining:
+        return cap.copy()
+    # Find the level at which sum(min(headroom, level)) == remaining
+    sorted_headroom = np.sort(headroom)
+    count = len(sorted_headroom)
+    filled = np.cumsum(sorted_headroom) - sorted_headroom + sorted_headroom * np.arange(count, 0, -1)
+    k = np.searchsorted(filled, remaining)
+    level = (remaining - (filled[k] - sorted_headroom[k] * (count - k))) / (count - k)
+    return allocation + np.minimum(headroom, level)
+
+def allocate_equal(available, minimum, cap, charge, minutes_left):
+    # Admit vehicles with the lowest SoC first until the minimum speeds exhaust the surplus
+    return allocate_admitted(available, minimum, cap, np.argsort(charge, kind="stable"), greedy=False)
+
+def allocate_lowest_soc(available, minimum, cap, charge, minutes_left):
+    return allocate_admitted(available, minimum, cap, np.argsort(charge, kind="stable"), greedy=True)
+
+def allocate_earliest_departure(available, minimum, cap, charge, minutes_left):
+    return allocate_admitted(available, minimum, cap, np.argsort(minutes_left, kind="stable"), greedy=True)
+
+def allocate_admitted(available: float, minimum: np.ndarray, cap: np.ndarray, order: np.ndarray, greedy: bool) -> np.ndarray:
+    """
+    Admits candidates in the given order as long as their minimum speeds fit into the surplus, then
+    either fills them up one after another (greedy) or shares the surplus equally between them.
+    """
+    allocation = np.zeros_like(cap)
+    order = order[cap[order] > 0]
+    admitted = order[np.cumsum(minimum[order]) <= available]
+    if admitted.size == 0:
+        return allocation
+    if greedy:
+        # Everyone admitted keeps its minimum, the rest of the surplus goes to the first vehicles in order
+        extra = np.diff(np.concatenate(([0.0], np.minimum(np.cumsum(cap[admitted] - minimum[admitted]), available - minimum[admitted].sum()))))
+        allocation[admitted] = minimum[admitted] + np.clip(extra, 0, None)
+    else:
+        allocation[admitted] = water_fill(available, minimum[admitted], cap[admitted])
+    return allocation
+
+ALLOCATION_POLICIES = {
+    "equal": allocate_equal,
+    "lowest_soc": allocate_lowest_soc,
+    "earliest_departure": allocate_earliest_departure,
+}
+
+def simulate_fleet(df: pd.DataFrame, config: Configuration, vehicles: List[dict], policy: str = "equal"):
+    """
+    Simulates surplus charging for all vehicles at once. Every interval, vehicles that would miss their
+    minimum SoC charge at full speed first (like SurplusChargingAllInformation.charge_to_minimum), the
+    remaining PV surplus is then split between the other plugged-in vehicles by the allocation policy.
+    Charging speeds are rounded down to the vehicle's step size so the fleet never exceeds the surplus.
+
+    Returns the site time series (with a 'fleet_charging_power' column, readable by evaluation.py)
+    and one summary row per vehicle.
+    """
+    allocate = ALLOCATION_POLICIES[policy]
+    calls_per_hour = config.calls_per_hour
+    with profiler.stage("precompute_arrays", rows=len(df)):
+        arrays = precompute_arrays(df, config)
+        fleet = fleet_arrays(vehicles)
+        surplus = arrays['surplus']
+        if config.surplus_charging_delayed:
+            # The controller only knows the surplus of the previous interval
+            available_surplus = np.concatenate(([0.0], surplus[:-1]))
+        else:
+            available_surplus = surplus
+        days, day_starts, day_index = np.unique(arrays['day'], return_index=True, return_inverse=True)
+        day_bounds = np.append(day_starts, len(df))
+        # Days on which all vehicles have the same windows (usually weekdays and weekends) form one kind of day.
+        # Each vehicle's plug-in state and minutes until departure only depend on (kind of day, time of day),
+        # so they are tabulated once instead of being evaluated for every interval
+        window_start, window_end = fleet_windows(config, vehicles, days)
+        kinds, day_kind = np.unique(np.hstack((window_start, window_end)), axis=0, return_inverse=True)
+        kind = day_kind.reshape(-1)[day_index]
+        window_start, window_end = kinds[:, :len(vehicles)], kinds[:, len(vehicles):]
+        slot_times, slot_index = np.unique(arrays['time_of_day'], return_inverse=True)
+        plugged_table = (window_start[:, np.newaxis, :] <= slot_times[np.newaxis, :, np.newaxis]) & \
+                        (slot_times[np.newaxis, :, np.newaxis] <= window_end[:, np.newaxis, :])
+        minutes_table = (window_end[:, np.newaxis, :] - slot_times[np.newaxis, :, np.newaxis]) / 1_000_000 / 60
+        any_plugged = plugged_table.any(axis=2)[kind, slot_index]
+
+    count = len(vehicles)
+    charge = fleet["starting_charge"].copy()
+    maximum_charge = fleet["maximum_charge"]
+    minimum_charge = fleet["minimum_charge"]
+    max_speed = fleet["max_charging_speed"]
+    min_speed = fleet["minimum_charge_speed"]
+    step_size = fleet["charge_step_size"]
+    pv_energy = np.zeros(count)
+    grid_energy = np.zeros(count)
+    fleet_power = np.zeros(len(df))
+    plugged_count = np.zeros(len(df), dtype=int)
+    missed_minimum = np.zeros(count, dtype=int)
+
+    with profiler.stage("allocate", rows=len(df) * count):
+        for day_index in range(len(days)):
+            missed_today = np.zeros(count, dtype=bool)
+            for i in np.flatnonzero(any_plugged[day_bounds[day_index]:day_bounds[day_index + 1]]) + day_bounds[day_index]:
+                plugged = plugged_table[kind[i], slot_index[i]]
+                minutes_left = minutes_table[kind[i], slot_index[i]]
+                need = np.where(plugged, np.clip(maximum_charge - charge, 0, None) * calls_per_hour, 0)
+                forced = (need > 0) & (minutes_left <= (minimum_charge - charge) / max_speed * 60)
+                power = np.where(forced, np.minimum(need, max_speed), 0)
+
+                candidates = ~forced & (need > 0)
+                cap = np.where(candidates, np.minimum(need, max_speed), 0)
+                minimum = np.minimum(min_speed, cap)
+                available = available_surplus[i] - power.sum()
+                if available > 0 and candidates.any():
+                    allocation = allocate(available, minimum, cap, charge, minutes_left)
+                    # A vehicle that is topped off takes exactly what is missing, all others snap to their steps
+                    rounded = np.maximum(np.floor(allocation / step_size) * step_size, np.where(allocation > 0, minimum, 0))
+                    power += np.where(allocation >= cap, cap, rounded)
+
+                total = power.sum()
+                if total > 0:
+                    pv_fraction = min(surplus[i] / total, 1.0)
+                    pv_energy += power * pv_fraction / calls_per_hour
+                    grid_energy += power * (1 - pv_fraction) / calls_per_hour
+                    charge += power / calls_per_hour
+                # Departure time reached without the minimum charge
+                missed_today |= plugged & (minutes_left <= 0) & (charge < minimum_charge)
+                fleet_power[i] = total
+                plugged_count[i] = plugged.sum()
+            missed_minimum += missed_today
+            charge -= fleet["daily_usage"]
+
+    with profiler.stage("build_output", rows=len(df)):
+        site = pd.DataFrame({
+            'time': df['time'].to_numpy(),
+            'output': arrays['output'],
+            'consumption': arrays['consumption'],
+            'surplus': surplus,
+            'plugged_vehicles': plugged_count,
+            'fleet_charging_power': fleet_power,
+        })
+        total_energy = pv_energy + grid_energy
+        summary = pd.DataFrame({
+            'name': [vehicle["name"] for vehicle in vehicles],
+            'capacity': fleet["capacity"],
+            'pv_energy': pv_energy / 1000,
+            'grid_energy': grid_energy / 1000,
+            'total_energy': total_energy / 1000,
+            'pv_share': np.divide(pv_energy * 100, total_energy, out=np.zeros(count), where=total_energy > 0),
+            'days_below_minimum': missed_minimum,
+            'final_soc': charge / fleet["capacity"] * 100,
+        })
+    return site, summary
+
+@click.group()
+@profile_options
+def cli(profile: bool, profile_memory: bool, profile_output: str):
+    setup_profiling(profile, profile_memory, profile_output)
+
+@cli.command()
+@click.option("--datafile", default="data.csv", help="Data *.csv file")
+@click.option("--configfile", default="config.json", help="JSON configuration file, provides the defaults for every vehicle")
+@click.option("--fleet-file", default=None, help="JSON list of vehicles overriding configuration fields")
+@click.option("--vehicles", type=int, default=None, help="Generate this many random vehicles instead of reading --fleet-file")
+@click.option("--seed", type=int, default=0, help="Seed for --vehicles")
+@click.option("--policy", type=click.Choice(sorted(ALLOCATION_POLICIES)), default="equal", help="How the PV surplus is split between vehicles")
+@click.option("--out", default="fleet.csv", help="Output *.csv file with the site time series")
+@click.option("--summary", default="fleet_summary.csv", help="Output *.csv file with one row per vehicle")
+def simulate(datafile: str, configfile: str, fleet_file: str, vehicles: int, seed: int, policy: str, out: str, summary: str):
+    if (fleet_file is None) == (vehicles is None):
+        raise click.UsageError("Pass exactly one of --fleet-file and --vehicles")
+    config = load_config(configfile)
+    fleet = load_fleet(fleet_file, config) if fleet_file else random_fleet(config, vehicles, seed)
+    with profiler.stage("load_csv"):
+        df, _ = resample_input(filter_date_range(load_csv(datafile), config), config)
+
+    click.echo(f"Simulating {len(fleet)} vehicle(s) with the '{policy}' policy ...")
+    site, vehicle_summary = simulate_fleet(df, config, fleet, policy)
+    with profiler.stage("write_csv", rows=len(site)):
+        site.to_csv(out, index=False)
+        vehicle_summary.to_csv(summary, index=False)
+    total = vehicle_summary[['pv_energy', 'grid_energy']].sum()
+    click.echo(f"PV energy: {total['pv_energy']:.2f} kWh, grid energy: {total['grid_energy']:.2f} kWh")
+    click.echo(f"Fleet simulation completed. Site time series saved in {out}, vehicle summary in {summary}")
+
+if __name__ == '__main__':
+    cli()
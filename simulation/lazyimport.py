@@ -0,0 +1,20 @@
+import importlib.util
+import sys
+
+def lazy_import(name: str, path: str = None):
+    """
+    Returns the module, but executes it only when one of its attributes is used for the first time, so
+    a command line tool can build its commands and print its help without loading numpy, pandas or requests.
+    Modules using it write 'from __future__ import annotations', so type hints do not load the module either.
+    With path, the module is loaded from that file, so a script of another folder can be used without
+    changing sys.path.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, path) if path else importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,284 @@
+from __future__ import annotations
+import asyncio
+import datetime
+import functools
+import json
+import time
+import click
+
+from lazyimport import lazy_import
+from chargingcalendar import day_window
+from simulation import Configuration, load_config, create_simulators, calculate_remaining_minutes
+
+np = lazy_import("numpy")
+
+
+REPLAY_TIME_HEADER = "X-Replay-Time"
+
+class Clock:
+    """
+    Wall clock, or a replay clock that runs speed times faster from the time last reported by a replay stub.
+    """
+    def __init__(self, speed: float = 1.0):
+        self.speed = speed
+        self.reference = None
+        self._synced = None
+
+    def sync(self, reference: datetime.datetime):
+        self.reference = reference
+        self._synced = time.monotonic()
+
+    def now(self) -> datetime.datetime:
+        if self.reference is None:
+            return datetime.datetime.now()
+        return self.reference + datetime.timedelta(seconds=(time.monotonic() - self._synced) * self.speed)
+
+class Reading:
+    def __init__(self, clock: str, output: float, consumption: float):
+        self.clock = clock
+        self.output = output
+        self.consumption = consumption
+        self.received = time.monotonic()
+
+class SolarlogPoller:
+    """
+    Polls today's values from the Solarlog /getjp endpoint in the background and keeps the newest reading,
+    so the controller never waits for the network when it has to decide.
+    """
+    def __init__(self, host: str, interval: float, timeout: float, clock: Clock):
+        # requests is only loaded when the controller talks to the network, not for the help
+        import requests
+        self.host = host
+        self.clock = clock
+        self.interval = interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.latest = None
+        self.succeeded = 0
+        self.failed = 0
+        self.latencies = []
+
+    def fetch(self) -> Reading:
+        response = self.session.post(self.host + '/getjp', json={'776': {'0': None}}, timeout=self.timeout)
+        response.raise_for_status()
+        if REPLAY_TIME_HEADER in response.headers:
+            # The replay stub reports its accelerated clock, the controller follows it
+            self.clock.sync(datetime.datetime.fromisoformat(response.headers[REPLAY_TIME_HEADER]))
+        rows = response.json()['776']['0']
+        if not rows:
+            return None
+        clock, values = rows[-1]
+        return Reading(clock, values[0][0], values[1][0])
+
+    async def run(self):
+        import requests
+        while True:
+            started = time.monotonic()
+            try:
+                reading = await asyncio.to_thread(self.fetch)
+            except (requests.RequestException, ValueError, KeyError, IndexError, TypeError):
+                self.failed += 1
+            else:
+                self.succeeded += 1
+                self.latencies.append(time.monotonic() - started)
+                if reading is not None:
+                    self.latest = reading
+            await asyncio.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+class StdoutSink:
+    async def emit(self, setpoint: dict):
+        print(json.dumps(setpoint), flush=True)
+
+    def close(self):
+        pass
+
+class FileSink:
+    def __init__(self, path: str):
+        self.file = open(path, "a")
+
+    async def emit(self, setpoint: dict):
+        self.file.write(json.dumps(setpoint) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class HttpSink:
+    def __init__(self, url: str, timeout: float):
+        import requests
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    async def emit(self, setpoint: dict):
+        await asyncio.to_thread(lambda: self.session.post(self.url, json=setpoint, timeout=self.timeout).raise_for_status())
+
+    def close(self):
+        self.session.close()
+
+def create_sink(target: str, timeout: float):
+    """
+    'stdout', 'file:<path>' or an http(s):// URL that receives every setpoint as JSON POST.
+    """
+    if target == "stdout":
+        return StdoutSink()
+    if target.startswith("file:"):
+        return FileSink(target[len("file:"):])
+    if target.startswith(("http://", "https://")):
+        return HttpSink(target, timeout)
+    raise click.BadParameter(f"Unknown sink '{target}', use stdout, file:<path> or an http(s):// URL", param_hint="--sink")
+
+class LiveController:
+    """
+    Runs one algorithm every 1/calls_per_hour hours (divided by the clock speed) on the newest reading.
+    The charge is estimated from the setpoints the sink accepted and reduced by daily_usage at every day change,
+    as in the simulation. Readings older than max_age seconds are not trusted and lead to a 0 W setpoint.
+    A setpoint that is not emitted within max_latency counts as late; if it still reaches the sink afterwards,
+    its charge is added then.
+    """
+    def __init__(self, config: Configuration, algorithm: str, poller: SolarlogPoller, sink, clock: Clock, max_age: float, max_latency: float):
+        self.config = config
+        self.name = algorithm
+        self.simulator = create_simulators(config)[algorithm]
+        self.poller = poller
+        self.sink = sink
+        self.clock = clock
+        self.max_age = max_age
+        self.max_latency = max_latency
+        self.charge = config.capacity * config.starting_soc / 100
+        self.day = None
+        self.latencies = []
+        self.jitters = []
+        self.stale = 0
+        self.late = 0
+        self.accepted_late = 0
+        self.pending = set()
+
+    def decide(self, now: datetime.datetime) -> dict:
+        if self.day is not None and now.date() != self.day:
+            self.charge -= self.config.daily_usage * (now.date() - self.day).days
+        if now.date() != self.day:
+            self.simulator.set_date(now.date())
+        self.day = now.date()
+
+        reading = self.poller.latest
+        age = time.monotonic() - reading.received if reading is not None else None
+        window = day_window(self.config, now.date())
+        power = 0
+        if window is not None and window[0] <= now.time() <= window[1]:
+            if age is None or age > self.max_age:
+                self.stale += 1
+            else:
+                power = self.simulator.step(calculate_remaining_minutes(now.time(), window[1]), self.charge, now.time(),
+                                            reading.output, reading.consumption)
+        # The charge itself only grows once the sink accepted the setpoint, see run
+        return {
+            'time': now.isoformat(timespec='seconds'),
+            'algorithm': self.name,
+            'power': power,
+            'soc': round((self.charge + power / self.config.calls_per_hour) / self.config.capacity * 100, 3),
+            'reading': reading.clock if reading is not None else None,
+            'reading_age': round(age, 3) if age is not None else None,
+        }
+
+    async def run(self, ticks: int = None):
+        import requests
+        loop = asyncio.get_running_loop()
+        interval = 3600 / self.config.calls_per_hour / self.clock.speed
+        first = loop.time()
+        tick = 0
+        while ticks is None or tick < ticks:
+            scheduled = first + tick * interval
+            await asyncio.sleep(max(scheduled - loop.time(), 0))
+            started = loop.time()
+            self.jitters.append(started - scheduled)
+            setpoint = self.decide(self.clock.now())
+            emitting = asyncio.ensure_future(self.sink.emit(setpoint))
+            try:
+                # Shielded, so a slow request keeps running instead of being abandoned at the deadline
+                await asyncio.wait_for(asyncio.shield(emitting), self.max_latency)
+            except asyncio.TimeoutError:
+                # Whether the wallbox got the setpoint is unknown until the request finishes, see settle
+                self.late += 1
+                self.pending.add(emitting)
+                emitting.add_done_callback(functools.partial(self.settle, setpoint['power']))
+            except requests.RequestException:
+                # The wallbox did not get the setpoint, so the interval counts as 0 W
+                self.late += 1
+            else:
+                self.charge += setpoint['power'] / self.config.calls_per_hour
+            self.latencies.append(loop.time() - started)
+            tick += 1
+        if self.pending:
+            await asyncio.wait(self.pending)
+
+    def settle(self, power: float, emitting: asyncio.Future):
+        self.pending.discard(emitting)
+        if not emitting.cancelled() and emitting.exception() is None:
+            # Accepted after the deadline, so the wallbox charged with it after all
+            self.charge += power / self.config.calls_per_hour
+            self.accepted_late += 1
+
+def describe(values: list) -> str:
+    if not values:
+        return "-"
+    milliseconds = np.array(values) * 1000
+    return (f"mean {milliseconds.mean():.2f} ms, p50 {np.percentile(milliseconds, 50):.2f} ms, "
+            f"p95 {np.percentile(milliseconds, 95):.2f} ms, max {milliseconds.max():.2f} ms")
+
+async def run_live(controller: LiveController, poller: SolarlogPoller, ticks: int):
+    polling = asyncio.create_task(poller.run())
+    # Let the first poll finish (or time out) so the first decision has a reading
+    deadline = time.monotonic() + poller.timeout
+    while poller.succeeded + poller.failed == 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    try:
+        await controller.run(ticks)
+    finally:
+        polling.cancel()
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.option("--configfile", default="config.json", help="JSON configuration file")
+@click.option("--solar-config", default="../solar/config.json", help="JSON file with the Solarlog host")
+@click.option("--host", default=None, help="Solarlog URL, overrides --solar-config (e.g. http://127.0.0.1:8080 for the replay stub)")
+@click.option("--algorithm", default="surplus_all", type=click.Choice(["uncontrolled", "preset", "surplus_all", "surplus_no_soc", "surplus_forecast"]), help="Algorithm that controls the wallbox ('surplus_forecast' needs surplus_profile in the configuration)")
+@click.option("--sink", default="stdout", help="Where setpoints go: stdout, file:<path> or an http(s):// URL")
+@click.option("--poll-interval", default=10.0, type=float, help="Seconds between two Solarlog requests")
+@click.option("--timeout", default=5.0, type=float, help="Timeout of a Solarlog request in seconds")
+@click.option("--max-age", default=None, type=float, help="Readings older than this many seconds lead to a 0 W setpoint (default: two intervals)")
+@click.option("--max-latency", default=1.0, type=float, help="Upper bound for emitting a setpoint in seconds")
+@click.option("--speed", default=1.0, type=float, help="Clock speed-up for replays, must match the stub")
+@click.option("--ticks", default=None, type=int, help="Stop after this many decisions")
+def live(configfile: str, solar_config: str, host: str, algorithm: str, sink: str, poll_interval: float, timeout: float, max_age: float,
+         max_latency: float, speed: float, ticks: int):
+    """Steer a wallbox in real time from Solarlog readings."""
+    config = load_config(configfile)
+    if algorithm == "surplus_forecast" and not config.surplus_profile:
+        raise click.UsageError("'surplus_forecast' needs a surplus_profile in the configuration.")
+    if host is None:
+        with open(solar_config) as solar_config_file:
+            host = json.load(solar_config_file)["host"]
+    clock = Clock(speed)
+    interval = 3600 / config.calls_per_hour / speed
+    poller = SolarlogPoller(host, poll_interval / speed, timeout, clock)
+    setpoint_sink = create_sink(sink, max_latency)
+    controller = LiveController(config, algorithm, poller, setpoint_sink, clock, max_age if max_age is not None else 2 * interval, max_latency)
+
+    click.echo(f"Controlling with '{algorithm}' every {interval:.2f} s, polling {host} every {poller.interval:.2f} s", err=True)
+    try:
+        asyncio.run(run_live(controller, poller, ticks))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        setpoint_sink.close()
+        click.echo(f"Decisions: {len(controller.latencies)}, stale readings: {controller.stale}, late or failed setpoints: {controller.late} ({controller.accepted_late} accepted late)", err=True)
+        click.echo(f"Decision latency: {describe(controller.latencies)}", err=True)
+        click.echo(f"Tick jitter: {describe(controller.jitters)}", err=True)
+        click.echo(f"Polls: {poller.succeeded} ok, {poller.failed} failed, latency {describe(poller.latencies)}", err=True)
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,194 @@
+from __future__ import annotations
+import csv
+import multiprocessing
+import os
+from pathlib import Path
+import click
+from typing import Dict
+
+from lazyimport import lazy_import
+from datacache import load_csv
+from chargingcalendar import compile_windows
+from simulation import Configuration, load_config, filter_date_range, precompute_arrays, resample_input, create_simulators, initial_charge, simulate_vectorized
+from sweep import summarize_charging
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+# Only loaded when --history is used
+chargestore = lazy_import("chargestore", str(Path(__file__).resolve().parent.parent / "charging_history" / "chargestore.py"))
+
+
+PERCENTILES = [5, 25, 50, 75, 95]
+MICROSECONDS_PER_MINUTE = 60_000_000
+
+# Set once per worker process by init_worker, so the input data is not re-sent with every trial
+_shared_data = None
+_arrays = None
+_config = None
+_model = None
+_prices = None
+
+def fit_history(history_path: str) -> Dict[str, np.ndarray]:
+    """
+    Derives empirical distributions from the Tesla charging history, either a store built by
+    chargestore.py (*.npz) or a single export (*.csv): the measured daily usage (Wh) of every day, and
+    the session start times as plug-in times (minutes after midnight), split by weekday and weekend.
+    """
+    if history_path.endswith(".npz"):
+        sessions = chargestore.load_store(history_path)["sessions"]
+    else:
+        sessions = chargestore.parse_export(history_path).sort_values("start")
+    daily_usage = chargestore.spread_daily_usage(sessions)["usage_wh"].to_numpy()
+    # Local wall-clock time of each session
+    history = pd.DataFrame({"start": sessions["local_start"]})
+
+    minutes = (history["start"].dt.hour * 60 + history["start"].dt.minute).to_numpy(dtype=float)
+    weekend = (history["start"].dt.dayofweek >= 5).to_numpy()
+    return {
+        "daily_usage": daily_usage,
+        # Too few weekend sessions to fit on their own fall back to all sessions
+        "start": minutes[~weekend] if (~weekend).sum() >= 3 else minutes,
+        "weekend_start": minutes[weekend] if weekend.sum() >= 3 else minutes,
+    }
+
+def sample_days(model: dict, config: Configuration, is_weekend: np.ndarray, window: tuple, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """
+    Draws the daily usage (Wh) and plug-in/plug-out times (microseconds after midnight) of every day.
+    Values fitted from the charging history are resampled, everything else is normal around the window
+    of the charging calendar (start and end per day in microseconds). Days without window keep none.
+    """
+    count = len(is_weekend)
+    if "daily_usage" in model["fitted"]:
+        daily_usage = rng.choice(model["fitted"]["daily_usage"], count)
+    else:
+        daily_usage = rng.normal(config.daily_usage, model["usage_std"], count)
+
+    def window_time(field, weekend_field, mean, std_minutes):
+        if field in model["fitted"]:
+            minutes = np.where(is_weekend, rng.choice(model["fitted"][weekend_field], count), rng.choice(model["fitted"][field], count))
+        else:
+            minutes = rng.normal(mean / MICROSECONDS_PER_MINUTE, std_minutes)
+        # Whole minutes within the day, like the times in config.json
+        return np.clip(np.round(minutes), 0, 24 * 60 - 1).astype(np.int64) * MICROSECONDS_PER_MINUTE
+
+    window_start, window_end = window
+    start = window_time("start", "weekend_start", window_start, model["arrival_std"])
+    end = window_time("end", "weekend_end", window_end, model["departure_std"])
+    # A vehicle never leaves before it arrives; such days have no charging window
+    end = np.where(window_start <= window_end, np.maximum(end, start - 1), start - 1)
+    return {
+        "daily_usage": np.maximum(daily_usage, 0),
+        "start": start,
+        "end": end,
+    }
+
+def trial_arrays(arrays: Dict[str, np.ndarray], day_index: np.ndarray, sampled: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    start = sampled["start"][day_index]
+    end = sampled["end"][day_index]
+    time_of_day = arrays["time_of_day"]
+    return {
+        **arrays,
+        "in_window": (start <= time_of_day) & (time_of_day <= end),
+        "remaining_minutes": (end - time_of_day) / MICROSECONDS_PER_MINUTE,
+    }
+
+def init_worker(data: pd.DataFrame, config: dict, model: dict, prices: tuple):
+    global _shared_data, _arrays, _config, _model, _prices
+    _shared_data = data
+    _config = Configuration(**config)
+    _arrays = precompute_arrays(data, _config)
+    days, day_index = np.unique(_arrays["day"], return_inverse=True)
+    _arrays["day_index"] = day_index
+    # Monday == 0 like in precompute_arrays
+    _arrays["day_is_weekend"] = (days + 3) % 7 >= 5
+    _arrays["day_window"] = compile_windows(_config, days)
+    _model = model
+    _prices = prices
+
+def run_trial(trial: int) -> dict:
+    # Seeding with (seed, trial) makes every trial reproducible regardless of the number of workers
+    rng = np.random.default_rng([_model["seed"], trial])
+    sampled = sample_days(_model, _config, _arrays["day_is_weekend"], _arrays["day_window"], rng)
+    arrays = trial_arrays(_arrays, _arrays["day_index"], sampled)
+    simulators = create_simulators(_config)
+    output_df = simulate_vectorized(_shared_data, _config, simulators, initial_charge(_config, simulators),
+                                    arrays=arrays, daily_usage=sampled["daily_usage"])
+    return {'trial': trial, 'mean_daily_usage': sampled["daily_usage"].mean(), **summarize_charging(output_df, _config, *_prices)}
+
+def run_trials(df: pd.DataFrame, config: Configuration, model: dict, trials: int, prices: tuple, workers: int):
+    """
+    Yields the summary of every trial as soon as it is finished; the time series of a trial is discarded.
+    """
+    initargs = (df, config.model_dump(), model, prices)
+    if workers <= 1:
+        init_worker(*initargs)
+        yield from map(run_trial, range(trials))
+        return
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+        chunksize = max(1, trials // (workers * 8))
+        yield from pool.imap_unordered(run_trial, range(trials), chunksize=chunksize)
+
+def summarize_trials(summary: pd.DataFrame) -> pd.DataFrame:
+    """
+    Percentiles of cost and PV share over all trials, one row per charging method.
+    """
+    rows = []
+    for column in summary.columns:
+        if column.endswith("_cost"):
+            method = column[:-len("_cost")]
+            for metric in ("cost", "pv_share"):
+                values = summary[f"{method}_{metric}"].to_numpy()
+                row = {'method': method, 'metric': metric, 'mean': values.mean()}
+                row.update({f'p{p}': value for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))})
+                rows.append(row)
+    return pd.DataFrame(rows)
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.option("--datafile", default="data.csv", help="Data *.csv file")
+@click.option("--configfile", default="config.json", help="JSON configuration file")
+@click.option("--trials", type=int, default=1000, help="Number of trials")
+@click.option("--seed", type=int, default=0, help="Base seed, trial i uses the seed (seed, i)")
+@click.option("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+@click.option("--usage-std", type=float, default=None, help="Standard deviation of the daily usage in Wh (default: 25% of daily_usage)")
+@click.option("--arrival-std", type=float, default=60, help="Standard deviation of the plug-in time in minutes")
+@click.option("--departure-std", type=float, default=60, help="Standard deviation of the plug-out time in minutes")
+@click.option("--history", default=None, help="Fit daily usage and plug-in times from a charging history store *.npz or export *.csv (e.g. ../charging_history/charging_history.store.npz)")
+@click.option("--solar-price", default=0.097, type=float, help="Price per kWh of solar energy in €")
+@click.option("--grid-price", default=0.33, type=float, help="Price per kWh of grid energy in €")
+@click.option("--out", default="montecarlo.csv", help="Output *.csv file, one row per trial")
+@click.option("--percentiles-out", default=None, help="Optional *.csv file for the percentile table")
+def run(datafile: str, configfile: str, trials: int, seed: int, workers: int, usage_std: float, arrival_std: float, departure_std: float,
+        history: str, solar_price: float, grid_price: float, out: str, percentiles_out: str):
+    config = load_config(configfile)
+    df, _ = resample_input(filter_date_range(load_csv(datafile), config), config)
+    model = {
+        "seed": seed,
+        "usage_std": usage_std if usage_std is not None else config.daily_usage * 0.25,
+        "arrival_std": arrival_std,
+        "departure_std": departure_std,
+        "fitted": fit_history(history) if history else {},
+    }
+
+    click.echo(f"Running {trials} trials on {workers} worker(s) ...")
+    results = []
+    with open(out, "w", newline="") as out_file:
+        writer = None
+        for result in run_trials(df, config, model, trials, (solar_price, grid_price), workers):
+            if writer is None:
+                writer = csv.DictWriter(out_file, fieldnames=list(result))
+                writer.writeheader()
+            writer.writerow(result)
+            results.append(result)
+
+    percentiles = summarize_trials(pd.DataFrame(results).sort_values("trial"))
+    click.echo(percentiles.to_string(index=False, float_format=lambda value: f"{value:.2f}"))
+    if percentiles_out:
+        percentiles.to_csv(percentiles_out, index=False)
+    click.echo(f"Monte Carlo completed. Trial summaries saved in {out}")
+
+if __name__ == '__main__':
+    cli()
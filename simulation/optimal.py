@@ -0,0 +1,89 @@
+from __future__ import annotations
+from typing import List, Tuple
+
+from lazyimport import lazy_import
+
+np = lazy_import("numpy")
+
+
+# Cost per Wh below min_soc at the end of a charging window; large enough that missing the minimum is
+# only chosen when it cannot be reached at all
+SHORTFALL_PENALTY = 1.0
+
+def charging_powers(min_speed: float, step_size: float, max_speed: float) -> np.ndarray:
+    """
+    Charging powers a wallbox can set: off, or min_speed and every step_size above it up to max_speed.
+    """
+    steps = np.arange(min_speed, max_speed + step_size / 2, step_size)
+    return np.concatenate(([0.0], steps[steps <= max_speed]))
+
+def optimal_schedule(surplus: np.ndarray, day_bounds: List[Tuple[int, int]], starting_charge: float, minimum_charge: float,
+                     maximum_charge: float, daily_usage: float, powers: np.ndarray, calls_per_hour: int,
+                     solar_price: float, grid_price: float, resolution: float):
+    """
+    Perfect-foresight charging schedule with minimal energy cost over all days.
+
+    surplus holds the PV surplus (W) of every interval inside a charging window, grouped by day; day_bounds
+    has one (start, stop) slice into it per day, also for days without charging window. A backward dynamic
+    program over a charge grid with the given resolution (Wh) finds for every interval and charge level the
+    power that minimizes the cost until the end, requiring minimum_charge at the end of every day's window
+    and never exceeding maximum_charge. A forward pass then replays the decisions on the exact charge.
+
+    Returns the charging power and the charge after every interval, like BaseAlgorithm.step_many.
+    """
+    # The lowest charge that can occur: the start, or the minimum after a day of usage
+    low = min(starting_charge, minimum_charge - daily_usage) - resolution
+    levels = int(np.ceil((maximum_charge - low) / resolution)) + 1
+    charge_grid = low + np.arange(levels) * resolution
+    top = levels - 1
+    # Transitions round the charged energy down and the usage up, so the exact charge of the forward pass never
+    # falls below the grid level the decisions were made for and the minimum charge is reached for real
+    usage_steps = int(np.ceil(daily_usage / resolution - 1e-9))
+
+    # Transitions and powers are the same in every interval, only the surplus changes
+    level_steps = np.floor(powers / calls_per_hour / resolution + 1e-9).astype(int)
+    saving = (grid_price - solar_price) / calls_per_hour / 1000
+    shortfall = np.maximum(minimum_charge - charge_grid, 0) * SHORTFALL_PENALTY
+    # Only the levels close to maximum_charge cannot take every power in full; their costs are computed per level
+    clamped = int(np.searchsorted(charge_grid, maximum_charge - powers.max() / calls_per_hour))
+    effective_power = np.minimum(powers[:, np.newaxis], np.maximum(maximum_charge - charge_grid[np.newaxis, clamped:], 0) * calls_per_hour)
+    clamped_grid_cost = effective_power * grid_price / calls_per_hour / 1000
+    grid_cost = powers * grid_price / calls_per_hour / 1000
+
+    # Value (cost until the end) after every interval, a year at the default resolution takes about 200 MB
+    next_values = np.empty((len(surplus), levels), dtype=np.float32)
+    # padded[:levels] holds the current value, the tail repeats the top level so that value[min(level + step, top)]
+    # of every power is a row of a sliding window view. float32 halves the memory traffic of the inner loop.
+    padded = np.zeros(levels + level_steps.max(), dtype=np.float32)
+    value = padded[:levels]
+    shifted = np.lib.stride_tricks.sliding_window_view(padded, levels)
+    rows = np.arange(levels)
+    for start, stop in reversed(day_bounds):
+        # Value at the end of the day: penalty for missing the minimum plus the next day after the daily usage
+        value[:] = shortfall + value[np.maximum(rows - usage_steps, 0)]
+        for i in range(stop - 1, start - 1, -1):
+            padded[levels:] = value[-1]
+            next_values[i] = value
+            cost = shifted[level_steps]
+            # PV energy costs solar_price instead of grid_price
+            cost[:, :clamped] += (grid_cost - np.minimum(powers, surplus[i]) * saving).astype(np.float32)[:, np.newaxis]
+            cost[:, clamped:] += clamped_grid_cost - np.minimum(effective_power, surplus[i]) * saving
+            cost.min(axis=0, out=value)
+
+    charging_power = np.zeros(len(surplus))
+    charge_after = np.zeros(len(surplus))
+    charge = starting_charge
+    for start, stop in day_bounds:
+        for i in range(start, stop):
+            # Repeat the decision of the backward pass for the level of the exact charge
+            level = min(max(int(np.floor((charge - low) / resolution + 1e-9)), 0), top)
+            room = max(maximum_charge - charge, 0) * calls_per_hour
+            candidates = np.minimum(powers, room)
+            cost = candidates * grid_price / calls_per_hour / 1000 - np.minimum(candidates, surplus[i]) * saving \
+                + next_values[i, np.minimum(level + level_steps, top)]
+            power = candidates[np.argmin(cost)]
+            charge += power / calls_per_hour
+            charging_power[i] = power
+            charge_after[i] = charge
+        charge -= daily_usage
+    return charging_power, charge_after
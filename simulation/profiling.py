@@ -0,0 +1,104 @@
+import cProfile
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+import click
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.peak_traced_mb = None
+        self.max_rss_mb = 0.0
+
+class Profiler:
+    """
+    Collects wall time, call counts, processed rows and memory per named stage.
+    While disabled, stage() returns a shared no-op context manager, so instrumented code pays almost nothing.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.stages = {}
+        self._peaks = []
+        self._cprofile = None
+        self._cprofile_path = None
+        self._started = None
+
+    def enable(self, trace_memory: bool = False, cprofile_path: str = None):
+        self.enabled = True
+        self.trace_memory = trace_memory
+        self._started = time.perf_counter()
+        if trace_memory:
+            tracemalloc.start()
+        if cprofile_path:
+            self._cprofile_path = cprofile_path
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stage(self, name: str, rows: int = 0):
+        if not self.enabled:
+            return _NO_STAGE
+        return self._measure(name, rows)
+
+    @contextmanager
+    def _measure(self, name: str, rows: int):
+        stats = self.stages.setdefault(name, StageStats())
+        if self.trace_memory:
+            # Nested stages reset the peak, so the enclosing stage keeps its own running maximum
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            self._peaks.append(0)
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            stats.rows += rows
+            stats.max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            if self.trace_memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                stats.peak_traced_mb = max(stats.peak_traced_mb or 0, peak / 2**20)
+
+    def finish(self) -> str:
+        total = time.perf_counter() - self._started
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self._cprofile_path)
+        if self.trace_memory:
+            tracemalloc.stop()
+        lines = [f"{'Stage':<32}{'Calls':>8}{'Rows':>10}{'Time (s)':>11}{'Share':>8}{'Peak MB':>9}{'RSS MB':>8}"]
+        for name, stats in self.stages.items():
+            peak = f"{stats.peak_traced_mb:.1f}" if stats.peak_traced_mb is not None else "-"
+            share = stats.seconds / total * 100 if total > 0 else 0
+            rows = stats.rows if stats.rows else "-"
+            lines.append(f"{name:<32}{stats.calls:>8}{rows:>10}{stats.seconds:>11.4f}{share:>7.1f}%{peak:>9}{stats.max_rss_mb:>8.0f}")
+        lines.append(f"{'total':<32}{'':>8}{'':>10}{total:>11.4f}")
+        if self._cprofile_path:
+            lines.append(f"cProfile data saved in {self._cprofile_path}")
+        return "\n".join(lines)
+
+_NO_STAGE = nullcontext()
+
+profiler = Profiler()
+
+def profile_options(command):
+    """
+    Adds --profile, --profile-memory and --profile-output to a click group or command.
+    """
+    command = click.option("--profile-output", default=None, help="Also write cProfile data to this file (implies --profile)")(command)
+    command = click.option("--profile-memory", is_flag=True, help="Trace peak memory per stage with tracemalloc (implies --profile, slower)")(command)
+    command = click.option("--profile", is_flag=True, help="Print wall time, calls and memory per stage when done")(command)
+    return command
+
+def setup_profiling(profile: bool, profile_memory: bool, profile_output: str):
+    if not (profile or profile_memory or profile_output):
+        return
+    profiler.enable(trace_memory=profile_memory, cprofile_path=profile_output)
+    click.get_current_context().call_on_close(lambda: click.echo(profiler.finish(), err=True))
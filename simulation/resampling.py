@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from lazyimport import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+NANOSECONDS_PER_HOUR = 3_600_000_000_000
+
+GAP_FILLS = ["skip", "interpolate", "hold", "zero"]
+
+def slot_nanoseconds(calls_per_hour: int) -> int:
+    return NANOSECONDS_PER_HOUR // calls_per_hour
+
+def median_interval(times: np.ndarray) -> int:
+    """
+    Typical spacing of the timestamps in nanoseconds, robust against gaps and single irregular samples.
+    """
+    differences = np.diff(times.astype("datetime64[ns]").view(np.int64))
+    differences = differences[differences > 0]
+    return int(np.median(differences)) if len(differences) else 0
+
+def fill_gaps(slot_times: np.ndarray, values: np.ndarray, valid: np.ndarray, fill: str) -> np.ndarray:
+    if fill == "zero" or not valid.any():
+        return np.where(valid[:, np.newaxis], values, 0.0)
+    if fill == "hold":
+        # Index of the last valid slot at or before every slot, leading gaps take the first valid value
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(valid)), -1))
+        return values[np.where(last_valid >= 0, last_valid, np.argmax(valid))]
+    filled = values.copy()
+    for column in range(values.shape[1]):
+        filled[~valid, column] = np.interp(slot_times[~valid], slot_times[valid], values[valid, column])
+    return filled
+
+def resample(df: pd.DataFrame, calls_per_hour: int, fill: str = "skip", max_gap: pd.Timedelta = None):
+    """
+    Brings a time series of powers (W) at any interval, irregular or with gaps, onto a regular grid of
+    calls_per_hour slots per hour aligned to midnight, in one vectorized pass over all value columns.
+
+    Every sample is taken to hold from its timestamp until the next one, but at most max_gap (default:
+    the median interval of the data); each slot gets the time-weighted mean power of the samples covering
+    it, so energy is preserved for finer as well as coarser input. Slots covered by no sample are gaps:
+    'skip' leaves them out like missing rows before, 'interpolate', 'hold' or 'zero' fill them.
+
+    Returns the resampled DataFrame and the start times of all gap slots. Data that already lies on the
+    grid is returned unchanged when gaps are skipped.
+    """
+    slot = slot_nanoseconds(calls_per_hour)
+    df = df.sort_values("time", kind="stable").drop_duplicates("time", keep="last")
+    times = df["time"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    if len(times) == 0:
+        return df, np.empty(0, dtype="datetime64[ns]")
+    cap = int(max_gap / pd.Timedelta(1, "ns")) if max_gap is not None else (median_interval(times) or slot)
+
+    if fill == "skip" and cap == slot and np.all(times % slot == 0):
+        # Already on the grid: every sample covers exactly its own slot
+        present = (times - times[0]) // slot
+        missing = np.setdiff1d(np.arange(present[-1] + 1), present)
+        return df, (times[0] + missing * slot).view("datetime64[ns]")
+
+    value_columns = [name for name in df.columns if name != "time" and df[name].dtype.kind in "iuf"]
+    values = df[value_columns].to_numpy(dtype=float)
+    # Seconds since the first sample keep the cumulative energy well within float64 precision
+    origin = times[0] // slot * slot
+    start = (times - origin) / 1e9
+    duration = np.minimum(np.diff(times, append=times[-1] + cap), cap) / 1e9
+    end = start + duration
+
+    slots = -(-(times[-1] + cap - origin) // slot)
+    bounds = np.arange(slots + 1) * (slot / 1e9)
+    # Energy and covered time of all samples before every slot boundary; segments are sorted and disjoint
+    energy_before = np.vstack((np.zeros(len(value_columns)), np.cumsum(values * duration[:, np.newaxis], axis=0)))
+    covered_before = np.concatenate(([0.0], np.cumsum(duration)))
+    # Last sample starting before every boundary, and how much of it lies before the boundary
+    sample = np.searchsorted(start, bounds, side="right") - 1
+    started = sample >= 0
+    sample = np.maximum(sample, 0)
+    inside = np.where(started, np.clip(bounds - start[sample], 0, duration[sample]), 0)
+    energy = energy_before[sample] + values[sample] * inside[:, np.newaxis]
+    covered = covered_before[sample] + inside
+
+    slot_energy = np.diff(energy, axis=0)
+    slot_covered = np.diff(covered)
+    valid = slot_covered > 1e-9
+    slot_values = np.divide(slot_energy, slot_covered[:, np.newaxis], out=np.zeros_like(slot_energy), where=valid[:, np.newaxis])
+    slot_times = origin + np.arange(slots, dtype=np.int64) * slot
+
+    if fill == "skip":
+        keep = valid
+    else:
+        slot_values = fill_gaps(slot_times, slot_values, valid, fill)
+        keep = np.ones(slots, dtype=bool)
+    resampled = pd.DataFrame({"time": slot_times[keep].view("datetime64[ns]")})
+    for column, name in enumerate(value_columns):
+        resampled[name] = slot_values[keep, column]
+    return resampled, slot_times[~valid].view("datetime64[ns]")
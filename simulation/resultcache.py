@@ -0,0 +1,142 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+from pydantic import BaseModel
+
+from lazyimport import lazy_import
+from checkpoints import config_hash
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".result_cache")
+DEFAULT_MAX_MB = 1024
+
+def data_hash(df: pd.DataFrame) -> str:
+    digest = hashlib.sha256()
+    for name in ("time", "output", "consumption"):
+        values = df[name].to_numpy(dtype="datetime64[ns]").view(np.int64) if name == "time" else df[name].to_numpy()
+        digest.update(name.encode() + values.dtype.str.encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    On-disk cache of simulation results, addressed by the hash of the input data, the complete
+    configuration, the simulation engine and the source of the modules shaping the result. Least recently used entries are evicted above max_mb.
+    Hits and misses are counted in memory; one process writes them to the stats file with flush() or record(),
+    so the pool workers of a sweep hand their counts to the parent instead of updating the file concurrently.
+    """
+    def __init__(self, directory: str = None, max_mb: float = None):
+        self.directory = directory or os.environ.get("SIMULATION_CACHE_DIR", DEFAULT_DIRECTORY)
+        self.max_bytes = int((max_mb or float(os.environ.get("SIMULATION_CACHE_MB", DEFAULT_MAX_MB))) * 2**20)
+        self.counters = {"hits": 0, "misses": 0}
+
+    def key(self, df: pd.DataFrame, config: BaseModel, engine: str) -> str:
+        return hashlib.sha256((data_hash(df) + engine + config_hash(config, ignore=())).encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key: str) -> pd.DataFrame:
+        path = self.path(key)
+        try:
+            with np.load(path) as stored:
+                columns = stored["__columns__"].tolist()
+                data = {name: stored[f"column_{index}"] for index, name in enumerate(columns)}
+            os.utime(path)  # the modification time marks the last use for LRU eviction
+        except (OSError, KeyError, ValueError):
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        if "time" in data:
+            data["time"] = data["time"].view("datetime64[ns]")
+        return pd.DataFrame(data)
+
+    def put(self, key: str, result: pd.DataFrame):
+        os.makedirs(self.directory, exist_ok=True)
+        arrays = {"__columns__": np.array(result.columns, dtype=str)}
+        for index, name in enumerate(result.columns):
+            values = result[name].to_numpy()
+            arrays[f"column_{index}"] = values.view(np.int64) if values.dtype.kind == "M" else values
+        temporary = os.path.join(self.directory, f"{key}.{os.getpid()}.tmp.npz")
+        np.savez(temporary, **arrays)
+        os.replace(temporary, self.path(key))
+        self.evict()
+
+    def entries(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz") and ".tmp" not in name:
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def stats_path(self) -> str:
+        return os.path.join(self.directory, "stats.json")
+
+    def read_counters(self) -> dict:
+        try:
+            with open(self.stats_path()) as stats_file:
+                return json.load(stats_file)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0}
+
+    def take_counters(self) -> dict:
+        """
+        Returns the hits and misses counted since the last call and starts counting from zero.
+        """
+        counters, self.counters = self.counters, {"hits": 0, "misses": 0}
+        return counters
+
+    def record(self, counts: dict):
+        """
+        Adds hit and miss counts to the stats file in one update.
+        """
+        if not any(counts.values()):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        counters = self.read_counters()
+        for counter, count in counts.items():
+            counters[counter] = counters.get(counter, 0) + count
+        temporary = f"{self.stats_path()}.{os.getpid()}.tmp"
+        with open(temporary, "w") as stats_file:
+            json.dump(counters, stats_file)
+        os.replace(temporary, self.stats_path())
+
+    def flush(self):
+        self.record(self.take_counters())
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        return {
+            "directory": self.directory,
+            "entries": len(entries),
+            "size_mb": sum(size for _, size, _ in entries) / 2**20,
+            "max_mb": self.max_bytes / 2**20,
+            **self.read_counters(),
+        }
+
+    def clear(self) -> int:
+        entries = self.entries()
+        for _, _, name in entries:
+            os.remove(os.path.join(self.directory, name))
+        if os.path.exists(self.stats_path()):
+            os.remove(self.stats_path())
+        return len(entries)
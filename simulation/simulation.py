@@ -1,11 +1,28 @@
-from datetime import datetime, time, date
+from __future__ import annotations
+from datetime import datetime, time, date, timedelta
 import json
 import click
-import pandas as pd
-from pydantic import BaseModel
-from typing import Dict
+from pydantic import BaseModel, field_validator
+from typing import Dict, Optional
 
-from chargeAlgorithms import BaseAlgorithm, UncontrolledCharging, PresetCharging, SurplusChargingAllInformation, SurplusChargingNoSocInformation
+from lazyimport import lazy_import
+from binaryoutput import load_output, write_output
+from chargingcalendar import EPOCH, Calendar, compile_windows, day_window
+from checkpoints import config_hash, day_hashes, load_checkpoints, matching_prefix, save_checkpoints, truncate_output
+from datacache import load_csv
+from optimal import charging_powers, optimal_schedule
+from profiling import profile_options, profiler, setup_profiling
+from resampling import GAP_FILLS, resample
+from resultcache import ResultCache
+from surplusprofile import QUANTILES, load_profile
+from chargeAlgorithms import BaseAlgorithm, UncontrolledCharging, PresetCharging, SurplusChargingAllInformation, SurplusChargingNoSocInformation, SurplusChargingForecast
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+MICROSECONDS_PER_DAY = 86_400_000_000
+NANOSECONDS_PER_DAY = 86_400_000_000_000
 
 class Configuration(BaseModel):
     daily_usage: int
@@ -28,6 +45,18 @@ class Configuration(BaseModel):
     minimum_charge_speed: int
     charge_step_size: int
     step_mode: str
+    calendar: Calendar = Calendar()
+    # Surplus profile file (surplusprofile.py); enables the method 'surplus_forecast'
+    surplus_profile: Optional[str] = None
+    # Quantile of the profile the forecast relies on, null for the mean
+    forecast_quantile: Optional[int] = 50
+
+    @field_validator("forecast_quantile")
+    @classmethod
+    def known_quantile(cls, quantile):
+        if quantile is not None and quantile not in QUANTILES:
+            raise ValueError(f"forecast_quantile must be one of {', '.join(map(str, QUANTILES))} or null")
+        return quantile
 
 def load_config(config_path: str) -> Configuration:
     with open(config_path) as config_file:
@@ -39,6 +68,12 @@ def calculate_remaining_minutes(current_time: time, end_time: time) -> float:
     dt2 = datetime.combine(date, end_time)
     return (dt2 - dt1).total_seconds() / 60
 
+def microseconds_to_time(value: int) -> time:
+    seconds, microsecond = divmod(value, 1_000_000)
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    return time(hour, minute, second, microsecond)
+
 def create_simulators(config: Configuration) -> Dict[str, BaseAlgorithm]:
     min_charge = config.min_soc * config.capacity / 100
     max_charge = config.max_soc * config.capacity / 100
@@ -55,7 +90,7 @@ def create_simulators(config: Configuration) -> Dict[str, BaseAlgorithm]:
         "step_size": config.charge_step_size,
         "charge_mode": config.step_mode
     }
-    return {
+    simulators = {
         "uncontrolled": UncontrolledCharging(**common_params),
         "preset": PresetCharging(
             calls_per_hour=config.calls_per_hour,
@@ -67,12 +102,19 @@ def create_simulators(config: Configuration) -> Dict[str, BaseAlgorithm]:
         "surplus_all": SurplusChargingAllInformation(**surplus_params),
         "surplus_no_soc": SurplusChargingNoSocInformation(**surplus_params)
     }
+    if config.surplus_profile:
+        simulators["surplus_forecast"] = SurplusChargingForecast(**surplus_params, profile=load_profile(config.surplus_profile),
+                                                                 quantile=config.forecast_quantile)
+    return simulators
 
 def process_day_data(day_data: pd.DataFrame, config: Configuration, simulators: Dict[str, BaseAlgorithm], current_charge: Dict[str, float]) -> list:
     results = []
-    is_weekend = day_data.iloc[0]['time'].weekday() >= 5
-    start_time = config.weekend_start if is_weekend else config.start
-    end_time = config.weekend_end if is_weekend else config.end
+    window = day_window(config, day_data.iloc[0]['time'].date())
+    if window is None:
+        return results
+    start_time, end_time = window
+    for simulator in simulators.values():
+        simulator.set_date(day_data.iloc[0]['time'].date())
 
     for _, row in day_data.iterrows():
         current_time = row['time'].time()
@@ -80,13 +122,14 @@ def process_day_data(day_data: pd.DataFrame, config: Configuration, simulators:
             row_result = {'time': row['time'], 'surplus': max(row['output'] - row['consumption'], 0)}
             
             for name, simulator in simulators.items():
-                charge_power = simulator.step(
-                    calculate_remaining_minutes(current_time, config.end),
-                    current_charge[name],
-                    current_time,
-                    row['output'],
-                    row['consumption']
-                )
+                with profiler.stage(f'algorithm:{name}', rows=1):
+                    charge_power = simulator.step(
+                        calculate_remaining_minutes(current_time, end_time),
+                        current_charge[name],
+                        current_time,
+                        row['output'],
+                        row['consumption']
+                    )
                 current_charge[name] += charge_power / config.calls_per_hour
                 row_result[f'{name}_charging_power'] = charge_power
                 row_result[f'{name}_charging_soc'] = (current_charge[name] / config.capacity) * 100
@@ -95,41 +138,381 @@ def process_day_data(day_data: pd.DataFrame, config: Configuration, simulators:
 
     return results
 
+def precompute_arrays(df: pd.DataFrame, config: Configuration) -> Dict[str, np.ndarray]:
+    timestamps = df['time'].to_numpy(dtype='datetime64[us]').astype(np.int64)
+    day = timestamps // MICROSECONDS_PER_DAY
+    time_of_day = timestamps - day * MICROSECONDS_PER_DAY
+    # 1970-01-01 was a Thursday, so (day + 3) % 7 yields Monday == 0 like datetime.weekday()
+    is_weekend = (day + 3) % 7 >= 5
+    # Window of every row from the charging calendar, resolved once per day
+    start, end = compile_windows(config, day)
+    output = df['output'].to_numpy()
+    consumption = df['consumption'].to_numpy()
+    return {
+        'day': day,
+        'time_of_day': time_of_day,
+        'is_weekend': is_weekend,
+        'in_window': (start <= time_of_day) & (time_of_day <= end),
+        'remaining_minutes': (end - time_of_day) / 1_000_000 / 60,
+        'output': output,
+        'consumption': consumption,
+        'surplus': np.maximum(output - consumption, 0),
+    }
+
+def filter_date_range(df: pd.DataFrame, config: Configuration) -> pd.DataFrame:
+    first = pd.Timestamp(config.start_date)
+    after_last = pd.Timestamp(config.end_date) + pd.Timedelta(days=1)
+    return df[(df['time'] >= first) & (df['time'] < after_last)]
+
+def resample_input(df: pd.DataFrame, config: Configuration, fill_gaps: str = "skip", max_gap: float = None):
+    """
+    Resamples the data to calls_per_hour; max_gap in minutes. Returns the data and the number of gap slots.
+    """
+    resampled, gaps = resample(df, config.calls_per_hour, fill_gaps, pd.Timedelta(minutes=max_gap) if max_gap is not None else None)
+    return resampled, len(gaps)
+
+def report_gaps(gaps: int, fill_gaps: str):
+    if gaps:
+        print(f"{gaps} interval(s) without data {'skipped' if fill_gaps == 'skip' else f'filled ({fill_gaps})'}.")
+
+def initial_charge(config: Configuration, simulators: Dict[str, BaseAlgorithm]) -> Dict[str, float]:
+    return {sim: config.capacity * config.starting_soc / 100 for sim in simulators}
+
+def day_end_state(rows: int, simulators: Dict[str, BaseAlgorithm], current_charge: Dict[str, float]) -> dict:
+    return {
+        'rows': rows,
+        'charge': dict(current_charge),
+        'state': {name: simulator.get_state() for name, simulator in simulators.items()},
+    }
+
+def simulate_rows(df: pd.DataFrame, config: Configuration, simulators: Dict[str, BaseAlgorithm], current_charge: Dict[str, float], day_states: list = None) -> pd.DataFrame:
+    df = df.assign(date=df['time'].dt.date)
+    results = []
+
+    for _, day_data in df.groupby('date'):
+        with profiler.stage('process_day', rows=len(day_data)):
+            day_results = process_day_data(day_data, config, simulators, current_charge)
+        results.extend(day_results)
+        for sim in current_charge:
+            current_charge[sim] -= config.daily_usage
+        if day_states is not None:
+            day_states.append(day_end_state(len(day_results), simulators, current_charge))
+
+    with profiler.stage('build_output', rows=len(results)):
+        output_df = pd.DataFrame(results)
+        # Algorithms return int or float powers; keep float columns even if a chunk happens to contain only ints
+        return output_df.astype({column: float for column in output_df.columns if column.endswith(('_charging_power', '_charging_soc'))})
+
+def group_window_rows(arrays: Dict[str, np.ndarray]):
+    """
+    Returns the indices of all rows inside the charging window ordered by day, and one (start, stop)
+    slice into them per day of the data (empty for days without charging window).
+    """
+    order = np.argsort(arrays['day'], kind='stable')
+    selected = order[arrays['in_window'][order]]
+    days = np.unique(arrays['day'])
+    selected_days = arrays['day'][selected]
+    day_bounds = list(zip(np.searchsorted(selected_days, days, side='left').tolist(),
+                          np.searchsorted(selected_days, days, side='right').tolist()))
+    return selected, day_bounds
+
+def simulate_vectorized(df: pd.DataFrame, config: Configuration, simulators: Dict[str, BaseAlgorithm], current_charge: Dict[str, float], day_states: list = None,
+                        arrays: Dict[str, np.ndarray] = None, daily_usage: np.ndarray = None) -> pd.DataFrame:
+    # Callers may pass their own arrays (e.g. other charging windows) and a daily usage per day instead of config.daily_usage
+    with profiler.stage('precompute_arrays', rows=len(df)):
+        if arrays is None:
+            arrays = precompute_arrays(df, config)
+    with profiler.stage('group_days', rows=len(df)):
+        selected, day_bounds = group_window_rows(arrays)
+        dates = [EPOCH + timedelta(days=day) for day in np.unique(arrays['day']).tolist()]
+
+    with profiler.stage('prepare_inputs', rows=len(selected)):
+        time_of_day = arrays['time_of_day'][selected]
+        unique_times, time_index = np.unique(time_of_day, return_inverse=True)
+        time_objects = [microseconds_to_time(us) for us in unique_times.tolist()]
+        current_times = [time_objects[i] for i in time_index.tolist()]
+        time_left = arrays['remaining_minutes'][selected].tolist()
+        output = arrays['output'][selected].tolist()
+        consumption = arrays['consumption'][selected].tolist()
+
+    # Simulators run one after another over all days, so their day-end states are filled in per simulator
+    states = [{'rows': stop - start, 'charge': {}, 'state': {}} for start, stop in day_bounds] if day_states is not None else None
+
+    columns = {'time': df['time'].to_numpy()[selected], 'surplus': arrays['surplus'][selected]}
+    for name, simulator in simulators.items():
+        charge = current_charge[name]
+        charging_power = np.empty(len(selected))
+        charging_soc = np.empty(len(selected))
+        for day_index, (start, stop) in enumerate(day_bounds):
+            if stop > start:
+                simulator.set_date(dates[day_index])
+                with profiler.stage(f'algorithm:{name}', rows=stop - start):
+                    day_power, day_charge = simulator.step_many(time_left[start:stop], charge, current_times[start:stop],
+                                                                output[start:stop], consumption[start:stop])
+                charging_power[start:stop] = day_power
+                charging_soc[start:stop] = (day_charge / config.capacity) * 100
+                charge = day_charge[-1].item()
+            charge -= config.daily_usage if daily_usage is None else daily_usage[day_index]
+            if states is not None:
+                states[day_index]['charge'][name] = charge
+                states[day_index]['state'][name] = simulator.get_state()
+        current_charge[name] = charge
+        columns[f'{name}_charging_power'] = charging_power
+        columns[f'{name}_charging_soc'] = charging_soc
+
+    if day_states is not None:
+        day_states.extend(states)
+    with profiler.stage('build_output', rows=len(selected)):
+        return pd.DataFrame(columns)
+
+def simulate_optimal(df: pd.DataFrame, config: Configuration, solar_price: float, grid_price: float, resolution: float = None) -> pd.DataFrame:
+    """
+    Cost-minimal charging with perfect foresight of the whole period as a lower bound for the algorithms.
+    Returns the 'optimal' columns for the same rows as the simulation engines.
+    """
+    with profiler.stage('precompute_arrays', rows=len(df)):
+        arrays = precompute_arrays(df, config)
+        selected, day_bounds = group_window_rows(arrays)
+    with profiler.stage('algorithm:optimal', rows=len(selected)):
+        charging_power, charge_after = optimal_schedule(
+            arrays['surplus'][selected], day_bounds,
+            starting_charge=config.capacity * config.starting_soc / 100,
+            minimum_charge=config.min_soc * config.capacity / 100,
+            maximum_charge=config.max_soc * config.capacity / 100,
+            daily_usage=config.daily_usage,
+            powers=charging_powers(config.minimum_charge_speed, config.charge_step_size, config.max_charging_speed),
+            calls_per_hour=config.calls_per_hour,
+            solar_price=solar_price,
+            grid_price=grid_price,
+            # By default one charge step per interval, so every charging power maps exactly onto the grid
+            resolution=resolution or config.charge_step_size / config.calls_per_hour,
+        )
+    return pd.DataFrame({
+        'time': df['time'].to_numpy()[selected],
+        'optimal_charging_power': charging_power,
+        'optimal_charging_soc': charge_after / config.capacity * 100,
+    })
+
+SIMULATION_ENGINES = {
+    "rows": simulate_rows,
+    "vectorized": simulate_vectorized,
+}
+
+def run_simulation(df: pd.DataFrame, config: Configuration, engine: str = "vectorized", cache: ResultCache = None) -> pd.DataFrame:
+    if cache is not None:
+        with profiler.stage('result_cache_lookup', rows=len(df)):
+            key = cache.key(df, config, engine)
+            cached = cache.get(key)
+        if cached is not None:
+            return cached
+    simulators = create_simulators(config)
+    output_df = SIMULATION_ENGINES[engine](df, config, simulators, initial_charge(config, simulators))
+    if cache is not None:
+        with profiler.stage('result_cache_store', rows=len(output_df)):
+            cache.put(key, output_df)
+    return output_df
+
+def read_whole_days(datafile: str, chunksize: int):
+    """
+    Reads the data file in chunks of about chunksize rows, cut at date boundaries so that every
+    yielded DataFrame contains complete days only. The data file has to be sorted by time.
+    """
+    remainder = None
+    for chunk in pd.read_csv(datafile, parse_dates=['time'], chunksize=chunksize):
+        if remainder is not None:
+            chunk = pd.concat([remainder, chunk], ignore_index=True)
+        last_day = chunk['time'].iloc[-1].normalize()
+        complete = chunk['time'] < last_day
+        remainder = chunk[~complete]
+        if complete.any():
+            yield chunk[complete]
+    if remainder is not None and not remainder.empty:
+        yield remainder
+
+def simulate_stream(datafile: str, config: Configuration, out: str, engine: str = "vectorized", chunksize: int = 50_000,
+                    fill_gaps: str = "skip", max_gap: float = None) -> int:
+    """
+    Simulates the data file chunk by chunk, carrying the algorithm state and the current charge
+    across chunks and appending the results to out, so memory does not grow with the data span.
+    Returns the number of rows written.
+    """
+    simulators = create_simulators(config)
+    current_charge = initial_charge(config, simulators)
+    after_last = pd.Timestamp(config.end_date) + pd.Timedelta(days=1)
+    rows_written = 0
+    chunks = read_whole_days(datafile, chunksize)
+    while True:
+        with profiler.stage('read_chunk'):
+            chunk = next(chunks, None)
+        if chunk is None or chunk['time'].iloc[0] >= after_last:
+            break
+        with profiler.stage('filter_dates', rows=len(chunk)):
+            chunk = filter_date_range(chunk, config)
+        if chunk.empty:
+            continue
+        with profiler.stage('resample', rows=len(chunk)):
+            chunk, _ = resample_input(chunk, config, fill_gaps, max_gap)
+        output_df = SIMULATION_ENGINES[engine](chunk, config, simulators, current_charge)
+        if output_df.empty:
+            continue
+        with profiler.stage('write_csv', rows=len(output_df)):
+            output_df.to_csv(out, index=False, mode='w' if rows_written == 0 else 'a', header=rows_written == 0)
+        rows_written += len(output_df)
+    return rows_written
+
+def simulate_incremental(datafile: str, config: Configuration, out: str, checkpoint_path: str, engine: str = "vectorized",
+                         fill_gaps: str = "skip", max_gap: float = None):
+    """
+    Resumes the simulation from the last checkpoint whose day, data (including all earlier days) and
+    configuration are unchanged, and appends only the remaining days to out.
+    Returns the number of reused days and the number of simulated days, or None without data.
+    """
+    df = filter_date_range(load_csv(datafile), config)
+    if df.empty:
+        return None
+    df, _ = resample_input(df, config, fill_gaps, max_gap)
+    day = df['time'].to_numpy(dtype='datetime64[ns]').view(np.int64) // NANOSECONDS_PER_DAY
+    order = np.argsort(day, kind='stable')
+    df = df.iloc[order]
+    days, starts = np.unique(day[order], return_index=True)
+    bounds = starts.tolist() + [len(df)]
+    dates = [str(np.datetime64(int(d), 'D')) for d in days]
+    hashes = day_hashes(df, bounds)
+
+    digest = config_hash(config)
+    checkpoints = load_checkpoints(checkpoint_path, digest)
+    reused = matching_prefix(checkpoints, dates, hashes)
+    if reused > 0 and not truncate_output(out, checkpoints[reused - 1]['output_rows']):
+        reused = 0
+    checkpoints = checkpoints[:reused]
+    if reused == len(dates):
+        return reused, 0
+
+    simulators = create_simulators(config)
+    if reused > 0:
+        current_charge = dict(checkpoints[-1]['charge'])
+        for name, simulator in simulators.items():
+            simulator.set_state(checkpoints[-1]['state'][name])
+    else:
+        current_charge = initial_charge(config, simulators)
+
+    day_states = []
+    output_df = SIMULATION_ENGINES[engine](df.iloc[bounds[reused]:], config, simulators, current_charge, day_states)
+    with profiler.stage('write_csv', rows=len(output_df)):
+        output_df.to_csv(out, index=False, mode='a' if reused > 0 else 'w', header=reused == 0)
+
+    output_rows = checkpoints[-1]['output_rows'] if checkpoints else 0
+    for date, digest_of_day, state in zip(dates[reused:], hashes[reused:], day_states):
+        output_rows += state['rows']
+        checkpoints.append({'date': date, 'hash': digest_of_day, 'output_rows': output_rows,
+                            'charge': state['charge'], 'state': state['state']})
+    save_checkpoints(checkpoint_path, digest, checkpoints)
+    return reused, len(dates) - reused
+
 @click.group()
-def cli():
-    pass
+@profile_options
+def cli(profile: bool, profile_memory: bool, profile_output: str):
+    setup_profiling(profile, profile_memory, profile_output)
 
 @click.command()
 @click.option("--datafile", default="data.csv", help="Data *.csv file")
 @click.option("--configfile", default="config.json", help="JSON configuration file")
 @click.option("--out", default="out.csv", help="Output *.csv file")
-def simulation(datafile: str, configfile: str, out: str):
+@click.option("--engine", default="vectorized", type=click.Choice(list(SIMULATION_ENGINES)), help="Simulation engine ('rows' is the original per-row reference implementation)")
+@click.option("--stream", is_flag=True, help="Read the data file and write the results chunk by chunk with constant memory")
+@click.option("--chunksize", default=50_000, type=int, help="Approximate number of input rows per chunk in --stream mode")
+@click.option("--incremental", is_flag=True, help="Resume from day-end checkpoints and append only new or changed days")
+@click.option("--checkpoint-file", default=None, help="Checkpoint file for --incremental (default: <out>.checkpoints.json)")
+@click.option("--no-cache", is_flag=True, help="Always simulate instead of reusing a cached result of an identical run")
+@click.option("--optimal", is_flag=True, help="Add the cost-minimal perfect-foresight schedule as method 'optimal'")
+@click.option("--solar-price", default=0.097, type=float, help="Price per kWh of solar energy in € minimized by --optimal")
+@click.option("--grid-price", default=0.33, type=float, help="Price per kWh of grid energy in € minimized by --optimal")
+@click.option("--optimal-resolution", default=None, type=float, help="Charge grid resolution of --optimal in Wh (default: charge_step_size / calls_per_hour)")
+@click.option("--format", "output_format", default="csv", type=click.Choice(["csv", "binary"]), help="Output format; 'binary' is a compact float32 file that evaluation.py memory-maps")
+@click.option("--fill-gaps", default="skip", type=click.Choice(GAP_FILLS), help="How intervals without data are handled after resampling to calls_per_hour")
+@click.option("--max-gap", default=None, type=float, help="Minutes a sample is held at most before the data counts as missing (default: the median interval of the data)")
+def simulation(datafile: str, configfile: str, out: str, engine: str, stream: bool, chunksize: int, incremental: bool, checkpoint_file: str, no_cache: bool,
+               optimal: bool, solar_price: float, grid_price: float, optimal_resolution: float, output_format: str, fill_gaps: str, max_gap: float):
     config = load_config(configfile)
-    df = pd.read_csv(datafile, parse_dates=['time'])
 
-    df = df[(df['time'].dt.date >= pd.to_datetime(config.start_date).date()) & 
-            (df['time'].dt.date <= pd.to_datetime(config.end_date).date())]
+    if optimal and (stream or incremental):
+        raise click.UsageError("--optimal needs the whole period and cannot be combined with --stream or --incremental.")
+    if output_format == "binary" and (stream or incremental):
+        raise click.UsageError("--format binary cannot be combined with --stream or --incremental, which append to a CSV file.")
+
+    if incremental:
+        if stream:
+            raise click.UsageError("--incremental cannot be combined with --stream.")
+        result = simulate_incremental(datafile, config, out, checkpoint_file or f"{out}.checkpoints.json", engine, fill_gaps, max_gap)
+        if result is None:
+            print(f"No data available between {config.start_date} and {config.end_date}.")
+            return
+        reused, simulated = result
+        print(f"Simulation completed. Reused {reused} day(s) from checkpoints, simulated {simulated} day(s). Results saved in {out}")
+        return
+
+    if stream:
+        if simulate_stream(datafile, config, out, engine, chunksize, fill_gaps, max_gap) == 0:
+            print(f"No data available between {config.start_date} and {config.end_date}.")
+            return
+        print(f"Simulation completed. Results saved in {out}")
+        return
+
+    with profiler.stage('load_csv'):
+        df = load_csv(datafile)
+    with profiler.stage('filter_dates', rows=len(df)):
+        df = filter_date_range(df, config)
 
     if df.empty:
         print(f"No data available between {config.start_date} and {config.end_date}.")
         return
-    
-    df['date'] = df['time'].dt.date 
-    results = []
-    
-    simulators = create_simulators(config)
-    current_charge = {sim: config.capacity * config.starting_soc / 100 for sim in simulators}
-    
-    for _, day_data in df.groupby('date'):
-        results.extend(process_day_data(day_data, config, simulators, current_charge))
-        for sim in current_charge:
-            current_charge[sim] -= config.daily_usage
+    with profiler.stage('resample', rows=len(df)):
+        df, gaps = resample_input(df, config, fill_gaps, max_gap)
+    report_gaps(gaps, fill_gaps)
 
-    output_df = pd.DataFrame(results)
-    output_df.to_csv(out, index=False)
+    cache = None if no_cache else ResultCache()
+    output_df = run_simulation(df, config, engine, cache=cache)
+    if cache is not None:
+        cache.flush()
+    if optimal:
+        optimal_df = simulate_optimal(df, config, solar_price, grid_price, optimal_resolution)
+        output_df = output_df.assign(optimal_charging_power=optimal_df['optimal_charging_power'].to_numpy(),
+                                     optimal_charging_soc=optimal_df['optimal_charging_soc'].to_numpy())
+    if output_format == "binary":
+        with profiler.stage('write_binary', rows=len(output_df)):
+            write_output(out, output_df, config)
+    else:
+        with profiler.stage('write_csv', rows=len(output_df)):
+            output_df.to_csv(out, index=False)
     print(f"Simulation completed. Results saved in {out}")
 
 cli.add_command(simulation)
 
+@cli.command()
+@click.option("--infile", required=True, help="Binary simulation output")
+@click.option("--out", required=True, help="Output *.csv file")
+def export(infile: str, out: str):
+    """Convert a binary simulation output into a CSV file."""
+    load_output(infile).to_csv(out, index=False)
+    print(f"Exported {infile} to {out}")
+
+@cli.group()
+def cache():
+    """Inspect or clear the cache of simulation results."""
+    pass
+
+@cache.command()
+def stats():
+    cache_stats = ResultCache().stats()
+    print(f"Directory: {cache_stats['directory']}")
+    print(f"Entries:   {cache_stats['entries']}")
+    print(f"Size:      {cache_stats['size_mb']:.1f} MB of {cache_stats['max_mb']:.0f} MB")
+    print(f"Hits:      {cache_stats['hits']}")
+    print(f"Misses:    {cache_stats['misses']}")
+
+@cache.command()
+def clear():
+    print(f"Removed {ResultCache().clear()} cached result(s).")
+
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,211 @@
+from __future__ import annotations
+import json
+import os
+from datetime import date, time
+import click
+from typing import Dict
+
+from lazyimport import lazy_import
+from datacache import load_csv
+from resampling import NANOSECONDS_PER_HOUR, median_interval, resample
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+NANOSECONDS_PER_DAY = 24 * NANOSECONDS_PER_HOUR
+PROFILE_VERSION = 1
+
+# Periods of the year a profile distinguishes; weeks are 7-day blocks of the day of the year
+PERIODS = {
+    "month": 12,
+    "week": 53,
+}
+QUANTILES = [10, 25, 50, 75, 90]
+
+# Surplus histogram per cell, values outside the range count into the first or last bin
+BIN_WIDTH = 100
+BIN_MIN = -15000
+BINS = 400
+
+def period_indices(day: np.ndarray, period: str) -> np.ndarray:
+    """
+    Period of the year (0-based) of every day given as days since the epoch.
+    """
+    dates = day.astype("datetime64[D]")
+    if period == "month":
+        return dates.astype("datetime64[M]").astype(np.int64) % 12
+    return (dates - dates.astype("datetime64[Y]")).astype(np.int64) // 7
+
+class SurplusProfile:
+    """
+    Surplus statistics (W, output - consumption) per period of the year and slot of the day. Every cell
+    keeps the sample count, sum and a histogram, so new days can be added at any time; mean and quantiles
+    of all cells are derived after each update and looked up by index.
+    """
+    def __init__(self, period: str = "month", slots_per_hour: int = 12):
+        self.period = period
+        self.slots_per_hour = slots_per_hour
+        shape = (PERIODS[period], 24 * slots_per_hour)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.total = np.zeros(shape)
+        self.histogram = np.zeros(shape + (BINS,), dtype=np.int32)
+        # Days since the epoch already contained, so the same day is never counted twice
+        self.days = np.empty(0, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.quantiles = np.zeros((len(QUANTILES),) + shape)
+
+    @property
+    def slots(self) -> int:
+        return 24 * self.slots_per_hour
+
+    def period_of(self, day: date) -> int:
+        return int(period_indices(np.array([day.toordinal() - date(1970, 1, 1).toordinal()]), self.period)[0])
+
+    def slot_of(self, value: time) -> int:
+        return (value.hour * 60 + value.minute) * self.slots_per_hour // 60
+
+    def slot_times(self):
+        return [time(*divmod(slot * 60 // self.slots_per_hour, 60)) for slot in range(self.slots)]
+
+    def update(self, df: pd.DataFrame) -> int:
+        """
+        Adds all complete days of df (time, output, consumption at any resolution) that are not contained yet
+        and returns their number. Days are added as a whole and never again, so the newest day of df, which
+        may still grow (today is only fetched up to the current time), is skipped until it reaches the last slot.
+        """
+        day = df["time"].to_numpy(dtype="datetime64[ns]").view(np.int64) // NANOSECONDS_PER_DAY
+        new = ~np.isin(day, self.days)
+        if not new.any():
+            return 0
+        newest = day.max()
+        rows, _ = resample(df[new], self.slots_per_hour)
+        timestamps = rows["time"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        day = timestamps // NANOSECONDS_PER_DAY
+        slot = (timestamps - day * NANOSECONDS_PER_DAY) // (NANOSECONDS_PER_HOUR // self.slots_per_hour)
+        if (day == newest).any() and slot[day == newest].max() < self.slots - 1:
+            complete = day != newest
+            rows, day, slot = rows[complete], day[complete], slot[complete]
+            if len(day) == 0:
+                return 0
+        cell = period_indices(day, self.period) * self.slots + slot
+        surplus = (rows["output"] - rows["consumption"]).to_numpy(dtype=float)
+        bins = np.clip((surplus - BIN_MIN) // BIN_WIDTH, 0, BINS - 1).astype(np.int64)
+
+        cells = self.count.size
+        self.count += np.bincount(cell, minlength=cells).reshape(self.count.shape)
+        self.total += np.bincount(cell, weights=surplus, minlength=cells).reshape(self.total.shape)
+        self.histogram += np.bincount(cell * BINS + bins, minlength=cells * BINS).reshape(self.histogram.shape).astype(np.int32)
+        added = np.unique(day)
+        self.days = np.union1d(self.days, added)
+        self.refresh()
+        return len(added)
+
+    def refresh(self):
+        filled = self.count > 0
+        self.mean = np.divide(self.total, self.count, out=np.zeros_like(self.total), where=filled)
+        cumulative = np.cumsum(self.histogram, axis=-1)
+        for index, quantile in enumerate(QUANTILES):
+            # First bin reaching the quantile, interpolated linearly within the bin
+            target = self.count * quantile / 100
+            bin_index = np.minimum((cumulative < target[..., np.newaxis]).sum(axis=-1), BINS - 1)
+            below = np.take_along_axis(cumulative, np.maximum(bin_index - 1, 0)[..., np.newaxis], axis=-1)[..., 0] * (bin_index > 0)
+            inside = np.take_along_axis(self.histogram, bin_index[..., np.newaxis], axis=-1)[..., 0]
+            fraction = np.divide(target - below, inside, out=np.zeros_like(target), where=inside > 0)
+            self.quantiles[index] = np.where(filled, BIN_MIN + (bin_index + fraction) * BIN_WIDTH, 0)
+
+    def table(self, quantile: int = None) -> np.ndarray:
+        """
+        Mean (quantile None) or the given quantile of every (period, slot) cell.
+        """
+        return self.mean if quantile is None else self.quantiles[QUANTILES.index(quantile)]
+
+    def lookup(self, day: date, value: time, quantile: int = None) -> float:
+        return float(self.table(quantile)[self.period_of(day), self.slot_of(value)])
+
+    def time_of_day_mean(self) -> np.ndarray:
+        """
+        Mean surplus per slot of the day over all periods.
+        """
+        count = self.count.sum(axis=0)
+        return np.divide(self.total.sum(axis=0), count, out=np.zeros(self.slots), where=count > 0)
+
+    def save(self, path: str):
+        meta = {"version": PROFILE_VERSION, "period": self.period, "slots_per_hour": self.slots_per_hour,
+                "bin_min": BIN_MIN, "bin_width": BIN_WIDTH, "bins": BINS}
+        temporary = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(temporary, meta=np.array(json.dumps(meta)), count=self.count, total=self.total,
+                            histogram=self.histogram, days=self.days)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SurplusProfile":
+        with np.load(path) as stored:
+            meta = json.loads(stored["meta"].item())
+            if meta["version"] != PROFILE_VERSION or (meta["bin_min"], meta["bin_width"], meta["bins"]) != (BIN_MIN, BIN_WIDTH, BINS):
+                raise ValueError(f"{path} was created by an incompatible version, please rebuild it")
+            profile = cls(meta["period"], meta["slots_per_hour"])
+            profile.count = stored["count"]
+            profile.total = stored["total"]
+            profile.histogram = stored["histogram"]
+            profile.days = stored["days"]
+        profile.refresh()
+        return profile
+
+# Profiles loaded by load_profile, by path and modification time, so repeated simulations share them
+_loaded: Dict[tuple, SurplusProfile] = {}
+
+def load_profile(path: str) -> SurplusProfile:
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _loaded:
+        _loaded[key] = SurplusProfile.load(path)
+    return _loaded[key]
+
+def update_profile(path: str, df: pd.DataFrame, period: str = "month", slots_per_hour: int = None) -> SurplusProfile:
+    """
+    Opens the profile at path, or creates it (by default at the resolution of the data), adds the new
+    days of df and saves it if anything was added.
+    """
+    if os.path.exists(path):
+        profile = SurplusProfile.load(path)
+    else:
+        if slots_per_hour is None:
+            interval = median_interval(df["time"].to_numpy())
+            slots_per_hour = max(round(NANOSECONDS_PER_HOUR / interval), 1) if interval else 12
+        profile = SurplusProfile(period, slots_per_hour)
+    if profile.update(df) or not os.path.exists(path):
+        profile.save(path)
+    return profile
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.option("--datafile", "datafiles", multiple=True, required=True, help="Data *.csv file, can be given several times")
+@click.option("--profile", "profile_path", default="surplus.profile.npz", help="Profile file, created if it does not exist")
+@click.option("--period", default="month", type=click.Choice(list(PERIODS)), help="Period of the year of a new profile")
+@click.option("--slots-per-hour", default=None, type=int, help="Resolution of a new profile (default: that of the first data file)")
+def update(datafiles: tuple, profile_path: str, period: str, slots_per_hour: int):
+    """Build a surplus profile or add the new days of the data files to it."""
+    existed = os.path.exists(profile_path)
+    days = len(SurplusProfile.load(profile_path).days) if existed else 0
+    for datafile in datafiles:
+        profile = update_profile(profile_path, load_csv(datafile), period, slots_per_hour)
+    click.echo(f"Added {len(profile.days) - days} day(s), {profile_path} covers {len(profile.days)} day(s) "
+               f"by {profile.period} at {profile.slots_per_hour} slot(s) per hour")
+
+@cli.command()
+@click.option("--profile", "profile_path", default="surplus.profile.npz", help="Profile file")
+@click.option("--quantile", default=None, type=click.Choice([str(q) for q in QUANTILES]), help="Show this quantile instead of the mean")
+def show(profile_path: str, quantile: str):
+    """Print the mean or a quantile of the surplus (W) per hour and period."""
+    profile = load_profile(profile_path)
+    values = profile.table(int(quantile) if quantile else None)
+    hourly = values.reshape(values.shape[0], 24, profile.slots_per_hour).mean(axis=2)
+    table = pd.DataFrame(hourly.round().astype(int), columns=[f"{hour:02d}" for hour in range(24)])
+    table.index.name = profile.period
+    click.echo(table.to_string())
+
+if __name__ == '__main__':
+    cli()
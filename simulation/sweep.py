@@ -0,0 +1,117 @@
+from __future__ import annotations
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import click
+from typing import Dict, List
+
+from lazyimport import lazy_import
+from aggregation import aggregate_energy, charging_methods
+from datacache import load_csv
+from resultcache import ResultCache
+from simulation import Configuration, load_config, filter_date_range, resample_input, run_simulation
+
+pd = lazy_import("pandas")
+
+
+# Set once per worker process by init_worker, so the input data is not re-sent with every task
+_shared_data = None
+_base_config = None
+_prices = None
+_cache = None
+
+def load_grid(grid_path: str) -> Dict[str, list]:
+    with open(grid_path) as grid_file:
+        grid = json.load(grid_file)
+    unknown = set(grid) - set(Configuration.model_fields)
+    if unknown:
+        raise click.BadParameter(f"Unknown configuration fields: {', '.join(sorted(unknown))}", param_hint="--grid")
+    return {key: values if isinstance(values, list) else [values] for key, values in grid.items()}
+
+def expand_grid(grid: Dict[str, list], samples: int = None, seed: int = 0) -> List[dict]:
+    keys = list(grid)
+    combinations = list(itertools.product(*(grid[key] for key in keys)))
+    if samples is not None and samples < len(combinations):
+        combinations = random.Random(seed).sample(combinations, samples)
+    return [dict(zip(keys, values)) for values in combinations]
+
+def summarize_charging(output_df: pd.DataFrame, config: Configuration, solar_price: float, grid_price: float) -> dict:
+    totals = aggregate_energy(output_df, "total", interval_hours=1 / config.calls_per_hour).iloc[0]
+    summary = {}
+    for method in charging_methods(output_df):
+        summary[f'{method}_pv_energy'] = totals[f'{method}_pv_energy']
+        summary[f'{method}_grid_energy'] = totals[f'{method}_grid_energy']
+        summary[f'{method}_pv_share'] = totals[f'{method}_pv_share']
+        summary[f'{method}_cost'] = totals[f'{method}_pv_energy'] * solar_price + totals[f'{method}_grid_energy'] * grid_price
+    return summary
+
+def init_worker(data: pd.DataFrame, base_config: dict, prices: tuple, use_cache: bool):
+    global _shared_data, _base_config, _prices, _cache
+    _shared_data = data
+    _base_config = base_config
+    _prices = prices
+    _cache = ResultCache() if use_cache else None
+
+def run_configuration(task: tuple):
+    """
+    Returns the summary of one configuration and the cache hits and misses of this task, which the
+    parent adds to the cache statistics.
+    """
+    index, overrides = task
+    config = Configuration(**{**_base_config, **overrides})
+    # calls_per_hour may be part of the grid, so every configuration gets the data at its own resolution
+    df, _ = resample_input(filter_date_range(_shared_data, config), config)
+    result = {'run': index, **overrides}
+    if not df.empty:
+        result.update(summarize_charging(run_simulation(df, config, cache=_cache), config, *_prices))
+    return result, _cache.take_counters() if _cache is not None else {}
+
+def run_sweep(df: pd.DataFrame, base_config: Configuration, overrides: List[dict], solar_price: float, grid_price: float, workers: int, use_cache: bool = True) -> pd.DataFrame:
+    initargs = (df, base_config.model_dump(), (solar_price, grid_price), use_cache)
+    tasks = list(enumerate(overrides))
+    if workers <= 1:
+        init_worker(*initargs)
+        results = [run_configuration(task) for task in tasks]
+    else:
+        # With the fork start method the workers inherit the DataFrame without pickling it at all
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            results = list(pool.imap_unordered(run_configuration, tasks, chunksize=chunksize))
+    if use_cache:
+        # Written once by the parent, concurrent updates of the workers would lose counts
+        counts = {"hits": 0, "misses": 0}
+        for _, task_counts in results:
+            for counter, count in task_counts.items():
+                counts[counter] += count
+        ResultCache().record(counts)
+    return pd.DataFrame([result for result, _ in results]).sort_values('run').reset_index(drop=True)
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.option("--datafile", default="data.csv", help="Data *.csv file")
+@click.option("--configfile", default="config.json", help="JSON configuration file with the base configuration")
+@click.option("--grid", required=True, help="JSON file mapping configuration fields to lists of values")
+@click.option("--samples", type=int, default=None, help="Evaluate only a random sample of this many grid points")
+@click.option("--seed", type=int, default=0, help="Seed for --samples")
+@click.option("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+@click.option("--solar-price", default=0.097, type=float, help="Price per kWh of solar energy in €")
+@click.option("--grid-price", default=0.33, type=float, help="Price per kWh of grid energy in €")
+@click.option("--out", default="sweep.csv", help="Output *.csv summary file")
+@click.option("--no-cache", is_flag=True, help="Always simulate instead of reusing cached results")
+def sweep(datafile: str, configfile: str, grid: str, samples: int, seed: int, workers: int, solar_price: float, grid_price: float, out: str, no_cache: bool):
+    base_config = load_config(configfile)
+    overrides = expand_grid(load_grid(grid), samples, seed)
+    df = load_csv(datafile)
+
+    click.echo(f"Running {len(overrides)} configurations on {workers} worker(s) ...")
+    summary = run_sweep(df, base_config, overrides, solar_price, grid_price, workers, use_cache=not no_cache)
+    summary.to_csv(out, index=False)
+    click.echo(f"Sweep completed. Summary saved in {out}")
+
+if __name__ == '__main__':
+    cli()
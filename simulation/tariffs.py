@@ -0,0 +1,100 @@
+from __future__ import annotations
+import json
+import click
+from typing import List
+
+from lazyimport import lazy_import
+from aggregation import HOURS_PER_WEEK, energy_by_hour_of_week
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+def parse_price_values(text: str) -> List[float]:
+    """
+    Parses a single price ('0.33'), a comma separated list ('0.30,0.33,0.36')
+    or an inclusive range 'start:stop:step' ('0.25:0.40:0.05').
+    """
+    values = []
+    for part in text.split(","):
+        bounds = part.split(":")
+        try:
+            if len(bounds) == 1:
+                values.append(float(bounds[0]))
+            elif len(bounds) == 3:
+                start, stop, step = (float(bound) for bound in bounds)
+                count = int(np.floor((stop - start) / step + 1e-9)) + 1
+                values.extend(np.round(start + step * np.arange(count), 10).tolist())
+            else:
+                raise ValueError(part)
+        except ValueError:
+            raise click.BadParameter(f"'{part}' is neither a price, a list of prices nor a range start:stop:step")
+    return values
+
+def day_schedule(price) -> np.ndarray:
+    hourly = np.asarray(price, dtype=float)
+    if hourly.ndim == 0:
+        return np.full(24, float(hourly))
+    if hourly.shape != (24,):
+        raise click.BadParameter(f"A daily price schedule needs 24 hourly prices, got {hourly.size}")
+    return hourly
+
+def schedule_vector(price) -> np.ndarray:
+    """
+    Converts a price specification into one price per hour of the week (168 values, Monday 00:00 first).
+    Accepted are a number, 24 hourly prices, 7 x 24 prices (Monday to Sunday) or an object with
+    'weekday'/'weekend' and/or individual weekday names, each being a number or 24 hourly prices.
+    """
+    if isinstance(price, dict):
+        unknown = set(price) - set(WEEKDAYS) - {"weekday", "weekend", "default"}
+        if unknown:
+            raise click.BadParameter(f"Unknown keys in price schedule: {', '.join(sorted(unknown))}")
+        days = []
+        for index, name in enumerate(WEEKDAYS):
+            group = "weekend" if index >= 5 else "weekday"
+            days.append(day_schedule(price.get(name, price.get(group, price.get("default")))))
+        return np.concatenate(days)
+    prices = np.asarray(price, dtype=float)
+    if prices.ndim == 2 and prices.shape == (7, 24):
+        return prices.reshape(HOURS_PER_WEEK)
+    return np.tile(day_schedule(prices), 7)
+
+def describe_price(price) -> str:
+    return f"{price:g}" if isinstance(price, (int, float)) else "zeitvariabel"
+
+def flat_tariffs(solar_prices: List[float], grid_prices: List[float]) -> List[dict]:
+    return [{"name": f"{solar:g}/{grid:g}", "solar_price": solar, "grid_price": grid}
+            for solar in solar_prices for grid in grid_prices]
+
+def load_tariffs(tariff_path: str) -> List[dict]:
+    with open(tariff_path) as tariff_file:
+        tariffs = json.load(tariff_file)
+    for index, tariff in enumerate(tariffs):
+        tariff.setdefault("name", f"tariff_{index}")
+        if "solar_price" not in tariff or "grid_price" not in tariff:
+            raise click.BadParameter(f"Tariff '{tariff['name']}' needs a solar_price and a grid_price", param_hint="--tariff-file")
+    return tariffs
+
+def tariff_costs(df: pd.DataFrame, tariffs: List[dict], methods: List[str], interval_hours: float = None) -> pd.DataFrame:
+    """
+    Evaluates all tariffs in one pass: the energy is bucketed by hour of the week once and the costs
+    of all tariffs and methods follow from two matrix products with the (tariffs x 168) price matrices.
+    """
+    pv_energy, grid_energy = energy_by_hour_of_week(df, methods, interval_hours)
+    solar_prices = np.stack([schedule_vector(tariff["solar_price"]) for tariff in tariffs])
+    grid_prices = np.stack([schedule_vector(tariff["grid_price"]) for tariff in tariffs])
+    pv_costs = solar_prices @ pv_energy
+    grid_costs = grid_prices @ grid_energy
+
+    table = pd.DataFrame({
+        "tariff": [tariff["name"] for tariff in tariffs],
+        "solar_price": [describe_price(tariff["solar_price"]) for tariff in tariffs],
+        "grid_price": [describe_price(tariff["grid_price"]) for tariff in tariffs],
+    })
+    for i, m in enumerate(methods):
+        table[f"{m}_pv_cost"] = pv_costs[:, i]
+        table[f"{m}_grid_cost"] = grid_costs[:, i]
+        table[f"{m}_cost"] = pv_costs[:, i] + grid_costs[:, i]
+    return table
@@ -0,0 +1,10 @@
+from benchmark import stage_line, stage_result
+
+def test_stage_line_formats_throughput_and_memory():
+    assert stage_line("simulation", stage_result(0.5, 12.34, 1000)) == f"{'simulation':<28}{0.5:>12.4f}{'2,000':>14}{'12.3':>10}"
+
+def test_stage_without_rows_or_time_shows_dashes():
+    for seconds, rows in [(0.5, 0), (0.0, 1000)]:
+        stage = stage_result(seconds, None, rows)
+        assert stage["rows_per_second"] is None
+        assert stage_line("empty", stage).split()[-2:] == ["-", "-"]
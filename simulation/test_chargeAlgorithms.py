@@ -0,0 +1,106 @@
+from datetime import time
+import numpy as np
+import pytest
+
+from chargeAlgorithms import UncontrolledCharging, PresetCharging, SurplusChargingAllInformation, SurplusChargingNoSocInformation
+
+CALLS_PER_HOUR = 12
+MINIMUM_CHARGE = 24000
+MAXIMUM_CHARGE = 48000
+CHARGE_MODES = ["round_down", "round_up", "balanced", "none"]
+# Below the minimum, between minimum and maximum, exactly at and above the maximum
+START_CHARGES = [5000, 30000, MAXIMUM_CHARGE, MAXIMUM_CHARGE + 1000]
+
+def day_inputs(seed, first_slot, slots):
+    """
+    time_left (minutes), current_time, solar_output and consumption of a charging window of slots
+    5-minute intervals, with a surplus that crosses zero, min_speed and max_charging_speed.
+    """
+    rng = np.random.default_rng(seed)
+    minutes = (first_slot + np.arange(slots)) * 60 // CALLS_PER_HOUR
+    current_time = [time(*divmod(int(minute), 60)) for minute in minutes]
+    time_left = (slots - np.arange(slots)) * 60.0 / CALLS_PER_HOUR
+    solar_output = np.clip(rng.normal(4000, 5000, slots), 0, None)
+    consumption = rng.uniform(200, 3000, slots)
+    return time_left, current_time, solar_output, consumption
+
+def run_steps(algorithm, current_charge, inputs):
+    # Reference: one step() call per interval, as the per-row engine does
+    time_left, current_time, solar_output, consumption = inputs
+    charging_power = []
+    charge_after = []
+    charge = current_charge
+    for args in zip(time_left.tolist(), current_time, solar_output.tolist(), consumption.tolist()):
+        power = algorithm.step(args[0], charge, *args[1:])
+        charge += power / CALLS_PER_HOUR
+        charging_power.append(power)
+        charge_after.append(charge)
+    return np.array(charging_power, dtype=float), np.array(charge_after, dtype=float)
+
+def assert_paths_agree(create, start_charge, days):
+    """
+    Runs the same days through step() and step_many() on two fresh instances, each day starting at the charge
+    the previous day ended with, and compares powers, charges and the persisted state after every day.
+    """
+    stepped, batched = create(), create()
+    stepped_charge = batched_charge = start_charge
+    for inputs in days:
+        expected_power, expected_charge = run_steps(stepped, stepped_charge, inputs)
+        power, charge = batched.step_many(*inputs[:1], batched_charge, *inputs[1:])
+        np.testing.assert_array_equal(power, expected_power)
+        np.testing.assert_array_equal(charge, expected_charge)
+        assert batched.get_state() == stepped.get_state()
+        stepped_charge, batched_charge = expected_charge[-1], charge[-1]
+
+def surplus_params(charge_mode, delayed):
+    return {
+        "max_charging_speed": 11040,
+        "calls_per_hour": CALLS_PER_HOUR,
+        "minimum_charge": MINIMUM_CHARGE,
+        "maximum_charge": MAXIMUM_CHARGE,
+        "delayed": delayed,
+        "min_speed": 1380,
+        "step_size": 230,
+        "charge_mode": charge_mode,
+    }
+
+# A short evening window forces minimum charging, a long day window mostly charges surplus
+DAYS = [day_inputs(1, 16 * CALLS_PER_HOUR, 4 * CALLS_PER_HOUR), day_inputs(2, 8 * CALLS_PER_HOUR, 12 * CALLS_PER_HOUR)]
+
+@pytest.mark.parametrize("start_charge", START_CHARGES)
+def test_uncontrolled(start_charge):
+    assert_paths_agree(lambda: UncontrolledCharging(11040, CALLS_PER_HOUR, MAXIMUM_CHARGE), start_charge, DAYS)
+
+@pytest.mark.parametrize("start_charge", START_CHARGES)
+def test_preset(start_charge):
+    # Whole days, so intervals before, inside and after the preset window occur
+    days = [day_inputs(3, 0, 24 * CALLS_PER_HOUR), day_inputs(4, 0, 24 * CALLS_PER_HOUR)]
+    assert_paths_agree(lambda: PresetCharging(CALLS_PER_HOUR, MAXIMUM_CHARGE, 3680, time(12), time(23)), start_charge, days)
+
+@pytest.mark.parametrize("charge_mode", CHARGE_MODES)
+@pytest.mark.parametrize("delayed", [False, True])
+@pytest.mark.parametrize("start_charge", START_CHARGES)
+def test_surplus_all_information(charge_mode, delayed, start_charge):
+    assert_paths_agree(lambda: SurplusChargingAllInformation(**surplus_params(charge_mode, delayed)), start_charge, DAYS)
+
+@pytest.mark.parametrize("charge_mode", CHARGE_MODES)
+@pytest.mark.parametrize("delayed", [False, True])
+@pytest.mark.parametrize("start_charge", START_CHARGES)
+def test_surplus_no_soc_information(charge_mode, delayed, start_charge):
+    # The minimum is set from the charge at the first step and carried over to the second day
+    assert_paths_agree(lambda: SurplusChargingNoSocInformation(**surplus_params(charge_mode, delayed)), start_charge, DAYS)
+
+def test_no_soc_minimum_set_once():
+    algorithm = SurplusChargingNoSocInformation(**surplus_params("balanced", True))
+    algorithm.step_many(*DAYS[0][:1], 10000, *DAYS[0][1:])
+    assert algorithm.minimum_charge == 10000 + MINIMUM_CHARGE
+    assert algorithm.minimum_charge_set
+    algorithm.step_many(*DAYS[1][:1], 20000, *DAYS[1][1:])
+    assert algorithm.minimum_charge == 10000 + MINIMUM_CHARGE
+
+@pytest.mark.parametrize("delayed", [False, True])
+def test_minimum_charge_boundary(delayed):
+    # One hour left and exactly one hour at max_charging_speed missing: both paths must start forced charging now
+    day = day_inputs(5, 19 * CALLS_PER_HOUR, CALLS_PER_HOUR)
+    day = (day[0], day[1], np.zeros(CALLS_PER_HOUR), day[3])
+    assert_paths_agree(lambda: SurplusChargingAllInformation(**surplus_params("balanced", delayed)), MINIMUM_CHARGE - 11040, [day])
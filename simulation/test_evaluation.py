@@ -0,0 +1,44 @@
+from pathlib import Path
+import matplotlib
+import pytest
+from click.testing import CliRunner
+
+from datacache import load_csv
+from simulation import load_config
+from fleet import random_fleet, simulate_fleet
+import evaluation
+
+# Plots are drawn without a window
+matplotlib.use("Agg")
+
+HERE = Path(__file__).parent
+
+@pytest.fixture(scope="module")
+def fleet_output(tmp_path_factory):
+    config = load_config(str(HERE / "config.json"))
+    df = load_csv(str(HERE / "entire_2024.csv"))
+    df = df[(df["time"] >= "2024-06-03") & (df["time"] < "2024-06-17")].reset_index(drop=True)
+    site, summary = simulate_fleet(df, config, random_fleet(config, 3, seed=1))
+    path = tmp_path_factory.mktemp("fleet") / "fleet.csv"
+    site.to_csv(path, index=False)
+    return str(path), summary
+
+def test_fleet_output_costs(fleet_output):
+    path, summary = fleet_output
+    result = CliRunner().invoke(evaluation.cli, ["print-charging-costs", "--csv-file", path, "--solar-price", "0.1", "--grid-price", "0.3"])
+    assert result.exit_code == 0, result.output
+    assert evaluation.METHOD_TITLES["fleet"] in result.output
+    assert f"PV Energie (kWh): {summary['pv_energy'].sum():.2f}" in result.output
+    assert f"Netz Energie (kWh): {summary['grid_energy'].sum():.2f}" in result.output
+
+@pytest.mark.parametrize("method", ["all", "fleet"])
+def test_fleet_output_weekly_pv_share(fleet_output, method):
+    path, _ = fleet_output
+    result = CliRunner().invoke(evaluation.cli, ["plot-weekly-pv-share", "--csv-file", path, "--method", method])
+    assert result.exit_code == 0, result.output
+
+def test_method_missing_from_output(fleet_output):
+    path, _ = fleet_output
+    result = CliRunner().invoke(evaluation.cli, ["plot-weekly-pv-share", "--csv-file", path, "--method", "preset"])
+    assert result.exit_code == 2
+    assert "--method" in result.output
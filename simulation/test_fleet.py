@@ -0,0 +1,48 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+from datacache import load_csv
+from chargingcalendar import Calendar, compile_windows
+from simulation import load_config, precompute_arrays
+from fleet import fleet_windows, load_fleet, simulate_fleet
+
+HERE = Path(__file__).parent
+CALENDAR = Calendar(weekdays={"friday": ("10:00:00", "14:00:00")}, exceptions={"2024-06-05": None})
+
+@pytest.fixture(scope="module")
+def data():
+    df = load_csv(str(HERE / "entire_2024.csv"))
+    return df[(df["time"] >= "2024-06-03") & (df["time"] < "2024-06-10")].reset_index(drop=True)
+
+@pytest.fixture(scope="module")
+def config():
+    return load_config(str(HERE / "config.json")).model_copy(update={"calendar": CALENDAR})
+
+def vehicles(config, tmp_path):
+    fleet_file = tmp_path / "fleet.json"
+    fleet_file.write_text('[{"name": "base"}, {"name": "late", "start": "17:00:00", "end": "23:00:00"}]')
+    return load_fleet(str(fleet_file), config)
+
+def test_windows_follow_the_calendar(config, data, tmp_path):
+    days = np.unique(precompute_arrays(data, config)["day"])
+    starts, ends = fleet_windows(config, vehicles(config, tmp_path), days)
+    # A vehicle with the plug-in times of the configuration gets the windows of simulation.py
+    base_starts, base_ends = compile_windows(config, days)
+    np.testing.assert_array_equal(starts[:, 0], base_starts)
+    np.testing.assert_array_equal(ends[:, 0], base_ends)
+    # The calendar overrides the other vehicle's own times as well
+    np.testing.assert_array_equal(starts[:, 1] <= ends[:, 1], starts[:, 0] <= ends[:, 0])
+    assert starts[4, 0] == starts[4, 1] and ends[4, 0] == ends[4, 1]
+
+def test_no_vehicle_is_plugged_in_on_a_day_without_window(config, data, tmp_path):
+    site, _ = simulate_fleet(data, config, vehicles(config, tmp_path))
+    day = site["time"].dt.strftime("%Y-%m-%d")
+    assert site.loc[day == "2024-06-05", "plugged_vehicles"].eq(0).all()
+    assert site.loc[day == "2024-06-05", "fleet_charging_power"].eq(0).all()
+    assert site.loc[day == "2024-06-04", "plugged_vehicles"].max() == 2
+    # Friday: both vehicles only from 10:00 to 14:00
+    friday = site[day == "2024-06-07"]
+    plugged = friday[friday["plugged_vehicles"] > 0]["time"].dt.time
+    assert str(plugged.min()) == "10:00:00" and str(plugged.max()) == "14:00:00"
+    assert friday["plugged_vehicles"].max() == 2
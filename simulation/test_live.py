@@ -0,0 +1,63 @@
+import asyncio
+import datetime
+from pathlib import Path
+import pytest
+import requests
+
+from simulation import load_config
+from live import Clock, LiveController, Reading
+
+HERE = Path(__file__).parent
+# A weekday inside the preset window (12:00 to 23:00), 5 simulated minutes per 0.1 s
+START = datetime.datetime(2024, 6, 3, 17, 0)
+SPEED = 3000
+MAX_LATENCY = 0.02
+TICKS = 3
+
+class Poller:
+    def __init__(self):
+        self.latest = Reading("17:00:00", 5000, 500)
+
+class Sink:
+    """
+    Accepts every setpoint after delay seconds, or fails with a requests error like HttpSink.
+    """
+    def __init__(self, delay: float = 0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+
+    async def emit(self, setpoint: dict):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise requests.ConnectionError("wallbox unreachable")
+        self.received.append(setpoint)
+
+def run_controller(sink):
+    config = load_config(str(HERE / "config.json"))
+    clock = Clock(SPEED)
+    clock.sync(START)
+    controller = LiveController(config, "preset", Poller(), sink, clock, max_age=60, max_latency=MAX_LATENCY)
+    start_charge = controller.charge
+    asyncio.run(controller.run(TICKS))
+    per_tick = config.preset_charging_speed / config.calls_per_hour
+    return controller, (controller.charge - start_charge) / per_tick
+
+def test_accepted_setpoints_add_to_the_charge():
+    controller, ticks_charged = run_controller(Sink())
+    assert ticks_charged == pytest.approx(TICKS)
+    assert (controller.late, controller.accepted_late) == (0, 0)
+
+def test_late_setpoints_are_charged_once_the_sink_accepts_them():
+    sink = Sink(delay=5 * MAX_LATENCY)
+    controller, ticks_charged = run_controller(sink)
+    assert len(sink.received) == TICKS
+    assert ticks_charged == pytest.approx(TICKS)
+    assert (controller.late, controller.accepted_late) == (TICKS, TICKS)
+    assert not controller.pending
+
+@pytest.mark.parametrize("delay", [0, 5 * MAX_LATENCY])
+def test_failed_setpoints_are_not_charged(delay):
+    controller, ticks_charged = run_controller(Sink(delay=delay, fail=True))
+    assert ticks_charged == 0
+    assert (controller.late, controller.accepted_late) == (TICKS, 0)
@@ -0,0 +1,44 @@
+from datetime import date
+from pathlib import Path
+import pytest
+
+from datacache import load_csv
+from chargingcalendar import Calendar
+from surplusprofile import update_profile
+from simulation import load_config, filter_date_range, resample_input, run_simulation
+
+HERE = Path(__file__).parent
+# Two weeks with weekends, a Friday window, a holiday, a day without window and one with its own window
+CALENDAR = Calendar(
+    weekdays={"friday": ("10:00:00", "14:00:00")},
+    holidays=[date(2024, 6, 4)],
+    exceptions={date(2024, 6, 5): None, date(2024, 6, 12): ("07:30:00", "21:45:00")},
+)
+
+@pytest.fixture(scope="module")
+def data():
+    df = load_csv(str(HERE / "entire_2024.csv"))
+    return df[(df["time"] >= "2024-05-01") & (df["time"] < "2024-06-15")].reset_index(drop=True)
+
+@pytest.fixture(scope="module")
+def profile(data, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("profile") / "surplus.profile.npz")
+    update_profile(path, data[data["time"] < "2024-06-01"])
+    return path
+
+@pytest.mark.parametrize("step_mode", ["round_down", "round_up", "balanced", "none"])
+@pytest.mark.parametrize("delayed", [True, False])
+@pytest.mark.parametrize("calls_per_hour", [12, 4])
+def test_vectorized_output_is_identical_to_rows(data, profile, step_mode, delayed, calls_per_hour):
+    config = load_config(str(HERE / "config.json")).model_copy(update={
+        "start_date": date(2024, 6, 1), "end_date": date(2024, 6, 14), "calendar": CALENDAR, "surplus_profile": profile,
+        "step_mode": step_mode, "surplus_charging_delayed": delayed, "calls_per_hour": calls_per_hour,
+    })
+    df, _ = resample_input(filter_date_range(data, config), config)
+    rows = run_simulation(df, config, "rows")
+    vectorized = run_simulation(df, config, "vectorized")
+    assert "surplus_forecast_charging_power" in vectorized.columns
+    assert (vectorized["surplus_all_charging_power"] > 0).any()
+    # Days without window have no rows
+    assert not (vectorized["time"].dt.date == date(2024, 6, 5)).any()
+    assert vectorized.to_csv(index=False) == rows.to_csv(index=False)
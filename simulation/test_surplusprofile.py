@@ -0,0 +1,35 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+from datacache import load_csv
+from surplusprofile import SurplusProfile
+
+@pytest.fixture(scope="module")
+def data():
+    df = load_csv(str(Path(__file__).parent / "entire_2024.csv"))
+    return df[df["time"] < "2024-01-08"].reset_index(drop=True)
+
+def assert_same_profile(profile, expected):
+    np.testing.assert_array_equal(profile.days, expected.days)
+    np.testing.assert_array_equal(profile.count, expected.count)
+    np.testing.assert_allclose(profile.total, expected.total)
+    np.testing.assert_array_equal(profile.histogram, expected.histogram)
+
+def test_incremental_updates_match_one_update(data):
+    expected = SurplusProfile("month", 12)
+    assert expected.update(data) == 7
+    profile = SurplusProfile("month", 12)
+    assert profile.update(data[data["time"] < "2024-01-04"]) == 3
+    assert profile.update(data) == 4
+    assert profile.update(data) == 0
+    assert_same_profile(profile, expected)
+
+def test_partial_newest_day_is_added_once_complete(data):
+    expected = SurplusProfile("month", 12)
+    expected.update(data)
+    profile = SurplusProfile("month", 12)
+    # Like today's data, the last day only reaches noon and must not be frozen into the profile
+    assert profile.update(data[data["time"] < "2024-01-07 12:00"]) == 6
+    assert profile.update(data) == 1
+    assert_same_profile(profile, expected)
@@ -0,0 +1,27 @@
+from datetime import date
+from pathlib import Path
+import pytest
+
+from datacache import load_csv
+from simulation import load_config
+from resultcache import ResultCache
+from sweep import expand_grid, run_sweep
+
+HERE = Path(__file__).parent
+
+@pytest.fixture(scope="module")
+def data():
+    df = load_csv(str(HERE / "entire_2024.csv"))
+    return df[(df["time"] >= "2024-06-03") & (df["time"] < "2024-06-10")].reset_index(drop=True)
+
+def test_parallel_sweep_counts_every_cache_lookup(data, tmp_path, monkeypatch):
+    monkeypatch.setenv("SIMULATION_CACHE_DIR", str(tmp_path))
+    config = load_config(str(HERE / "config.json")).model_copy(update={"start_date": date(2024, 6, 3), "end_date": date(2024, 6, 9)})
+    overrides = expand_grid({"min_soc": [20, 25, 30, 35], "max_soc": [80, 90]})
+    first = run_sweep(data, config, overrides, 0.1, 0.3, workers=4)
+    stats = ResultCache().stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (0, 8, 8)
+    second = run_sweep(data, config, overrides, 0.1, 0.3, workers=4)
+    stats = ResultCache().stats()
+    assert (stats["hits"], stats["misses"]) == (8, 8)
+    assert first.equals(second)
@@ -1,14 +1,72 @@
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import click
 from pydantic import BaseModel
-import requests
-import dateutil
 import datetime
-import pandas as pd
+
+# requests, pandas and dateutil are imported by the functions using them, so the CLI starts quickly
 
 class Configuration(BaseModel):
     host: str
 
+def create_session(pool_size: int) -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_day(session: "requests.Session", host: str, dt: datetime.datetime, date_now: datetime.datetime, retries: int, backoff: float, timeout: float) -> "pd.DataFrame":
+    import pandas as pd
+    import requests
+    diff = str((date_now-dt).days)
+    for attempt in range(retries + 1):
+        try:
+            resp = session.post(host + '/getjp', json = {'776':{diff:None}}, timeout=timeout)
+            resp.raise_for_status()
+            raw = resp.json()
+            dat = [{'time': dt.strftime('%Y-%m-%d') + ' ' + _a[0], 'output': _a[1][0][0], 'consumption': _a[1][1][0]} for _a in raw['776'][diff]]
+            return pd.DataFrame(dat, columns=['time', 'output', 'consumption'])
+        except (requests.RequestException, ValueError, KeyError, IndexError, TypeError):
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+def existing_days(datafile: str, today: str) -> tuple:
+    """
+    Returns the complete and the partial days of the data file. Today is always partial, as the device only
+    returns it up to the current time, and so is any day whose last sample lies before the last interval.
+    """
+    import pandas as pd
+    if not os.path.exists(datafile) or os.path.getsize(datafile) == 0:
+        return set(), set()
+    times = pd.to_datetime(pd.read_csv(datafile, usecols=['time'])['time'])
+    if times.empty:
+        return set(), set()
+    interval = times.sort_values().diff().median()
+    last = times.groupby(times.dt.normalize()).max()
+    complete = last >= last.index + pd.Timedelta(days=1) - (interval if pd.notna(interval) else pd.Timedelta(0))
+    days = last.index.strftime('%Y-%m-%d')
+    done = {day for day, whole in zip(days, complete) if whole and day != today}
+    return done, set(days) - done
+
+def remove_days(datafile: str, days: set):
+    import pandas as pd
+    if not days:
+        return
+    data_df = pd.read_csv(datafile)
+    data_df[~data_df['time'].str.slice(0, 10).isin(days)].to_csv(datafile, index=False)
+
+def sort_datafile(datafile: str):
+    import pandas as pd
+    data_df = pd.read_csv(datafile)
+    data_df = data_df.drop_duplicates(subset='time', keep='last').sort_values('time', kind='stable')
+    data_df.to_csv(datafile, index=False)
+
 @click.group()
 def cli():
     pass
@@ -18,25 +76,51 @@ def cli():
 @click.option("--last", help="Last day", required=False)
 @click.option("--datafile", default="data.csv", help="Data *.csv file")
 @click.option("--config", default="config.json", help="JSON configuration file")
-def data(first:str, last:str, datafile:str, config:str):
+@click.option("--workers", default=4, type=int, help="Number of days fetched concurrently")
+@click.option("--retries", default=3, type=int, help="Retries per day after a failed request")
+@click.option("--backoff", default=1.0, type=float, help="Initial retry delay in seconds, doubled on each retry")
+@click.option("--timeout", default=30.0, type=float, help="Request timeout in seconds")
+def data(first:str, last:str, datafile:str, config:str, workers:int, retries:int, backoff:float, timeout:float):
+    import pandas as pd
+    from dateutil import parser, rrule
     with open(config) as config_file:
         configuration = Configuration(**json.load(config_file))
     date_now = datetime.datetime.now()
-    date_first = dateutil.parser.parse(first) if not first == None else date_now
-    date_last = dateutil.parser.parse(last) if not last == None else date_first
-    data_df = pd.DataFrame()
-    for dt in dateutil.rrule.rrule(dateutil.rrule.DAILY, dtstart=date_first, until=date_last):
-        click.echo(click.style(f"Retrieving data for {dt.strftime('%Y-%m-%d')} ...", fg='yellow'))
-        diff = str((date_now-dt).days)
-        resp = requests.post(configuration.host + '/getjp', json = {'776':{diff:None}})
-        raw = resp.json()
-        dat = [{'time': dt.strftime('%Y-%m-%d') + ' ' + _a[0], 'output': _a[1][0][0], 'consumption': _a[1][1][0]} for _a in raw['776'][diff]]
-        data_df = pd.concat([data_df, pd.DataFrame(dat)], ignore_index=True)
-        
-    data_df.to_csv(datafile, index=False)
+    date_first = parser.parse(first) if not first == None else date_now
+    date_last = parser.parse(last) if not last == None else date_first
+
+    # Complete days already present in the data file are skipped, so an interrupted run can simply be restarted;
+    # partial days are fetched again and their rows replaced
+    done, partial = existing_days(datafile, date_now.strftime('%Y-%m-%d'))
+    days = [dt for dt in rrule.rrule(rrule.DAILY, dtstart=date_first, until=date_last) if dt.strftime('%Y-%m-%d') not in done]
+    remove_days(datafile, partial & {dt.strftime('%Y-%m-%d') for dt in days})
+    if done:
+        click.echo(click.style(f"{len(done)} complete day(s) already in {datafile}, fetching {len(days)} missing or partial day(s).", fg='yellow'))
+
+    write_header = not os.path.exists(datafile) or os.path.getsize(datafile) == 0
+    failed = []
+    with create_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_day, session, configuration.host, dt, date_now, retries, backoff, timeout): dt for dt in days}
+        for future in as_completed(futures):
+            day = futures[future].strftime('%Y-%m-%d')
+            try:
+                day_df = future.result()
+            except Exception as error:
+                failed.append(day)
+                click.echo(click.style(f"Retrieving data for {day} failed: {error}", fg='red'))
+                continue
+            click.echo(click.style(f"Retrieved data for {day} ...", fg='yellow'))
+            day_df.to_csv(datafile, index=False, mode='w' if write_header else 'a', header=write_header)
+            write_header = False
+
+    if write_header:
+        pd.DataFrame(columns=['time', 'output', 'consumption']).to_csv(datafile, index=False)
+    sort_datafile(datafile)
+    if failed:
+        raise click.ClickException(f"{len(failed)} day(s) could not be retrieved ({', '.join(sorted(failed))}). Run the command again to fetch only the missing days.")
     click.echo(click.style(f"File {datafile} written.", fg='green'))
 
 cli.add_command(data)
 
 if __name__ == '__main__':
-    cli()
\ No newline at end of file
+    cli()
@@ -0,0 +1,91 @@
+import datetime
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import click
+
+def load_days(datafile: str) -> dict:
+    """
+    Groups the rows of a Solarlog data file by day in the layout returned by /getjp.
+    """
+    import pandas as pd
+    df = pd.read_csv(datafile)
+    days = {}
+    for time_string, output, consumption in zip(df['time'], df['output'], df['consumption']):
+        day, clock = time_string.split(' ')
+        days.setdefault(day, []).append([clock, [[int(output)], [int(consumption)]]])
+    return days
+
+def replay_clock(start: str, speed: float):
+    """
+    Returns a function giving the replayed time, which starts at start and runs speed times faster so that
+    a day of data can be replayed in minutes, or None to use the wall clock.
+    """
+    if start is None:
+        return None
+    origin = datetime.datetime.fromisoformat(start)
+    started = time.monotonic()
+    return lambda: origin + datetime.timedelta(seconds=(time.monotonic() - started) * speed)
+
+def create_handler(days: dict, fail_rate: float, delay: float, now=None):
+    replaying = now is not None
+    now = now or datetime.datetime.now
+
+    class GetjpHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/getjp':
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            time.sleep(delay)
+            if random.random() < fail_rate:
+                self.send_error(503, "Injected failure")
+                return
+            response = {'776': {}}
+            current = now()
+            for diff in body.get('776', {}):
+                day = (current - datetime.timedelta(days=int(diff))).strftime('%Y-%m-%d')
+                rows = days.get(day, [])
+                if diff == '0':
+                    # Like the real device, today only has values up to the current time
+                    clock = current.strftime('%H:%M:%S')
+                    rows = [row for row in rows if row[0] <= clock]
+                response['776'][diff] = rows
+            payload = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            if replaying:
+                self.send_header('X-Replay-Time', current.isoformat(timespec='seconds'))
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return GetjpHandler
+
+@click.command()
+@click.option("--datafile", default="entire_2024.csv", help="Data *.csv file served by the stub")
+@click.option("--port", default=8080, type=int, help="Port to listen on")
+@click.option("--fail-rate", default=0.0, type=float, help="Fraction of requests answered with HTTP 503")
+@click.option("--delay", default=0.0, type=float, help="Artificial response delay in seconds")
+@click.option("--replay-start", default=None, help="Replay the data from this time on, e.g. '2024-06-01 06:00:00', instead of using the wall clock")
+@click.option("--speed", default=1.0, type=float, help="Speed-up of the replay clock")
+def serve(datafile: str, port: int, fail_rate: float, delay: float, replay_start: str, speed: float):
+    """
+    Serves a local stand-in for the Solarlog /getjp endpoint from a data file, for testing solarlog.py
+    and, with --replay-start and --speed, the live controller.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), create_handler(load_days(datafile), fail_rate, delay, replay_clock(replay_start, speed)))
+    click.echo(click.style(f"Serving {datafile} on http://127.0.0.1:{port}/getjp", fg='green'))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    serve()
@@ -1,26 +1,41 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import numpy as np
+import sys
+from pathlib import Path
+import click
 
-# CSV-Datei einlesen
-df = pd.read_csv("entire_2024.csv", parse_dates=["time"])
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "simulation"))
 
-# Überschuss berechnen
-df['surplus'] = df['output'] - df['consumption']
+@click.command()
+@click.option("--datafile", default="entire_2024.csv", help="Data *.csv file")
+@click.option("--profile", "profile_path", default=None, help="Surplus profile, created or extended with new days (default: <datafile>.profile.npz)")
+def main(datafile: str, profile_path: str):
+    """Bar diagram of the average surplus by time of day."""
+    # Erst hier geladen, damit die Hilfe ohne pandas und matplotlib auskommt
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from datacache import load_csv
+    from surplusprofile import update_profile
 
-df['time'] = df['time'].dt.time
+    # CSV-Datei einlesen
+    df = load_csv(datafile)
 
-avg_surplus = df.groupby('time')['surplus'].mean()
+    # Überschuss je Uhrzeit aus dem Überschussprofil; es liegt neben der CSV-Datei und wird nur um neue Tage ergänzt
+    profile = update_profile(profile_path or f"{datafile}.profile.npz", df)
+    slots_per_hour = profile.slots_per_hour
 
-plt.figure(figsize=(12, 6))
-avg_surplus.plot(kind='bar', color='skyblue')
-plt.xlabel('Uhrzeit')
-plt.ylabel('Durchschnittlicher Überschuss')
+    avg_surplus = pd.Series(profile.time_of_day_mean(), index=profile.slot_times())
 
-tick_labels = [str(t)[:-3] for t in avg_surplus.index]
-ticks = np.arange(0, len(avg_surplus), step=12)  # Jede 12. Position für 60 Minuten (5 Minuten Intervalle)
-plt.xticks(ticks=ticks, labels=np.array(tick_labels)[ticks], fontsize=10)
-plt.grid()
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+    plt.figure(figsize=(12, 6))
+    avg_surplus.plot(kind='bar', color='skyblue')
+    plt.xlabel('Uhrzeit')
+    plt.ylabel('Durchschnittlicher Überschuss')
+
+    tick_labels = [str(t)[:-3] for t in avg_surplus.index]
+    ticks = np.arange(0, len(avg_surplus), step=slots_per_hour)  # Eine Beschriftung je Stunde
+    plt.xticks(ticks=ticks, labels=np.array(tick_labels)[ticks], fontsize=10)
+    plt.grid()
+    plt.tight_layout()
+    plt.show()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import datetime
+import io
+import itertools
+import json
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+import solarlog
+import stub_server
+
+@pytest.fixture
+def source(tmp_path):
+    """
+    Three days of 5-minute data ending today, taken from entire_2024.csv and moved to the current dates.
+    """
+    df = pd.read_csv(Path(__file__).parent / "entire_2024.csv", nrows=3 * 288)
+    times = pd.to_datetime(df["time"])
+    offset = pd.Timestamp(datetime.date.today()) - pd.Timedelta(days=2) - times.iloc[0]
+    df["time"] = (times + offset).dt.strftime("%Y-%m-%d %H:%M:%S")
+    path = tmp_path / "source.csv"
+    df.to_csv(path, index=False)
+    return path
+
+def start_stub(datafile, fail_rate=0.0):
+    """
+    Serves datafile on a free port; returns the server and a list collecting the 'diff' (days before today) of every request.
+    """
+    diffs = []
+    handler = stub_server.create_handler(stub_server.load_days(str(datafile)), fail_rate, 0.0)
+
+    class CountingHandler(handler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length)
+            diffs.extend(json.loads(body)['776'])
+            self.rfile = io.BytesIO(body)
+            super().do_POST()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, diffs
+
+@pytest.fixture
+def stub(source, tmp_path):
+    servers = []
+
+    def start(fail_rate=0.0):
+        server, diffs = start_stub(source, fail_rate)
+        servers.append(server)
+        config = tmp_path / "config.json"
+        config.write_text(json.dumps({"host": f"http://127.0.0.1:{server.server_address[1]}"}))
+        return config, diffs
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def fetch(config, datafile, first, last, *options):
+    return CliRunner().invoke(solarlog.cli, ["data", "--first", first, "--last", last, "--datafile", str(datafile),
+                                             "--config", str(config), "--backoff", "0", *options])
+
+def expected_rows(source):
+    # Today is only served up to the current time
+    df = pd.read_csv(source)
+    return df[df["time"] <= datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")].reset_index(drop=True)
+
+def day(offset):
+    return (datetime.date.today() + datetime.timedelta(days=offset)).strftime("%Y%m%d")
+
+def test_retries_after_503(source, stub, tmp_path, monkeypatch):
+    # Every other request is answered with HTTP 503, so with one worker every day fails once and then succeeds
+    outcomes = itertools.cycle([0.0, 0.99])
+    monkeypatch.setattr(stub_server.random, "random", lambda: next(outcomes))
+    config, diffs = stub(fail_rate=0.5)
+    datafile = tmp_path / "data.csv"
+    result = fetch(config, datafile, day(-2), day(0), "--workers", "1", "--retries", "1")
+    assert result.exit_code == 0, result.output
+    assert len(diffs) == 6
+    pd.testing.assert_frame_equal(pd.read_csv(datafile), expected_rows(source))
+
+def test_failed_days_are_reported(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(stub_server.random, "random", lambda: 0.0)
+    config, diffs = stub(fail_rate=0.5)
+    result = fetch(config, tmp_path / "data.csv", day(-2), day(-1), "--retries", "2")
+    assert result.exit_code == 1
+    assert len(diffs) == 6
+    assert "2 day(s) could not be retrieved" in result.output
+
+def test_resume_fetches_only_missing_and_partial_days(source, stub, tmp_path):
+    config, diffs = stub()
+    datafile = tmp_path / "data.csv"
+    # An interrupted run: the first day is complete, the second was cut off at noon
+    rows = pd.read_csv(source)
+    cut = (pd.Timestamp(datetime.date.today()) - pd.Timedelta(hours=12)).strftime("%Y-%m-%d %H:%M:%S")
+    rows[rows["time"] <= cut].to_csv(datafile, index=False)
+
+    result = fetch(config, datafile, day(-2), day(0))
+    assert result.exit_code == 0, result.output
+    # The complete day is skipped, yesterday's rows are replaced and today is fetched
+    assert sorted(diffs) == ["0", "1"]
+    pd.testing.assert_frame_equal(pd.read_csv(datafile), expected_rows(source))
+
+    # Today stays partial and is fetched again on the next run, without duplicating its rows
+    diffs.clear()
+    result = fetch(config, datafile, day(-2), day(0))
+    assert result.exit_code == 0, result.output
+    assert diffs == ["0"]
+    pd.testing.assert_frame_equal(pd.read_csv(datafile), expected_rows(source))